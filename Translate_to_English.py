@@ -1,33 +1,11 @@
 import streamlit as st
-from openai import OpenAI
-import os
-import hmac
 
-PROMPT = "Translate the received text into clear, natural English."
-
-def check_password():
-    """Returns `True` if the user had the correct password."""
-
-    def password_entered():
-        """Checks whether a password entered by the user is correct."""
-        if hmac.compare_digest(st.session_state["password"], st.secrets["password"]):
-            st.session_state["password_correct"] = True
-            del st.session_state["password"]  # Don't store the password.
-        else:
-            st.session_state["password_correct"] = False
-
-    # Return True if the password is validated.
-    if st.session_state.get("password_correct", False):
-        return True
-
-    # Show input for password.
-    st.text_input(
-        "Password", type="password", on_change=password_entered, key="password"
-    )
-    if "password_correct" in st.session_state:
-        st.error("😕 Password incorrect")
-    return False
+from core.langid import passthrough_runs
+from core.ratelimit import stream_chat_completion
+from helper import check_password, get_client
 
+LANGUAGE = "English"
+PROMPT = f"Translate the received text into clear, natural {LANGUAGE}."
 
 if not check_password():
     st.stop()  # Do not continue if check_password is not True.
@@ -39,31 +17,36 @@ st.title("Translate text to English")
 
 st.caption("NOTE: Please do NOT share any sensitive information as OpenAI servers are still stored in the US (not under GDPR)") 
 
-client = OpenAI(
-    api_key=st.secrets["OPENAI_API_KEY"],
-)
+client = get_client()
 
 def gpt_msg(message_in, prompt=PROMPT):
-  """Call to OpenAI ChatGPT.
+  """Call to OpenAI ChatGPT, yielding the reply as it streams in.
   
   Args: 
     message_in: Message to send to ChatGPT.
     prompt: The system prompt for ChatGPT.
   # """
-  out = client.chat.completions.create(
-      messages=[
-          {
-              "role": "system",
-              "content": prompt,
-          },
-          {
-              "role": "user",
-              "content": message_in,
-          }
-      ],
-      model="gpt-4o-mini",
-  )
-  return out.choices[0].message.content
+  # lines already in English (or only figures/code) are echoed without a model call
+  for i, (text, translate) in enumerate(passthrough_runs(message_in, LANGUAGE)):
+    if i:
+      yield "\n"
+    if not translate:
+      yield text
+      continue
+    yield from stream_chat_completion(
+        client,
+        messages=[
+            {
+                "role": "system",
+                "content": prompt,
+            },
+            {
+                "role": "user",
+                "content": text,
+            }
+        ],
+        model="gpt-4o-mini",
+    )
 
 if "messages" not in st.session_state:
     st.session_state["messages"] = [
@@ -77,9 +60,9 @@ if prompt := st.chat_input(placeholder="enter your text"):
     st.session_state.messages.append({"role": "user", "content": prompt})
     st.chat_message("user").write(prompt)
 
-    response = gpt_msg(message_in=prompt)
+    with st.chat_message("assistant"):
+        response = st.write_stream(gpt_msg(message_in=prompt))
     st.session_state.messages.append({"role": "assistant", "content": response})
-    st.chat_message("assistant").write(response)
 
     #llm = ChatOpenAI(model_name="gpt-3.5-turbo", openai_api_key=os.environ.get("OPENAI_API_KEY"), streaming=True)
     #search = DuckDuckGoSearchRun(name="Search")
@@ -1,56 +1,110 @@
-import datetime
-from unittest.mock import patch
+import pytest
 from streamlit.testing.v1 import AppTest
-from openai.types.chat import ChatCompletionMessage
-from openai.types.chat.chat_completion import ChatCompletion, Choice
-
-
-# See https://github.com/openai/openai-python/issues/715#issuecomment-1809203346
-def create_chat_completion(response: str, role: str = "assistant") -> ChatCompletion:
-    return ChatCompletion(
-        id="foo",
-        model="gpt-3.5-turbo",
-        object="chat.completion",
-        choices=[
-            Choice(
-                finish_reason="stop",
-                index=0,
-                message=ChatCompletionMessage(
-                    content=response,
-                    role=role,
-                ),
-            )
-        ],
-        created=int(datetime.datetime.now().timestamp()),
-    )
-
-
-@patch("openai.resources.chat.Completions.create")
-def test_Chatbot(openai_create):
-    at = AppTest.from_file("Chatbot.py").run()
+
+from benchmarks.mock_openai import MockOpenAI
+from chunking_test import WordEncoder
+from core import cache, chunking, client, jobs, pipeline, ratelimit, tm
+from core.extract import docx_bytes
+
+CHAT_PAGES = ["Translate_to_English.py", "pages/1_Translate_to_German.py"]
+ALL_PAGES = CHAT_PAGES + [
+    "pages/2_Translate_Document_to_English.py",
+    "pages/3_Write_Email_in_German.py",
+    "pages/4_Metrics.py",
+]
+
+
+@pytest.fixture
+def mock_api(tmp_path, monkeypatch):
+    with MockOpenAI(latency=0, tokens_per_s=0) as mock:
+        monkeypatch.setenv("OPENAI_BASE_URL", mock.url)
+        monkeypatch.setenv("OPENAI_API_KEY", "test")
+        monkeypatch.setattr(cache, "_cache", cache.DiskCache(tmp_path / "cache.sqlite3"))
+        monkeypatch.setattr(tm, "_memory", tm.TranslationMemory(tmp_path / "tm.sqlite3"))
+        monkeypatch.setattr(ratelimit, "_layer", ratelimit.RequestLayer(count_tokens=len))
+        client.get_client.cache_clear()
+        yield mock
+    client.get_client.cache_clear()
+
+
+def app(page, logged_in=True):
+    at = AppTest.from_file(page, default_timeout=30)
+    at.secrets["OPENAI_API_KEY"] = "test"
+    at.secrets["password"] = "secret"
+    if logged_in:
+        at.session_state["password_correct"] = True
+    return at
+
+
+@pytest.mark.parametrize("page", ALL_PAGES)
+def test_pages_load(mock_api, page):
+    at = app(page).run()
     assert not at.exception
-    at.chat_input[0].set_value("Do you know any jokes?").run()
-    assert at.info[0].value == "Please add your OpenAI API key to continue."
-
-    JOKE = "Why did the chicken cross the road? To get to the other side."
-    openai_create.return_value = create_chat_completion(JOKE)
-    at.text_input(key="chatbot_api_key").set_value("sk-...")
-    at.chat_input[0].set_value("Do you know any jokes?").run()
-    print(at)
-    assert at.chat_message[1].markdown[0].value == "Do you know any jokes?"
-    assert at.chat_message[2].markdown[0].value == JOKE
-    assert at.chat_message[2].avatar == "assistant"
+
+
+def test_password_gate():
+    at = app("Translate_to_English.py", logged_in=False).run()
+    assert not at.chat_input
+    at.text_input[0].set_value("wrong").run()
+    assert "Password incorrect" in at.error[0].value
+    at.text_input[0].set_value("secret").run()
+    assert at.chat_input
+
+
+@pytest.mark.parametrize("page", CHAT_PAGES)
+def test_chat_pages_stream_the_reply(mock_api, page):
+    at = app(page).run()
+    at.chat_input[0].set_value("Guten Morgen").run()
     assert not at.exception
+    assert at.session_state["messages"][-1] == {"role": "assistant", "content": "GUTEN MORGEN"}
+    assert at.chat_message[-1].markdown[0].value == "GUTEN MORGEN"
 
 
-@patch("langchain.llms.OpenAI.__call__")
-def test_Langchain_Quickstart(langchain_llm):
-    at = AppTest.from_file("pages/3_Langchain_Quickstart.py").run()
-    assert at.info[0].value == "Please add your OpenAI API key to continue."
+def test_chat_page_echoes_text_already_in_the_target_language(mock_api):
+    at = app("Translate_to_English.py").run()
+    text = "Please return the signed power of attorney by Friday."
+    at.chat_input[0].set_value(text).run()
+    assert at.session_state["messages"][-1]["content"] == text
+    assert mock_api.stats["requests"] == 0
 
-    RESPONSE = "1. The best way to learn how to code is by practicing..."
-    langchain_llm.return_value = RESPONSE
-    at.sidebar.text_input[0].set_value("sk-...")
-    at.button[0].set_value(True).run()
-    print(at)
-    assert at.info[0].value == RESPONSE
+
+def test_email_page_writes_an_editable_email(mock_api):
+    at = app("pages/3_Write_Email_in_German.py").run()
+    at.button[0].click().run()
+    assert at.error[0].value == "Input text cannot be empty."
+
+    at.text_area[0].set_value("Termin am Montag")
+    at.button[0].click().run()
+    assert not at.exception
+    assert "TERMIN AM MONTAG" in at.text_area[1].value
+
+
+def test_document_page_translates_an_upload(mock_api, monkeypatch):
+    monkeypatch.setattr(chunking, "get_tokenizer", WordEncoder)
+    monkeypatch.setattr(pipeline, "get_tokenizer", WordEncoder)
+    monkeypatch.setattr(jobs, "_runner", None)
+    pipeline.chunk_tokens.cache_clear()
+
+    at = app("pages/2_Translate_Document_to_English.py").run()
+    at.file_uploader[0].upload(
+        "vertrag.docx", docx_bytes("Der Mieter zahlt.\nDer Vermieter haftet.")
+    ).run()
+    assert not at.exception
+    assert "Extracted 1 chunks from the DOCX." in at.success[0].value
+    assert "DER MIETER ZAHLT." in at.text_area[0].value
+    pipeline.chunk_tokens.cache_clear()
+
+
+def test_document_page_translates_into_several_languages(mock_api, monkeypatch):
+    monkeypatch.setattr(chunking, "get_tokenizer", WordEncoder)
+    monkeypatch.setattr(pipeline, "get_tokenizer", WordEncoder)
+    monkeypatch.setattr(jobs, "_runner", None)
+    pipeline.chunk_tokens.cache_clear()
+
+    at = app("pages/2_Translate_Document_to_English.py").run()
+    at.multiselect[0].select("German").run()
+    at.file_uploader[0].upload("vertrag.docx", docx_bytes("Der Mieter zahlt.")).run()
+    assert not at.exception
+    assert [tab.label for tab in at.tabs] == ["English", "German"]
+    assert len(at.text_area) == 2
+    pipeline.chunk_tokens.cache_clear()
@@ -0,0 +1,215 @@
+"""Translate or summarize whole directories of PDF/DOCX files, without Streamlit.
+
+Runs the same extraction, chunking and translation pipeline as the document
+page and prints per-file throughput:
+
+    OPENAI_API_KEY=... python batch.py contracts/ "scans/*.pdf" --out translated/
+    OPENAI_API_KEY=... python batch.py contracts/ --languages English French --out translated/
+    OPENAI_API_KEY=... python batch.py contracts/ --jobs 4 --out translated/
+
+Set `OPENAI_BASE_URL` to point the run at a local stand-in of the OpenAI API.
+"""
+
+import argparse
+import glob
+import sys
+import time
+from pathlib import Path
+
+from core.chunking import get_tokenizer
+from core.client import connection_stats
+from core.engine import DEFAULT_MAX_IN_FLIGHT, map_ordered
+from core.extract import PDF_BACKENDS, docx_bytes, file_digest
+from core.langid import LANGUAGES
+from core.pipeline import run_document
+from core.tracing import document
+
+SUFFIXES = (".pdf", ".docx")
+
+
+def find_documents(inputs: list[str]) -> list[Path]:
+    """Expand directories (recursively) and glob patterns into PDF/DOCX files."""
+    found = []
+    for item in inputs:
+        path = Path(item)
+        if path.is_dir():
+            candidates = path.rglob("*")
+        elif path.is_file():
+            candidates = [path]
+        else:
+            candidates = (Path(p) for p in glob.glob(item, recursive=True))
+        found.extend(p for p in candidates if p.is_file() and p.suffix.lower() in SUFFIXES)
+    return sorted(set(found))
+
+
+def process_file(
+    path: Path,
+    out_dir: Path,
+    mode: str = "translate",
+    formats=("txt",),
+    review: bool = True,
+    use_memory: bool = True,
+    max_in_flight: int = DEFAULT_MAX_IN_FLIGHT,
+    paragraphs: bool = False,
+    pdf_backend: str | None = None,
+    cascade: bool = True,
+    languages=("English",),
+) -> dict:
+    """Run one document through the pipeline and write its outputs.
+
+    With `paragraphs`, DOCX files are translated paragraph by paragraph
+    (packed into few requests), which keeps their paragraph layout exactly.
+    The file is extracted once and translated into all `languages`; the
+    English output keeps the plain `_translated` name, the others get the
+    language code appended (`_translated_de`).
+
+    Returns throughput numbers for the file: pages (PDF only), source tokens
+    and wall-clock seconds.
+    """
+    start = time.perf_counter()
+    # the extractors read the file themselves, it is never loaded whole
+    digest = file_digest(path)
+
+    # spans of this file's model calls are grouped under its hash
+    with document(digest):
+        result = run_document(
+            path,
+            path.suffix,
+            mode=mode,
+            use_memory=use_memory,
+            review=review,
+            paragraphs=paragraphs,
+            max_in_flight=max_in_flight,
+            pdf_backend=pdf_backend,
+            digest=digest,
+            cascade=cascade,
+            languages=languages,
+        )
+
+    out_dir.mkdir(parents=True, exist_ok=True)
+    for language, translation in result["languages"].items():
+        output = translation["output"]
+        label = "translated" if mode == "translate" else "summary"
+        if language != "English":
+            label += f"_{LANGUAGES.get(language, language)}"
+        if "txt" in formats:
+            (out_dir / f"{path.name}_{label}.txt").write_text(output, encoding="utf-8")
+        if "docx" in formats:
+            (out_dir / f"{path.name}_{label}.docx").write_bytes(docx_bytes(output))
+
+    enc = get_tokenizer()
+    return {
+        "file": str(path),
+        "pages": result["pages"],
+        "tokens": sum(len(enc.encode(chunk)) for chunk in result["chunks"]),
+        "seconds": time.perf_counter() - start,
+    }
+
+
+def format_stats(stats: dict) -> str:
+    seconds = max(stats["seconds"], 1e-9)
+    pages = f"{stats['pages'] / seconds:.2f} pages/s, " if stats["pages"] else ""
+    return (
+        f"{stats['file']}: {stats['tokens']:,} tokens in {stats['seconds']:.1f}s "
+        f"({pages}{stats['tokens'] / seconds:,.0f} tokens/s)"
+    )
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Translate or summarize PDF/DOCX files into English.")
+    parser.add_argument("inputs", nargs="+", help="files, directories or glob patterns")
+    parser.add_argument("--out", type=Path, default=Path("translated"), help="output directory")
+    parser.add_argument("--mode", choices=["translate", "summarize"], default="translate")
+    parser.add_argument("--format", nargs="+", choices=["txt", "docx"], default=["txt"], dest="formats")
+    parser.add_argument(
+        "--languages",
+        nargs="+",
+        choices=list(LANGUAGES),
+        default=["English"],
+        help="target languages, each file is extracted once for all of them",
+    )
+    parser.add_argument(
+        "--workers", type=int, default=DEFAULT_MAX_IN_FLIGHT, help="model calls in flight per file"
+    )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=1,
+        help="files processed at once; their model calls share one rate limiter",
+    )
+    parser.add_argument("--no-review", action="store_true", help="skip the auto-review pass")
+    parser.add_argument("--no-memory", action="store_true", help="don't use the translation memory")
+    parser.add_argument(
+        "--no-cascade",
+        action="store_true",
+        help="translate with the cheapest model only and review every chunk, "
+        "instead of escalating and reviewing just the chunks that fail the quality checks",
+    )
+    parser.add_argument(
+        "--paragraphs",
+        action="store_true",
+        help="translate DOCX files paragraph by paragraph, keeping their layout",
+    )
+    parser.add_argument(
+        "--pdf-backend",
+        choices=list(PDF_BACKENDS),
+        help="PDF text extraction: pdfium is fast, pdfplumber analyses the layout (default: auto)",
+    )
+    args = parser.parse_args(argv)
+
+    paths = find_documents(args.inputs)
+    if not paths:
+        print("No PDF or DOCX files found.", file=sys.stderr)
+        return 1
+
+    def run(path: Path):
+        try:
+            return process_file(
+                path,
+                args.out,
+                mode=args.mode,
+                formats=args.formats,
+                review=not args.no_review,
+                use_memory=not args.no_memory,
+                max_in_flight=args.workers,
+                paragraphs=args.paragraphs,
+                pdf_backend=args.pdf_backend,
+                cascade=not args.no_cascade,
+                languages=args.languages,
+            )
+        except Exception as e:
+            return e
+
+    failed = 0
+    total = {"pages": 0, "tokens": 0}
+
+    def report(idx, stats):
+        nonlocal failed
+        if isinstance(stats, Exception):
+            failed += 1
+            print(f"{paths[idx]}: failed: {stats}", file=sys.stderr)
+            return
+        total["pages"] += stats["pages"]
+        total["tokens"] += stats["tokens"]
+        print(format_stats(stats), flush=True)
+
+    start = time.perf_counter()
+    # every file's calls go through the process-wide request layer, so more
+    # jobs fill the rate limits instead of multiplying them
+    map_ordered(run, paths, max_in_flight=max(args.jobs, 1), on_result=report)
+
+    print(
+        format_stats(
+            {"file": f"{len(paths) - failed} file(s)", **total, "seconds": time.perf_counter() - start}
+        )
+    )
+    conns = connection_stats()
+    print(
+        f"{conns['requests']} requests over {conns['connections']} connection(s), "
+        f"{conns['reuse_ratio']:.0%} reused"
+    )
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,158 @@
+import json
+import re
+import subprocess
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import batch
+from benchmarks.pdf_extract_bench import sample_pdf
+from chunking_test import WordEncoder
+from core import cache, chunking, client, pipeline, ratelimit, tm
+from core.extract import docx_bytes
+
+
+class StubOpenAI(BaseHTTPRequestHandler):
+    """Answers chat completions by upper-casing the document in the prompt."""
+
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        prompt = body["messages"][-1]["content"]
+        numbered = re.findall(r"^\[\[\d+\]\] .*$", prompt, flags=re.M)
+        document = re.search(r"\[START OF DOCUMENT\]\n(.*)\n\[END OF DOCUMENT\]", prompt, flags=re.S)
+        if numbered:
+            answer = "\n".join(numbered).upper()
+        elif document:
+            answer = document.group(1).upper()
+        else:
+            answer = "REVIEWED"
+        payload = json.dumps(
+            {
+                "id": "stub",
+                "object": "chat.completion",
+                "created": 0,
+                "model": body["model"],
+                "choices": [
+                    {
+                        "index": 0,
+                        "finish_reason": "stop",
+                        "message": {"role": "assistant", "content": answer},
+                    }
+                ],
+            }
+        ).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def stub_api(tmp_path, monkeypatch):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubOpenAI)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    monkeypatch.setenv("OPENAI_BASE_URL", f"http://127.0.0.1:{server.server_port}/v1")
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    monkeypatch.setattr(chunking, "get_tokenizer", WordEncoder)
+    monkeypatch.setattr(pipeline, "get_tokenizer", WordEncoder)
+    monkeypatch.setattr(batch, "get_tokenizer", WordEncoder)
+    monkeypatch.setattr(cache, "_cache", cache.DiskCache(tmp_path / "cache.sqlite3"))
+    monkeypatch.setattr(tm, "_memory", tm.TranslationMemory(tmp_path / "tm.sqlite3"))
+    monkeypatch.setattr(ratelimit, "_layer", ratelimit.RequestLayer(count_tokens=len))
+    client.get_client.cache_clear()
+    pipeline.chunk_tokens.cache_clear()
+    yield
+    server.shutdown()
+    client.get_client.cache_clear()
+    pipeline.chunk_tokens.cache_clear()
+
+
+def test_batch_translates_a_directory(stub_api, tmp_path, capsys):
+    docs = tmp_path / "docs"
+    docs.mkdir()
+    (docs / "vertrag.docx").write_bytes(docx_bytes("Der Mieter zahlt. Der Vermieter haftet."))
+    (docs / "notes.md").write_text("ignored")
+
+    assert (
+        batch.main([str(docs), "--out", str(tmp_path / "out"), "--no-review", "--format", "txt", "docx"])
+        == 0
+    )
+    assert (
+        tmp_path / "out" / "vertrag.docx_translated.txt"
+    ).read_text() == "DER MIETER ZAHLT. DER VERMIETER HAFTET."
+    assert (tmp_path / "out" / "vertrag.docx_translated.docx").exists()
+    out = capsys.readouterr().out
+    assert "tokens/s" in out
+    assert "reused" in out
+
+
+def test_batch_packs_docx_paragraphs(stub_api, tmp_path):
+    docs = tmp_path / "docs"
+    docs.mkdir()
+    (docs / "brief.docx").write_bytes(
+        docx_bytes("Sehr geehrte Damen und Herren,\n\n2024\nMit freundlichen Grüßen")
+    )
+
+    assert batch.main([str(docs), "--out", str(tmp_path / "out"), "--paragraphs"]) == 0
+    assert (tmp_path / "out" / "brief.docx_translated.txt").read_text() == (
+        "SEHR GEEHRTE DAMEN UND HERREN,\n\n2024\nMIT FREUNDLICHEN GRÜSSEN"
+    )
+
+
+def test_batch_translates_into_several_languages(stub_api, tmp_path):
+    docs = tmp_path / "docs"
+    docs.mkdir()
+    (docs / "vertrag.docx").write_bytes(docx_bytes("Der Mieter zahlt. Der Vermieter haftet."))
+
+    argv = [str(docs), "--out", str(tmp_path / "out"), "--no-review", "--languages", "English", "French"]
+    assert batch.main(argv) == 0
+    assert (
+        tmp_path / "out" / "vertrag.docx_translated.txt"
+    ).read_text() == "DER MIETER ZAHLT. DER VERMIETER HAFTET."
+    assert (
+        tmp_path / "out" / "vertrag.docx_translated_fr.txt"
+    ).read_text() == "DER MIETER ZAHLT. DER VERMIETER HAFTET."
+
+
+def test_batch_processes_files_in_parallel(stub_api, tmp_path, monkeypatch):
+    docs = tmp_path / "docs"
+    docs.mkdir()
+    (docs / "a.docx").write_bytes(docx_bytes("Der Mieter zahlt."))
+    (docs / "b.docx").write_bytes(docx_bytes("Der Vermieter haftet."))
+    # PDFs go through PDFium, which must not be entered by two files at once
+    for name in "cdef":
+        pages = [[f"Der Mieter zahlt die Miete für Wohnung {name} {i}."] for i in range(12)]
+        (docs / f"{name}.pdf").write_bytes(sample_pdf(pages))
+    # three files have to be in flight at once to get past the barrier
+    barrier = threading.Barrier(3, timeout=10)
+    layers = []
+    process_file = batch.process_file
+
+    def together(path, *args, **kwargs):
+        barrier.wait()
+        layers.append(ratelimit.get_request_layer())
+        return process_file(path, *args, **kwargs)
+
+    monkeypatch.setattr(batch, "process_file", together)
+    assert batch.main([str(docs), "--out", str(tmp_path / "out"), "--no-review", "--jobs", "3"]) == 0
+    assert (tmp_path / "out" / "a.docx_translated.txt").read_text() == "DER MIETER ZAHLT."
+    assert (tmp_path / "out" / "b.docx_translated.txt").read_text() == "DER VERMIETER HAFTET."
+    for name in "cdef":
+        text = (tmp_path / "out" / f"{name}.pdf_translated.txt").read_text()
+        assert text.count("DER MIETER ZAHLT DIE MIETE") == 12
+        assert f"WOHNUNG {name.upper()} 11." in text
+    assert len(layers) == 6
+    assert all(layer is ratelimit._layer for layer in layers)
+
+
+def test_batch_does_not_import_streamlit():
+    code = "import sys, batch; assert 'streamlit' not in sys.modules"
+    subprocess.run([sys.executable, "-c", code], check=True)
@@ -0,0 +1,304 @@
+"""End-to-end benchmarks against the local OpenAI stand-in, with JSON output.
+
+Starts `mock_openai.MockOpenAI` and measures, for every document size and
+concurrency setting, the document pipeline (translation, review and
+summaries through the core functions), then the chat pages and the email
+writer through Streamlit's AppTest, and streamed time-to-first-token. Every
+run gets a fresh cache, translation memory and trace file, so nothing is
+answered from an earlier run.
+
+    python benchmarks/e2e_bench.py --words 2000 20000 --workers 1 8 --out bench.json
+    python benchmarks/e2e_bench.py --error-rate 0.05 --server-error-rate 0.02
+
+Pass `--approx-tokens` on machines without the tiktoken data to count words
+instead of tokens.
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from core import cache, checkpoint, chunking, client, pipeline, ratelimit, tm, tracing  # noqa: E402
+from mock_openai import MockOpenAI  # noqa: E402
+
+GERMAN_WORDS = (
+    "der die das Vertrag Mieter Vermieter zahlt haftet Wohnung Monat Kaution Frist Schaden "
+    "Kündigung Nebenkosten schriftlich jederzeit gemäß innerhalb Tage Euro Zustand Schlüssel"
+).split()
+ENGLISH_WORDS = (
+    "the a contract tenant landlord pays is liable for flat month deposit deadline damage notice "
+    "service charges in writing at any time under within days euro condition keys"
+).split()
+
+# each page is given text in the other language, so every turn needs translating
+# (text already in the target language is passed through without a model call)
+CHAT_PAGES = {"Translate_to_English.py": GERMAN_WORDS, "pages/1_Translate_to_German.py": ENGLISH_WORDS}
+EMAIL_PAGE = "pages/3_Write_Email_in_German.py"
+
+
+class ApproxEncoder:
+    """One token per word; thread safe, unlike reusing a real tokenizer's state."""
+
+    def encode(self, text):
+        return re.findall(r"\S+\s*|\s+", text)
+
+    def decode_with_offsets(self, tokens):
+        offsets, pos = [], 0
+        for word in tokens:
+            offsets.append(pos)
+            pos += len(word)
+        return "".join(tokens), offsets
+
+
+def synthetic_document(n_words: int, seed: int = 0, words: list[str] = GERMAN_WORDS) -> str:
+    """German-looking text with random sentences, so the translation memory rarely hits.
+
+    Args:
+        n_words: Approximate length of the text.
+        seed: Seed for the sentences.
+        words: Vocabulary, e.g. `ENGLISH_WORDS` for English-looking text.
+    """
+    rng = random.Random(seed)
+    sentences, total = [], 0
+    while total < n_words:
+        length = rng.randint(6, 20)
+        sentence = rng.choices(words, k=length)
+        sentences.append(" ".join(sentence).capitalize() + f" {rng.randint(1, 9999)}.")
+        total += length + 1
+    paragraphs = [" ".join(sentences[i : i + 6]) for i in range(0, len(sentences), 6)]
+    return "\n".join(paragraphs)
+
+
+def isolate(tmp: Path):
+    """Point every SQLite store at `tmp` and drop the process-wide instances."""
+    os.environ["LLMDCP_CACHE_PATH"] = str(tmp / "cache.sqlite3")
+    os.environ["LLMDCP_TM_PATH"] = str(tmp / "tm.sqlite3")
+    os.environ["LLMDCP_TRACE_PATH"] = str(tmp / "traces.sqlite3")
+    os.environ["LLMDCP_CHECKPOINT_PATH"] = str(tmp / "checkpoints.sqlite3")
+    cache._cache = None
+    checkpoint._store = None
+    tm._memory = None
+    tracing._store = None
+    ratelimit._layer = None
+
+
+def latency_stats(spans: list[dict], name: str = "chat_completion") -> dict:
+    seconds = [s["seconds"] for s in spans if s["name"] == name]
+    return {
+        "calls": len(seconds),
+        "p50_s": tracing.percentile(seconds, 50),
+        "p95_s": tracing.percentile(seconds, 95),
+        "retries": sum(s["retries"] or 0 for s in spans if s["name"] == name),
+    }
+
+
+def bench_pipeline(mock: MockOpenAI, text: str, mode: str, workers: int, use_memory: bool) -> dict:
+    enc = chunking.get_tokenizer()
+    before = dict(mock.stats)
+    start = time.perf_counter()
+    chunks = chunking.split_into_token_chunks(text, max_tokens=pipeline.chunk_tokens())
+    processed = pipeline.process_chunks(chunks, mode=mode, use_memory=use_memory, max_in_flight=workers)
+    pipeline.finish_document(processed, mode=mode, max_in_flight=workers)
+    seconds = time.perf_counter() - start
+    source_tokens = sum(len(enc.encode(chunk)) for chunk in chunks)
+    return {
+        "chunks": len(chunks),
+        "source_tokens": source_tokens,
+        "seconds": seconds,
+        "source_tokens_per_s": source_tokens / seconds,
+        **{key: mock.stats[key] - before[key] for key in before},
+        **latency_stats(tracing.get_store().spans()),
+    }
+
+
+def bench_stream(mock: MockOpenAI, text: str, repeat: int) -> dict:
+    first, total = [], []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        ttft = None
+        for _delta in ratelimit.stream_chat_completion(
+            client.get_client(), model="gpt-4o-mini", messages=[{"role": "user", "content": text}]
+        ):
+            if ttft is None:
+                ttft = time.perf_counter() - start
+        first.append(ttft or 0.0)
+        total.append(time.perf_counter() - start)
+    return {
+        "ttft_p50_s": statistics.median(first),
+        "ttft_p95_s": tracing.percentile(first, 95),
+        "total_p50_s": statistics.median(total),
+    }
+
+
+def app(page: str):
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_file(str(ROOT / page), default_timeout=600)
+    at.secrets["OPENAI_API_KEY"] = os.environ["OPENAI_API_KEY"]
+    at.secrets["password"] = "benchmark"
+    at.session_state["password_correct"] = True
+    return at
+
+
+def bench_chat_page(page: str, messages: list[str]) -> dict:
+    at = app(page)
+    start = time.perf_counter()
+    at.run()
+    first_run = time.perf_counter() - start
+    turns = []
+    for message in messages:
+        start = time.perf_counter()
+        at.chat_input[0].set_value(message).run()
+        turns.append(time.perf_counter() - start)
+        if at.exception:
+            raise RuntimeError(f"{page}: {at.exception[0].value}")
+    return {
+        "first_run_s": first_run,
+        "turns": len(turns),
+        "turn_p50_s": statistics.median(turns),
+        "turn_p95_s": tracing.percentile(turns, 95),
+    }
+
+
+def bench_email_page(inputs: list[str]) -> dict:
+    at = app(EMAIL_PAGE)
+    at.run()
+    runs = []
+    for text in inputs:
+        at.text_area[0].set_value(text)
+        start = time.perf_counter()
+        at.button[0].click().run()
+        runs.append(time.perf_counter() - start)
+        if at.exception or at.error:
+            raise RuntimeError(f"{EMAIL_PAGE}: {(at.exception or at.error)[0].value}")
+    return {"emails": len(runs), "p50_s": statistics.median(runs), "p95_s": tracing.percentile(runs, 95)}
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--words", type=int, nargs="+", default=[2_000, 20_000], help="document sizes")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 8], help="max_in_flight settings")
+    parser.add_argument(
+        "--modes", nargs="+", choices=["translate", "summarize"], default=["translate", "summarize"]
+    )
+    parser.add_argument(
+        "--no-memory", action="store_true", help="translate without the translation memory"
+    )
+    parser.add_argument("--messages", type=int, default=5, help="chat turns / emails per page")
+    parser.add_argument("--no-pages", action="store_true", help="skip the AppTest page benchmarks")
+    parser.add_argument("--latency", type=float, default=0.2, help="median seconds to first token")
+    parser.add_argument("--latency-sigma", type=float, default=0.5)
+    parser.add_argument("--tokens-per-s", type=float, default=2000.0, help="mock generation speed")
+    parser.add_argument(
+        "--error-rate", type=float, default=0.0, help="share of requests answered with 429"
+    )
+    parser.add_argument("--server-error-rate", type=float, default=0.0, help="share answered with 503")
+    parser.add_argument(
+        "--approx-tokens", action="store_true", help="count words instead of tiktoken tokens"
+    )
+    parser.add_argument("--out", type=Path, help="write the JSON here instead of stdout")
+    args = parser.parse_args(argv)
+
+    if args.approx_tokens:
+        encoder = ApproxEncoder()
+        chunking.get_tokenizer = pipeline.get_tokenizer = lambda: encoder
+    # the benchmark measures the app, not our own client-side rate limits
+    os.environ.setdefault("OPENAI_RPM", "100000")
+    os.environ.setdefault("OPENAI_TPM", "100000000")
+
+    mock = MockOpenAI(
+        latency=args.latency,
+        latency_sigma=args.latency_sigma,
+        tokens_per_s=args.tokens_per_s,
+        error_rate=args.error_rate,
+        server_error_rate=args.server_error_rate,
+    )
+    results = []
+    with mock, tempfile.TemporaryDirectory() as tmp:
+        os.environ["OPENAI_BASE_URL"] = mock.url
+        os.environ["OPENAI_API_KEY"] = "mock"
+        client.get_client.cache_clear()
+        pipeline.chunk_tokens.cache_clear()
+
+        run = 0
+        for n_words in args.words:
+            text = synthetic_document(n_words)
+            for mode in args.modes:
+                for workers in args.workers:
+                    run += 1
+                    isolate(Path(tmp) / str(run))
+                    result = bench_pipeline(mock, text, mode, workers, use_memory=not args.no_memory)
+                    results.append(
+                        {
+                            "bench": "pipeline",
+                            "mode": mode,
+                            "words": n_words,
+                            "workers": workers,
+                            **result,
+                        }
+                    )
+                    print(
+                        f"pipeline {mode} {n_words:,} words x{workers}: {result['seconds']:.2f}s",
+                        file=sys.stderr,
+                    )
+
+        run += 1
+        isolate(Path(tmp) / str(run))
+        sentence = synthetic_document(60, seed=1)
+        results.append({"bench": "stream", **bench_stream(mock, sentence, args.messages)})
+
+        if not args.no_pages:
+            for page, words in CHAT_PAGES.items():
+                messages = [synthetic_document(60, seed=i, words=words) for i in range(args.messages)]
+                results.append({"bench": "page", "page": page, **bench_chat_page(page, messages)})
+            notes = [synthetic_document(60, seed=i, words=ENGLISH_WORDS) for i in range(args.messages)]
+            results.append({"bench": "page", "page": EMAIL_PAGE, **bench_email_page(notes)})
+
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "approx_tokens": args.approx_tokens,
+            "mock": {
+                "latency": args.latency,
+                "latency_sigma": args.latency_sigma,
+                "tokens_per_s": args.tokens_per_s,
+                "error_rate": args.error_rate,
+                "server_error_rate": args.server_error_rate,
+            },
+        },
+        "results": results,
+    }
+    output = json.dumps(report, indent=2)
+    if args.out:
+        args.out.write_text(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""Benchmark cold import time of the modules and first-run/rerun time of the pages.
+
+Each import is timed in a fresh interpreter, so nothing is shared between
+runs. Pages are run through Streamlit's AppTest with the password gate
+already passed; no OpenAI request is made because the pages only call the
+API once the user submits something.
+
+    python benchmarks/import_time_bench.py --repeat 5
+"""
+
+import argparse
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+MODULES = ["core", "core.pipeline", "batch", "helper", "streamlit"]
+PAGES = [
+    "Translate_to_English.py",
+    "pages/1_Translate_to_German.py",
+    "pages/2_Translate_Document_to_English.py",
+    "pages/3_Write_Email_in_German.py",
+]
+
+IMPORT_SNIPPET = """
+import sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(elapsed, len(sys.modules))
+"""
+
+
+def import_time(module: str) -> tuple[float, int]:
+    """Return (seconds, modules loaded) for importing `module` in a fresh interpreter."""
+    out = subprocess.run(
+        [sys.executable, "-c", IMPORT_SNIPPET.format(module=module)],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout.split()
+    return float(out[0]), int(out[1])
+
+
+def page_times(page: str) -> tuple[float, float]:
+    """Return (first run, rerun) seconds for one page under AppTest."""
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_file(str(ROOT / page), default_timeout=60)
+    at.secrets["OPENAI_API_KEY"] = "sk-benchmark"
+    at.secrets["password"] = "benchmark"
+    at.session_state["password_correct"] = True
+
+    start = time.perf_counter()
+    at.run()
+    first = time.perf_counter() - start
+    start = time.perf_counter()
+    at.run()
+    rerun = time.perf_counter() - start
+    if at.exception:
+        raise RuntimeError(f"{page}: {at.exception[0].value}")
+    return first, rerun
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5, help="fresh interpreters per module")
+    parser.add_argument("--no-pages", action="store_true", help="only time the imports")
+    args = parser.parse_args()
+
+    print(f"{'module':<16} {'median s':>9} {'min s':>7} {'modules':>8}")
+    for module in MODULES:
+        runs = [import_time(module) for _ in range(args.repeat)]
+        seconds = [s for s, _ in runs]
+        print(f"{module:<16} {statistics.median(seconds):>9.3f} {min(seconds):>7.3f} {runs[-1][1]:>8}")
+
+    if args.no_pages:
+        return
+    sys.path.insert(0, str(ROOT))
+    print(f"\n{'page':<42} {'first s':>8} {'rerun s':>8}")
+    for page in PAGES:
+        first, rerun = page_times(page)
+        print(f"{page:<42} {first:>8.3f} {rerun:>8.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,234 @@
+"""A local stand-in for the OpenAI chat completions API, for offline benchmarks.
+
+Answers `POST /v1/chat/completions` (plain and streamed) with a fake
+"translation": the text of the request, upper-cased, keeping `[[n]]`
+segment numbering. Latency, generation speed and failures are configurable:
+
+- time to first token is log-normally distributed around `latency` seconds;
+- the answer is generated at `tokens_per_s` (one token per word);
+- a share of requests fail with 429 (with a `retry-after` header) or 503.
+
+    python benchmarks/mock_openai.py --port 8000 --latency 0.4 --error-rate 0.05
+    OPENAI_BASE_URL=http://127.0.0.1:8000/v1 OPENAI_API_KEY=mock streamlit run Translate_to_English.py
+"""
+
+import argparse
+import json
+import math
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def fake_answer(messages: list[dict]) -> str:
+    """Upper-case the text the prompt asks to translate, keeping segment numbers."""
+    prompt = messages[-1]["content"]
+    numbered = re.findall(r"^\[\[\d+\]\] .*$", prompt, flags=re.M)
+    if numbered:
+        return "\n".join(numbered).upper()
+    document = re.search(r"\[START OF DOCUMENT\]\n(.*)\n\[END OF DOCUMENT\]", prompt, flags=re.S)
+    if document:
+        return document.group(1).upper()
+    return prompt.upper()
+
+
+class MockOpenAI:
+    """Threaded mock server; use as a context manager or call `start`/`stop`.
+
+    Args:
+        latency: Median seconds until the first token.
+        latency_sigma: Spread of the log-normal latency (0 for a fixed latency).
+        tokens_per_s: Generation speed once the first token is out.
+        error_rate: Share of requests answered with 429.
+        server_error_rate: Share of requests answered with 503.
+        retry_after: Seconds sent in the `retry-after` header of a 429.
+        seed: Seed of the random latencies and failures.
+    """
+
+    def __init__(
+        self,
+        latency: float = 0.05,
+        latency_sigma: float = 0.5,
+        tokens_per_s: float = 200.0,
+        error_rate: float = 0.0,
+        server_error_rate: float = 0.0,
+        retry_after: float = 0.1,
+        seed: int = 0,
+        port: int = 0,
+    ):
+        self.latency = latency
+        self.latency_sigma = latency_sigma
+        self.tokens_per_s = tokens_per_s
+        self.error_rate = error_rate
+        self.server_error_rate = server_error_rate
+        self.retry_after = retry_after
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.stats = {"requests": 0, "rate_limited": 0, "server_errors": 0, "completion_tokens": 0}
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), self._handler())
+        self._server.daemon_threads = True
+
+    @property
+    def url(self) -> str:
+        """Base URL to use as `OPENAI_BASE_URL`."""
+        return f"http://127.0.0.1:{self._server.server_port}/v1"
+
+    def start(self) -> "MockOpenAI":
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _draw(self) -> tuple[str, float]:
+        """Decide the fate of one request: ("ok" | "429" | "5xx", seconds to first token)."""
+        with self._lock:
+            self.stats["requests"] += 1
+            roll = self._rng.random()
+            delay = (
+                self.latency * math.exp(self._rng.gauss(0, self.latency_sigma)) if self.latency else 0.0
+            )
+            if roll < self.error_rate:
+                self.stats["rate_limited"] += 1
+                return "429", 0.0
+            if roll < self.error_rate + self.server_error_rate:
+                self.stats["server_errors"] += 1
+                return "5xx", delay
+            return "ok", delay
+
+    def _handler(self):
+        mock = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                fate, delay = mock._draw()
+                time.sleep(delay)
+                if fate == "429":
+                    self._json(
+                        429,
+                        {"error": {"message": "Rate limit reached", "type": "requests"}},
+                        {"retry-after": str(mock.retry_after)},
+                    )
+                    return
+                if fate == "5xx":
+                    self._json(
+                        503, {"error": {"message": "The server is overloaded", "type": "server_error"}}
+                    )
+                    return
+
+                answer = fake_answer(body["messages"])
+                words = answer.split(" ")
+                usage = {
+                    "prompt_tokens": sum(len(m["content"].split()) for m in body["messages"]),
+                    "completion_tokens": len(words),
+                }
+                usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+                with mock._lock:
+                    mock.stats["completion_tokens"] += len(words)
+                per_token = 1 / mock.tokens_per_s if mock.tokens_per_s else 0.0
+
+                if body.get("stream"):
+                    self._stream(body["model"], words, per_token, usage)
+                else:
+                    time.sleep(per_token * len(words))
+                    self._json(
+                        200,
+                        {
+                            "id": "mock",
+                            "object": "chat.completion",
+                            "created": int(time.time()),
+                            "model": body["model"],
+                            "usage": usage,
+                            "choices": [
+                                {
+                                    "index": 0,
+                                    "finish_reason": "stop",
+                                    "message": {"role": "assistant", "content": answer},
+                                }
+                            ],
+                        },
+                    )
+
+            def _json(self, status: int, payload: dict, headers: dict = None):
+                data = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _stream(self, model: str, words: list[str], per_token: float, usage: dict):
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Connection", "close")
+                self.end_headers()
+
+                def event(delta, **extra):
+                    chunk = {
+                        "id": "mock",
+                        "object": "chat.completion.chunk",
+                        "created": int(time.time()),
+                        "model": model,
+                        "choices": delta,
+                        **extra,
+                    }
+                    self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+                    self.wfile.flush()
+
+                for i, word in enumerate(words):
+                    time.sleep(per_token)
+                    text = word if i == 0 else " " + word
+                    event([{"index": 0, "delta": {"content": text}, "finish_reason": None}])
+                event([], usage=usage)
+                self.wfile.write(b"data: [DONE]\n\n")
+                self.close_connection = True
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--latency", type=float, default=0.3, help="median seconds to first token")
+    parser.add_argument("--latency-sigma", type=float, default=0.5)
+    parser.add_argument("--tokens-per-s", type=float, default=100.0)
+    parser.add_argument(
+        "--error-rate", type=float, default=0.0, help="share of requests answered with 429"
+    )
+    parser.add_argument("--server-error-rate", type=float, default=0.0, help="share answered with 503")
+    args = parser.parse_args()
+
+    mock = MockOpenAI(
+        latency=args.latency,
+        latency_sigma=args.latency_sigma,
+        tokens_per_s=args.tokens_per_s,
+        error_rate=args.error_rate,
+        server_error_rate=args.server_error_rate,
+        port=args.port,
+    )
+    print(f"Mock OpenAI API on {mock.url}", flush=True)
+    try:
+        mock._server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
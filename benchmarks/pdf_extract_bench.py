@@ -0,0 +1,181 @@
+"""Speed, memory and agreement of the PDF extraction backends.
+
+Extracts every PDF of a corpus with each backend in `core.extract.PDF_BACKENDS`
+and reports pages/s, peak memory and how similar each backend's text is to
+the reference backend's (word overlap, 1.0 = the same words). Each run gets a
+fresh process, so peak memory is not carried over from the previous one.
+
+    python benchmarks/pdf_extract_bench.py contracts/*.pdf --out pdf_bench.json
+    python benchmarks/pdf_extract_bench.py --pages 50 400
+
+Without PDF arguments it runs on generated sample PDFs of `--pages` pages.
+"""
+
+import argparse
+import json
+import random
+import resource
+import sys
+import tempfile
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from core.extract import PDF_BACKENDS, iter_pdf_pages  # noqa: E402
+
+WORDS = (
+    "der die das Vertrag Mieter Vermieter zahlt haftet Wohnung Monat Kaution Frist Schaden "
+    "Kündigung Nebenkosten schriftlich jederzeit gemäß innerhalb Tage Euro Zustand Schlüssel"
+).split()
+
+
+def _pdf_string(text: str) -> bytes:
+    return (
+        b"("
+        + text.encode("cp1252").replace(b"\\", b"\\\\").replace(b"(", b"\\(").replace(b")", b"\\)")
+        + b")"
+    )
+
+
+def sample_pdf(pages: list[list[str]]) -> bytes:
+    """A minimal text-only PDF: one Helvetica line per string, one page per list."""
+    objects = [b"<< /Type /Catalog /Pages 2 0 R >>", None, None]
+    objects[2] = b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>"
+    kids = []
+    for lines in pages:
+        stream = (
+            b"BT /F1 10 Tf 14 TL 50 800 Td "
+            + b" ".join(_pdf_string(line) + b" '" for line in lines)
+            + b" ET"
+        )
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+            b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % (len(objects))
+        )
+        kids.append(len(objects))
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (
+        b" ".join(b"%d 0 R" % kid for kid in kids),
+        len(kids),
+    )
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n%s\nendobj\n" % (number, body)
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    return bytes(out)
+
+
+def synthetic_pdf(n_pages: int, seed: int = 0) -> bytes:
+    """German-looking contract text, 50 lines per page."""
+    rng = random.Random(seed)
+    pages = [
+        [
+            " ".join(rng.choices(WORDS, k=rng.randint(6, 12))) + f" {rng.randint(1, 999)}."
+            for _ in range(50)
+        ]
+        for _ in range(n_pages)
+    ]
+    return sample_pdf(pages)
+
+
+def similarity(a: str, b: str) -> float:
+    """Share of words two texts have in common (Dice coefficient over word counts)."""
+    words_a, words_b = Counter(a.split()), Counter(b.split())
+    total = sum(words_a.values()) + sum(words_b.values())
+    if not total:
+        return 1.0
+    return 2 * sum((words_a & words_b).values()) / total
+
+
+def _run(path: str, backend: str, workers: int) -> dict:
+    """Extract one PDF with one backend (runs in a fresh process)."""
+    before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    data = Path(path).read_bytes()
+    start = time.perf_counter()
+    pages = list(iter_pdf_pages(data, workers=workers, backend=backend))
+    seconds = time.perf_counter() - start
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return {
+        "pages": len(pages),
+        "seconds": seconds,
+        "pages_per_s": len(pages) / seconds if seconds else 0.0,
+        # ru_maxrss is in KiB on Linux
+        "peak_rss_mib": peak / 1024,
+        "rss_growth_mib": (peak - before) / 1024,
+        "text": "\n".join(pages),
+    }
+
+
+def bench(paths: list[Path], backends: list[str], reference: str, workers: int) -> list[dict]:
+    results = []
+    for path in paths:
+        runs = {}
+        for backend in backends:
+            with ProcessPoolExecutor(max_workers=1) as pool:
+                runs[backend] = pool.submit(_run, str(path), backend, workers).result()
+        ref_text = runs[reference]["text"] if reference in runs else None
+        for backend, run in runs.items():
+            text = run.pop("text")
+            results.append(
+                {
+                    "file": path.name,
+                    "backend": backend,
+                    **run,
+                    "chars": len(text),
+                    f"similarity_to_{reference}": similarity(text, ref_text)
+                    if ref_text is not None
+                    else None,
+                }
+            )
+            print(
+                f"{path.name} {backend}: {run['pages']} pages, {run['pages_per_s']:.1f} pages/s, "
+                f"peak {run['peak_rss_mib']:.0f} MiB",
+                file=sys.stderr,
+            )
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("pdfs", nargs="*", type=Path, help="PDF files of the corpus")
+    parser.add_argument(
+        "--pages", type=int, nargs="+", default=[20, 200], help="sizes of the generated PDFs"
+    )
+    parser.add_argument("--backends", nargs="+", choices=list(PDF_BACKENDS), default=list(PDF_BACKENDS))
+    parser.add_argument(
+        "--reference", default="pdfplumber", help="backend the similarity is measured against"
+    )
+    parser.add_argument(
+        "--workers", type=int, default=None, help="extraction processes (default: all cores)"
+    )
+    parser.add_argument("--out", type=Path, help="write the JSON here instead of stdout")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = args.pdfs
+        if not paths:
+            for n_pages in args.pages:
+                path = Path(tmp) / f"sample_{n_pages}_pages.pdf"
+                path.write_bytes(synthetic_pdf(n_pages))
+                paths.append(path)
+        results = bench(paths, args.backends, args.reference, args.workers)
+
+    output = json.dumps({"backends": args.backends, "results": results}, indent=2)
+    if args.out:
+        args.out.write_text(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""Benchmark `core.scoring.perplexity_check` against the original dict-based version.
+
+Generates synthetic texts with a Zipf-like word distribution and reports wall
+time and peak memory (tracemalloc) of both implementations.
+
+    python benchmarks/perplexity_bench.py --words 10000 100000 500000
+"""
+
+import argparse
+import math
+import random
+import sys
+import time
+import tracemalloc
+from collections import defaultdict
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from core.scoring import TrigramModel  # noqa: E402
+
+
+def perplexity_reference(text: str) -> float:
+    """The original implementation of `perplexity_check`, kept for comparison."""
+    words = text.split()
+    trigram_counts = defaultdict(int)
+    bigram_counts = defaultdict(int)
+    unigram_counts = defaultdict(int)
+
+    for i in range(len(words)):
+        unigram_counts[words[i]] += 1
+        if i >= 1:
+            bigram_counts[(words[i - 1], words[i])] += 1
+        if i >= 2:
+            trigram_counts[(words[i - 2], words[i - 1], words[i])] += 1
+
+    V = len(unigram_counts)
+    N = len(words)
+
+    log_perp = 0.0
+    for i in range(2, N):
+        trigram = (words[i - 2], words[i - 1], words[i])
+        bigram = (words[i - 2], words[i - 1])
+        count_trigram = trigram_counts[trigram] + 1
+        count_bigram = bigram_counts[bigram] + V
+        log_perp += -math.log(count_trigram / count_bigram)
+
+    return math.exp(log_perp / (N - 2))
+
+
+def perplexity_vectorized(text: str) -> float:
+    return TrigramModel().update(text).perplexity()
+
+
+def synthetic_text(n_words: int, vocab_size: int = 20_000, seed: int = 0) -> str:
+    rng = random.Random(seed)
+    vocab = [f"w{i}" for i in range(vocab_size)]
+    weights = [1 / (rank + 1) for rank in range(vocab_size)]
+    return " ".join(rng.choices(vocab, weights=weights, k=n_words))
+
+
+def measure(fn, text: str) -> tuple[float, float, float]:
+    """Return (result, seconds, peak MiB)."""
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = fn(text)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak / 2**20
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--words", type=int, nargs="+", default=[10_000, 100_000, 500_000])
+    args = parser.parse_args()
+
+    print(f"{'words':>9} {'impl':>11} {'seconds':>9} {'peak MiB':>9} {'perplexity':>11}")
+    for n_words in args.words:
+        text = synthetic_text(n_words)
+        for name, fn in [("reference", perplexity_reference), ("vectorized", perplexity_vectorized)]:
+            result, seconds, peak = measure(fn, text)
+            print(f"{n_words:>9,} {name:>11} {seconds:>9.3f} {peak:>9.1f} {result:>11.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+import sqlite3
+
+from core.cache import DiskCache
+
+
+def test_memoize_hits_disk_across_instances(tmp_path):
+    calls = []
+
+    def translate(text, model="gpt-4o-mini"):
+        calls.append(text)
+        return text.upper()
+
+    first = DiskCache(tmp_path / "cache.sqlite3").memoize("Translate: {text}", temperature=0.2)(
+        translate
+    )
+    assert first("hallo") == "HALLO"
+    # a new instance (e.g. after a redeploy) reads the same file
+    cache = DiskCache(tmp_path / "cache.sqlite3")
+    second = cache.memoize("Translate: {text}", temperature=0.2)(translate)
+    assert second("hallo") == "HALLO"
+    assert calls == ["hallo"]
+    # changing the prompt or model is a different entry
+    cache.memoize("Translate better: {text}", temperature=0.2)(translate)("hallo")
+    second("hallo", model="gpt-4o")
+    assert len(calls) == 3
+    assert cache.stats()["hits"] == 1
+
+
+def test_lru_and_ttl_eviction(tmp_path):
+    now = [0.0]
+    cache = DiskCache(tmp_path / "cache.sqlite3", max_entries=2, ttl=100, clock=lambda: now[0])
+    cache.set("a", "1")
+    now[0] += 1
+    cache.set("b", "2")
+    now[0] += 1
+    assert cache.get("a") == "1"  # "b" is now least recently used
+    now[0] += 1
+    cache.set("c", "3")
+    assert cache.get("b") is None
+    assert cache.get("a") == "1"
+    now[0] += 200
+    assert cache.get("c") is None
+    assert cache.stats()["entries"] <= 2
+
+
+def test_running_totals_match_the_entries(tmp_path):
+    cache = DiskCache(tmp_path / "cache.sqlite3", max_bytes=10, ttl=None)
+    cache.set("a", "1234")
+    cache.set("a", "12")  # replaced, not counted twice
+    cache.set("b", "12345")
+    cache.set("c", "123456")  # over max_bytes: "a" and "b" are evicted
+    with sqlite3.connect(tmp_path / "cache.sqlite3") as db:
+        actual = db.execute("SELECT COUNT(*), SUM(size) FROM entries").fetchone()
+    stats = cache.stats()
+    assert (stats["entries"], stats["bytes"]) == actual == (1, 6)
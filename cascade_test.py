@@ -0,0 +1,75 @@
+from core import pipeline
+from core.scoring import failed_checks, translation_scores
+from core.tm import TranslationMemory
+
+GERMAN = "Der Mieter zahlt die Miete jeweils am ersten Werktag eines jeden Monats."
+ENGLISH = "The tenant pays the rent on the first working day of every month."
+JAPANESE = "借主は毎月最初の営業日に家賃を支払う。"
+CHINESE = "租户在每个月的第一个工作日支付租金。"
+
+
+def test_scores_flag_untranslated_and_truncated_chunks():
+    good = translation_scores(GERMAN, ENGLISH)
+    assert failed_checks(good) == []
+    assert good["untranslated"] == 0.0
+    assert failed_checks(translation_scores(GERMAN, GERMAN)) == ["untranslated"]
+    assert failed_checks(translation_scores(GERMAN * 4, ENGLISH)) == ["length_ratio"]
+
+
+def test_length_ratio_works_across_scripts():
+    # in characters, the English translation is more than three times as long
+    for source in (JAPANESE, CHINESE):
+        assert 0.8 < translation_scores(source, ENGLISH)["length_ratio"] < 1.25
+        assert 0.8 < translation_scores(ENGLISH, source, "Japanese")["length_ratio"] < 1.25
+    assert translation_scores(JAPANESE * 4, ENGLISH)["length_ratio"] < 0.5
+
+
+def test_cascade_escalates_only_failing_chunks(monkeypatch):
+    calls = []
+
+    def translate(text, model="gpt-4o-mini", language="English"):
+        calls.append((text, model))
+        # the cheap model leaves the second chunk in German
+        if model == "cheap" and text == "zwei":
+            return GERMAN
+        return ENGLISH
+
+    monkeypatch.setattr(pipeline, "translate_subchunk", translate)
+    monkeypatch.setattr(
+        pipeline, "translation_scores", lambda source, out, language: translation_scores(GERMAN, out)
+    )
+    processed = pipeline.process_chunks(
+        ["eins", "zwei", "drei"], use_memory=False, max_in_flight=1, models=["cheap", "strong"]
+    )
+    assert processed == [ENGLISH] * 3
+    assert calls == [("eins", "cheap"), ("zwei", "cheap"), ("zwei", "strong"), ("drei", "cheap")]
+
+
+def test_rejected_first_attempt_is_not_stored(tmp_path, monkeypatch):
+    memory = TranslationMemory(tmp_path / "tm.sqlite3")
+    monkeypatch.setattr(pipeline, "get_memory", lambda: memory)
+    # the cheap model leaves everything in German, the strong one translates
+    monkeypatch.setattr(pipeline, "translate_segments", lambda segments, model, language: [GERMAN])
+    monkeypatch.setattr(pipeline, "translate_subchunk", lambda text, model, language: ENGLISH)
+    assert pipeline.translate_cascade(GERMAN, ["cheap", "strong"]) == ENGLISH
+    assert memory.lookup([GERMAN], "English") == {}
+
+    monkeypatch.setattr(pipeline, "translate_segments", lambda segments, model, language: [ENGLISH])
+    assert pipeline.translate_cascade(GERMAN, ["cheap", "strong"]) == ENGLISH
+    assert list(memory.lookup([GERMAN], "English").values()) == [ENGLISH]
+
+
+def test_only_flagged_chunks_are_reviewed(monkeypatch):
+    reviewed = []
+
+    def review_chunk(text, before="", after="", model="gpt-5-nano", language="English"):
+        reviewed.append(text)
+        return text.lower()
+
+    monkeypatch.setattr(pipeline, "review_chunk", review_chunk)
+    processed = [ENGLISH, GERMAN]
+    flagged = pipeline.flag_chunks([GERMAN, GERMAN], processed)
+    assert flagged == [1]
+    output = pipeline.finish_document(processed, review_only=set(flagged), max_in_flight=1)
+    assert reviewed == [GERMAN]
+    assert output == f"{ENGLISH}\n\n{GERMAN.lower()}"
@@ -0,0 +1,70 @@
+import pytest
+
+from core import pipeline
+from core.checkpoint import CheckpointStore, prompt_version
+
+
+def test_checkpoint_needs_the_same_source(tmp_path):
+    store = CheckpointStore(tmp_path / "cp.sqlite3")
+    store.set("doc", 0, "gpt-4o-mini", "v1", "Der Mieter zahlt.", "The tenant pays.")
+    assert store.get("doc", 0, "gpt-4o-mini", "v1", "Der Mieter zahlt.") == "The tenant pays."
+    assert store.get("doc", 0, "gpt-4o-mini", "v1", "Der Mieter zahlt nicht.") is None
+    assert store.get("doc", 0, "gpt-4o", "v1", "Der Mieter zahlt.") is None
+    assert store.get("doc", 0, "gpt-4o-mini", "v2", "Der Mieter zahlt.") is None
+    assert store.count("doc") == 1
+    store.clear("doc")
+    assert store.count("doc") == 0
+
+
+def test_old_checkpoints_are_dropped(tmp_path):
+    now = [1000.0]
+    store = CheckpointStore(tmp_path / "cp.sqlite3", ttl=60, clock=lambda: now[0])
+    store.set("doc", 0, "m", "v", "a", "A")
+    now[0] += 120
+    assert CheckpointStore(tmp_path / "cp.sqlite3", ttl=60, clock=lambda: now[0]).count("doc") == 0
+
+
+def test_prompt_version_changes_with_the_prompt():
+    assert prompt_version("a", "b") == prompt_version("a", "b")
+    assert prompt_version("a", "b") != prompt_version("a", "c")
+
+
+def test_failed_run_resumes_with_the_missing_chunks(monkeypatch):
+    calls = []
+    fail = {"c"}
+
+    def translate(text, model="gpt-4o-mini", language="English"):
+        calls.append(text)
+        if text in fail:
+            raise RuntimeError("API error")
+        return text.upper()
+
+    monkeypatch.setattr(pipeline, "translate_subchunk", translate)
+    chunks = ["a", "b", "c", "d"]
+    with pytest.raises(RuntimeError):
+        pipeline.process_chunks(chunks, use_memory=False, max_in_flight=1, doc_id="doc")
+    assert calls == ["a", "b", "c"]
+
+    fail.clear()
+    calls.clear()
+    processed = pipeline.process_chunks(chunks, use_memory=False, max_in_flight=1, doc_id="doc")
+    assert processed == ["A", "B", "C", "D"]
+    assert calls == ["c", "d"]
+
+    # a revision of the document only sends the chunks whose text changed
+    calls.clear()
+    reused = []
+    processed = pipeline.process_chunks(
+        ["a", "x", "c", "d"], use_memory=False, max_in_flight=1, doc_id="v2", on_reuse=reused.append
+    )
+    assert processed == ["A", "X", "C", "D"]
+    assert calls == ["x"]
+    assert reused == [0, 2, 3]
+
+
+def test_chunks_are_found_by_their_text(tmp_path):
+    store = CheckpointStore(tmp_path / "cp.sqlite3")
+    store.set("v1", 3, "gpt-4o-mini", "v1", "Der Mieter zahlt.", "The tenant pays.")
+    assert store.find("gpt-4o-mini", "v1", "Der Mieter zahlt.") == "The tenant pays."
+    assert store.find("gpt-4o", "v1", "Der Mieter zahlt.") is None
+    assert store.find("gpt-4o-mini", "v1", "Der Mieter zahlt nicht.") is None
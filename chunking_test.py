@@ -0,0 +1,101 @@
+import math
+import random
+import re
+
+import pytest
+
+from core import chunking
+from core.chunking import chunk_spans, iter_token_chunks, split_into_token_chunks, token_budget
+from core.scoring import TrigramModel, perplexity_check
+
+
+class WordEncoder:
+    """Stand-in for tiktoken: one token per word (incl. trailing whitespace)."""
+
+    def encode(self, text):
+        self.words = re.findall(r"\S+\s*|\s+", text)
+        return list(range(len(self.words)))
+
+    def decode_with_offsets(self, tokens):
+        offsets, pos = [], 0
+        for word in self.words:
+            offsets.append(pos)
+            pos += len(word)
+        return "".join(self.words), offsets
+
+
+TEXT = "Erster Satz hier. Zweiter Satz ist länger als der erste. Dritter Satz. Vierter."
+
+
+def test_chunks_break_between_sentences():
+    chunks = split_into_token_chunks(TEXT, max_tokens=8, enc=WordEncoder())
+    assert chunks == [
+        "Erster Satz hier.",
+        "Zweiter Satz ist länger als der erste.",
+        "Dritter Satz. Vierter.",
+    ]
+    spans = chunk_spans(TEXT, max_tokens=8, enc=WordEncoder())
+    assert TEXT[spans[0][0] : spans[0][1]].strip() == chunks[0]
+
+
+def test_long_sentences_are_cut_and_overlap_repeats_context():
+    assert split_into_token_chunks("a b c d e", max_tokens=2, enc=WordEncoder()) == ["a b", "c d", "e"]
+    chunks = split_into_token_chunks(TEXT, max_tokens=12, overlap=3, enc=WordEncoder())
+    assert chunks[0].endswith("Dritter Satz.")
+    assert chunks[1] == "Dritter Satz. Vierter."
+
+
+def test_stream_packs_across_pages():
+    pages = ["Seite eins. Noch ein Satz.", "Seite zwei.", "Seite drei ist hier."]
+    assert list(iter_token_chunks(iter(pages), max_tokens=6, enc=WordEncoder())) == [
+        "Seite eins. Noch ein Satz.",
+        "Seite zwei. Seite drei ist hier.",
+    ]
+
+
+def test_content_defined_chunks_survive_an_edit():
+    rng = random.Random(0)
+    sentences = [f"Satz {i} handelt von{' Paragraph' * rng.randint(0, 9)} {i}." for i in range(200)]
+    edited = sentences[:100] + ["Ein ganz neuer Satz wurde hier eingefügt."] + sentences[100:]
+    edited[150] = "Dieser Satz wurde geändert."
+
+    def chunks(text):
+        return split_into_token_chunks(text, max_tokens=60, enc=WordEncoder(), content_defined=True)
+
+    before = chunks(" ".join(sentences))
+    after = chunks(" ".join(edited))
+    assert " ".join(after) == " ".join(edited)
+    assert all(len(chunk.split()) <= 60 for chunk in after)
+    # only the chunks around the two edits are new
+    assert len(set(after) - set(before)) <= 4
+    assert len(set(after) & set(before)) >= len(before) - 4
+    # the same anchors when the text comes in as pages
+    pages = [" ".join(edited[i : i + 17]) for i in range(0, len(edited), 17)]
+    streamed = list(
+        iter_token_chunks(iter(pages), max_tokens=60, enc=WordEncoder(), content_defined=True)
+    )
+    assert len(set(streamed) & set(before)) >= len(before) // 2
+
+
+def test_content_defined_chunks_reach_a_quarter_of_max_tokens(monkeypatch):
+    # every sentence is an anchor, so a chunk ends as soon as it may
+    monkeypatch.setattr(chunking, "_anchor_hash", lambda text: 0)
+    for words, max_tokens, expected in [(1, 40, 10), (2, 40, 10), (3, 40, 12), (1, 43, 10), (5, 40, 10)]:
+        sentence = " ".join(["Wort"] * (words - 1) + ["Satz."])
+        chunks = split_into_token_chunks(
+            " ".join([sentence] * 40), max_tokens=max_tokens, enc=WordEncoder(), content_defined=True
+        )
+        assert {len(chunk.split()) for chunk in chunks[:-1]} == {expected}, (words, max_tokens)
+
+
+def test_token_budget_respects_context_window():
+    assert token_budget("gpt-4o-mini", prompt_tokens=1000, output_tokens=4000) == 123_000
+    assert token_budget("gpt-4o-mini", prompt_tokens=1000, output_tokens=4000, max_tokens=3000) == 3000
+
+
+def test_perplexity_matches_hand_computed_value_and_updates_incrementally():
+    # "a b a b": V=2, trigrams (a,b,a) and (b,a,b) once each, contexts (a,b) x2, (b,a) x1
+    expected = math.exp(-(math.log(2 / 4) + math.log(2 / 3)) / 2)
+    assert perplexity_check("a b a b") == pytest.approx(expected)
+    assert TrigramModel().update("a b").update("a b").perplexity() == pytest.approx(expected)
+    assert perplexity_check("zu kurz") == 1.0
@@ -0,0 +1,49 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from core.client import ConnectionStats, build_http_client
+
+
+class KeepAlive(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        payload = json.dumps({"ok": True}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), KeepAlive)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+
+
+def test_requests_reuse_one_connection(server):
+    stats = ConnectionStats()
+    with build_http_client(stats) as http:
+        for _ in range(5):
+            assert http.get(server).json() == {"ok": True}
+
+    snapshot = stats.snapshot()
+    assert snapshot["requests"] == 5
+    assert snapshot["connections"] == 1
+    assert snapshot["reuse_ratio"] == pytest.approx(0.8)
+
+
+def test_pool_limits_and_timeouts_are_applied():
+    http = build_http_client(ConnectionStats(), connect_timeout=2, read_timeout=30)
+    assert http.timeout.connect == 2
+    assert http.timeout.read == 30
+    http.close()
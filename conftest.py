@@ -0,0 +1,27 @@
+import pytest
+
+from core import checkpoint, tracing, uploads
+
+
+@pytest.fixture(autouse=True)
+def trace_store(tmp_path, monkeypatch):
+    """Keep spans recorded by the tests out of the real trace file."""
+    store = tracing.SpanStore(tmp_path / "traces.sqlite3")
+    monkeypatch.setattr(tracing, "_store", store)
+    return store
+
+
+@pytest.fixture(autouse=True)
+def checkpoints(tmp_path, monkeypatch):
+    """Start every test without checkpoints of earlier runs."""
+    store = checkpoint.CheckpointStore(tmp_path / "checkpoints.sqlite3")
+    monkeypatch.setattr(checkpoint, "_store", store)
+    return store
+
+
+@pytest.fixture(autouse=True)
+def upload_store(tmp_path, monkeypatch):
+    """Keep uploads of the tests out of the real upload store."""
+    store = uploads.UploadStore(tmp_path / "uploads")
+    monkeypatch.setattr(uploads, "_store", store)
+    return store
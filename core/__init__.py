@@ -0,0 +1,21 @@
+"""Streamlit-free core of the translation app.
+
+- `extract`: text extraction from PDF/DOCX files, with pluggable PDF backends
+- `pdf_worker`: the worker processes the slow PDF extraction runs in
+- `chunking`: token-bounded chunking on sentence boundaries
+- `prompts`: prompt templates
+- `pipeline`: model calls for translation, review and summaries
+- `client`: the shared OpenAI client and its connection pool
+- `tracing`: latency/token/cost spans of model calls and stages
+- `jobs`: background jobs that run a document through the pipeline
+- `checkpoint`: per-chunk checkpoints, so failed document runs resume
+- `uploads`: content-addressed on-disk store of uploaded documents
+- `scoring`: local quality scores (perplexity, length ratio, untranslated share)
+- `langid`: offline language detection, to skip text that needs no translation
+- `engine`, `ratelimit`, `cache`, `tm`: concurrency, rate limiting, caching
+  and the translation memory
+
+Heavy dependencies (pdfplumber, pypdfium2, python-docx, tiktoken, numpy, openai) are
+imported inside the functions that need them, so importing any of these
+modules is cheap. The Streamlit layer on top lives in `helper`.
+"""
@@ -0,0 +1,238 @@
+"""Disk-backed cache for model outputs, shared between processes and restarts.
+
+Entries live in a single SQLite file, so every Streamlit process (and replica,
+if the file is on a shared volume) sees the same translations. Keys are built
+from the model, a hash of the prompt template, the temperature and the sha256
+of the input text. Old entries are dropped least-recently-used first once the
+cache grows past `max_entries` / `max_bytes`, or when older than `ttl` seconds.
+The number of entries and their total size are kept up to date by triggers
+in the stats table, so a write never has to scan the cache to check the
+limits.
+
+Configured through the environment: `LLMDCP_CACHE_PATH`,
+`LLMDCP_CACHE_MAX_ENTRIES`, `LLMDCP_CACHE_MAX_BYTES` and `LLMDCP_CACHE_TTL`.
+"""
+
+import contextlib
+import functools
+import hashlib
+import inspect
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Optional
+
+from core.extract import file_hash
+from core.tracing import span
+
+DEFAULT_PATH = Path(__file__).parent.parent / ".cache" / "llm_cache.sqlite3"
+
+# seconds between two sweeps of the expired entries (reads skip them anyway)
+PURGE_INTERVAL = 600
+
+# `size` goes before `value`, so scans over sizes don't read through the values
+_ENTRIES = """CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    created REAL NOT NULL,
+    last_used REAL NOT NULL,
+    value TEXT NOT NULL
+)"""
+
+_TRIGGERS = [
+    """CREATE TRIGGER IF NOT EXISTS entries_insert AFTER INSERT ON entries BEGIN
+        UPDATE stats SET count = count + 1 WHERE name = 'entries';
+        UPDATE stats SET count = count + new.size WHERE name = 'bytes';
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS entries_delete AFTER DELETE ON entries BEGIN
+        UPDATE stats SET count = count - 1 WHERE name = 'entries';
+        UPDATE stats SET count = count - old.size WHERE name = 'bytes';
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS entries_update AFTER UPDATE OF size ON entries BEGIN
+        UPDATE stats SET count = count + new.size - old.size WHERE name = 'bytes';
+    END""",
+]
+
+
+class DiskCache:
+    """SQLite key/value store with LRU eviction and hit/miss counters.
+
+    Args:
+        path: Location of the SQLite file (created if missing).
+        max_entries: Maximum number of entries kept.
+        max_bytes: Maximum total size of the cached values.
+        ttl: Entries older than this many seconds count as misses. `None`
+            keeps entries until they are evicted.
+    """
+
+    def __init__(
+        self,
+        path=DEFAULT_PATH,
+        max_entries: int = 100_000,
+        max_bytes: int = 500 * 1024 * 1024,
+        ttl: Optional[float] = 30 * 24 * 3600,
+        clock=time.time,
+    ):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.clock = clock
+        with self._connect() as db:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("BEGIN IMMEDIATE")
+            db.execute(_ENTRIES)
+            db.execute("CREATE INDEX IF NOT EXISTS entries_last_used ON entries (last_used)")
+            db.execute("CREATE INDEX IF NOT EXISTS entries_created ON entries (created)")
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS stats (name TEXT PRIMARY KEY, count INTEGER NOT NULL)"
+            )
+            # `entries` and `bytes` are running totals, kept by the triggers
+            db.execute(
+                "INSERT OR IGNORE INTO stats VALUES ('hits', 0), ('misses', 0), ('entries', 0), ('bytes', 0)"
+            )
+            for trigger in _TRIGGERS:
+                db.execute(trigger)
+            db.execute("COMMIT")
+        self._purged = None
+
+    @contextlib.contextmanager
+    def _connect(self):
+        # a fresh connection per call keeps this safe to use from worker threads
+        db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        try:
+            yield db
+        finally:
+            db.close()
+
+    @staticmethod
+    def key(model: str, template: str, temperature: float, text: str, extra: str = "") -> str:
+        """Cache key for one model call."""
+        template_hash = hashlib.sha256(template.encode()).hexdigest()
+        parts = [model, template_hash, repr(float(temperature)), file_hash(text.encode()), extra]
+        return hashlib.sha256("\0".join(parts).encode()).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        now = self.clock()
+        with self._connect() as db:
+            row = db.execute("SELECT value, created FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is not None and self.ttl is not None and row[1] < now - self.ttl:
+                db.execute("DELETE FROM entries WHERE key = ?", (key,))
+                row = None
+            if row is None:
+                db.execute("UPDATE stats SET count = count + 1 WHERE name = 'misses'")
+                return None
+            db.execute("UPDATE entries SET last_used = ? WHERE key = ?", (now, key))
+            db.execute("UPDATE stats SET count = count + 1 WHERE name = 'hits'")
+            return row[0]
+
+    def set(self, key: str, value: str):
+        now = self.clock()
+        with self._connect() as db:
+            # an upsert, not INSERT OR REPLACE: its implicit delete wouldn't fire the trigger
+            db.execute(
+                """INSERT INTO entries VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT (key) DO UPDATE SET
+                    size = excluded.size, created = excluded.created,
+                    last_used = excluded.last_used, value = excluded.value""",
+                (key, len(value.encode()), now, now, value),
+            )
+            self._evict(db, now)
+
+    def _totals(self, db) -> tuple[int, int]:
+        totals = dict(db.execute("SELECT name, count FROM stats WHERE name IN ('entries', 'bytes')"))
+        return totals["entries"], totals["bytes"]
+
+    def _evict(self, db, now: float):
+        if self.ttl is not None and (self._purged is None or now - self._purged >= PURGE_INTERVAL):
+            db.execute("DELETE FROM entries WHERE created < ?", (now - self.ttl,))
+            self._purged = now
+        count, size = self._totals(db)
+        if count <= self.max_entries and size <= self.max_bytes:
+            return
+        # walk from least recently used until we are back under both limits
+        drop = []
+        for key, entry_size in db.execute("SELECT key, size FROM entries ORDER BY last_used"):
+            if count <= self.max_entries and size <= self.max_bytes:
+                break
+            drop.append((key,))
+            count -= 1
+            size -= entry_size
+        db.executemany("DELETE FROM entries WHERE key = ?", drop)
+
+    def stats(self) -> dict:
+        """Hit/miss counters and current size of the cache."""
+        with self._connect() as db:
+            return dict(db.execute("SELECT name, count FROM stats"))
+
+    def memoize(self, template: str, temperature: float):
+        """Decorator caching a `fn(text, ..., model=...)` model call on disk.
+
+        The first argument of `fn` is the input text. `template` is the prompt
+        template the function fills in, so changing the prompt invalidates old
+        entries. Any other arguments of the call become part of the key as well.
+        """
+
+        def decorator(fn):
+            signature = inspect.signature(fn)
+
+            @functools.wraps(fn)
+            def wrapped(*args, **kwargs):
+                bound = signature.bind(*args, **kwargs)
+                bound.apply_defaults()
+                params = dict(bound.arguments)
+                text = params.pop(next(iter(params)))
+                model = params.pop("model")
+                key = self.key(model, template, temperature, text, extra=repr(sorted(params.items())))
+                with span(fn.__name__, model=model) as attrs:
+                    cached = self.get(key)
+                    attrs["cache_hit"] = cached is not None
+                    if cached is not None:
+                        return cached
+                    result = fn(*args, **kwargs)
+                self.set(key, result)
+                return result
+
+            return wrapped
+
+        return decorator
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache() -> DiskCache:
+    """Return the process-wide cache configured from the environment."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            ttl = os.environ.get("LLMDCP_CACHE_TTL")
+            _cache = DiskCache(
+                path=os.environ.get("LLMDCP_CACHE_PATH", DEFAULT_PATH),
+                max_entries=int(os.environ.get("LLMDCP_CACHE_MAX_ENTRIES", 100_000)),
+                max_bytes=int(os.environ.get("LLMDCP_CACHE_MAX_BYTES", 500 * 1024 * 1024)),
+                ttl=float(ttl) if ttl else 30 * 24 * 3600,
+            )
+        return _cache
+
+
+def memoize(template: str, temperature: float):
+    """`DiskCache.memoize` on the process-wide cache, opened on first call."""
+
+    def decorator(fn):
+        cached_fns = {}
+
+        @functools.wraps(fn)
+        def wrapped(*args, **kwargs):
+            cache = get_cache()
+            if cache not in cached_fns:
+                cached_fns[cache] = cache.memoize(template, temperature)(fn)
+            return cached_fns[cache](*args, **kwargs)
+
+        return wrapped
+
+    return decorator
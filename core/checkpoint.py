@@ -0,0 +1,177 @@
+"""Per-chunk checkpoints of document runs, so a failed or interrupted run resumes.
+
+Every processed chunk is written down as soon as its model call returns,
+keyed by the document hash, the chunk index, the model and a version hash of
+the prompt(s). Running the same document again (after a failed API call, a
+closed tab or a restart) takes the finished chunks from here and only sends
+the missing ones. A checkpoint is only used if the chunk text still matches,
+so a change to the chunking never mixes up sections.
+
+Chunks are also looked up by their text alone: a revised version of a
+document (a new file, so a new hash) takes every chunk whose text it shares
+with an earlier version from that version's checkpoints. Together with the
+content-defined chunk boundaries of `chunking`, re-translating a revision
+costs about as much as the edit, not the whole document.
+
+Lives in a SQLite file next to the cache, configured through
+`LLMDCP_CHECKPOINT_PATH` and `LLMDCP_CHECKPOINT_TTL` (seconds, default 7 days).
+"""
+
+import contextlib
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Optional
+
+from core.extract import file_hash
+
+DEFAULT_PATH = Path(__file__).parent.parent / ".cache" / "checkpoints.sqlite3"
+
+
+def prompt_version(*templates: str) -> str:
+    """Short hash of the prompt templates a chunk was processed with."""
+    return hashlib.sha256("\0".join(templates).encode()).hexdigest()[:16]
+
+
+class CheckpointStore:
+    """SQLite store of processed chunks.
+
+    Args:
+        path: Location of the SQLite file (created if missing).
+        ttl: Checkpoints older than this many seconds are dropped when the
+            store is opened. `None` keeps them forever.
+    """
+
+    def __init__(self, path=DEFAULT_PATH, ttl: Optional[float] = 7 * 24 * 3600, clock=time.time):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.clock = clock
+        with self._connect() as db:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute(
+                """CREATE TABLE IF NOT EXISTS chunks (
+                    document TEXT NOT NULL,
+                    idx INTEGER NOT NULL,
+                    model TEXT NOT NULL,
+                    prompt TEXT NOT NULL,
+                    source_hash TEXT NOT NULL,
+                    value TEXT NOT NULL,
+                    created REAL NOT NULL,
+                    PRIMARY KEY (document, idx, model, prompt)
+                )"""
+            )
+            db.execute("CREATE INDEX IF NOT EXISTS chunks_source ON chunks (source_hash, model, prompt)")
+            if ttl is not None:
+                db.execute("DELETE FROM chunks WHERE created < ?", (clock() - ttl,))
+
+    @contextlib.contextmanager
+    def _connect(self):
+        db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        try:
+            yield db
+        finally:
+            db.close()
+
+    def get(self, document: str, idx: int, model: str, prompt: str, source: str) -> Optional[str]:
+        """The checkpointed result of chunk `idx`, if its `source` text is unchanged."""
+        with self._connect() as db:
+            row = db.execute(
+                "SELECT source_hash, value FROM chunks WHERE document = ? AND idx = ? AND model = ? AND prompt = ?",
+                (document, idx, model, prompt),
+            ).fetchone()
+        if row is None or row[0] != file_hash(source.encode()):
+            return None
+        return row[1]
+
+    def find(self, model: str, prompt: str, source: str) -> Optional[str]:
+        """The latest checkpointed result of a chunk with this `source` text, from any document."""
+        with self._connect() as db:
+            row = db.execute(
+                "SELECT value FROM chunks WHERE source_hash = ? AND model = ? AND prompt = ? "
+                "ORDER BY created DESC LIMIT 1",
+                (file_hash(source.encode()), model, prompt),
+            ).fetchone()
+        return None if row is None else row[0]
+
+    def set(self, document: str, idx: int, model: str, prompt: str, source: str, value: str):
+        with self._connect() as db:
+            db.execute(
+                "INSERT OR REPLACE INTO chunks VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (document, idx, model, prompt, file_hash(source.encode()), value, self.clock()),
+            )
+
+    def count(self, document: str) -> int:
+        """Number of checkpointed chunks of `document`, over all models and prompts."""
+        with self._connect() as db:
+            return db.execute("SELECT COUNT(*) FROM chunks WHERE document = ?", (document,)).fetchone()[
+                0
+            ]
+
+    def clear(self, document: str):
+        with self._connect() as db:
+            db.execute("DELETE FROM chunks WHERE document = ?", (document,))
+
+
+def checkpointed(
+    fn: Callable[[str], str],
+    store: CheckpointStore,
+    document: str,
+    model: str,
+    prompt: str,
+    reuse: bool = True,
+    on_reuse: Optional[Callable[[int], None]] = None,
+) -> Callable[[tuple[int, str]], str]:
+    """Wrap a per-chunk `fn(text)` into `run((idx, text))` that checkpoints its result.
+
+    The result is stored as soon as `fn` returns, so chunks that finished
+    before another one failed are kept.
+
+    Args:
+        fn: Processes one chunk text.
+        store: Where the results are kept.
+        document: Hash of the document the chunks belong to.
+        model: Model (or models) `fn` calls.
+        prompt: `prompt_version` of the prompts `fn` uses.
+        reuse: Take chunks that aren't checkpointed for `document` from
+            another document with the same chunk text, e.g. an earlier
+            version of it.
+        on_reuse: Optional callback `(idx)` for every chunk that was taken
+            from the store instead of being sent to `fn`.
+    """
+
+    def run(item: tuple[int, str]) -> str:
+        idx, text = item
+        done = store.get(document, idx, model, prompt, text)
+        if done is None and reuse:
+            done = store.find(model, prompt, text)
+            if done is not None:
+                store.set(document, idx, model, prompt, text, done)
+        if done is not None:
+            if on_reuse is not None:
+                on_reuse(idx)
+            return done
+        result = fn(text)
+        store.set(document, idx, model, prompt, text, result)
+        return result
+
+    return run
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_checkpoints() -> CheckpointStore:
+    """Return the process-wide checkpoint store configured from the environment."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            ttl = os.environ.get("LLMDCP_CHECKPOINT_TTL")
+            _store = CheckpointStore(
+                os.environ.get("LLMDCP_CHECKPOINT_PATH", DEFAULT_PATH),
+                ttl=float(ttl) if ttl else 7 * 24 * 3600,
+            )
+        return _store
@@ -0,0 +1,180 @@
+"""Token-bounded chunking on sentence boundaries.
+
+With `content_defined`, chunk boundaries are picked by the text itself
+instead of by position: a chunk ends after a sentence whose hash hits an
+anchor condition (or when it is full). Editing a paragraph then only moves
+the boundaries around the edit, and the chunks before and after it come out
+exactly as before, so a revised document reuses the earlier run's
+translations for everything that didn't change.
+
+tiktoken is only imported (and its encoding loaded) on first use.
+"""
+
+import bisect
+import functools
+import zlib
+
+from core.tm import segment
+from core.tracing import traced
+
+
+@functools.lru_cache(maxsize=None)
+def get_tokenizer():
+    """GPT-4o-mini uses the encoding: cl100k_base"""
+    import tiktoken
+
+    return tiktoken.encoding_for_model("gpt-4o-mini")
+
+
+# context window of each model we call, in tokens
+CONTEXT_WINDOWS = {
+    "gpt-4o-mini": 128_000,
+    "gpt-4o": 128_000,
+    "gpt-5-nano": 400_000,
+}
+
+
+def token_budget(
+    model: str, prompt_tokens: int, output_tokens: int, max_tokens: int | None = None
+) -> int:
+    """Tokens left for the input text in one request to `model`.
+
+    Args:
+        model: Model the chunks are sent to.
+        prompt_tokens: Size of the prompt template wrapped around each chunk.
+        output_tokens: Tokens reserved for the answer (the request's `max_tokens`).
+        max_tokens: Optional lower cap, e.g. so a translation fits in `output_tokens`.
+    """
+    budget = CONTEXT_WINDOWS.get(model, 16_000) - prompt_tokens - output_tokens
+    if max_tokens is not None:
+        budget = min(budget, max_tokens)
+    return max(budget, 1)
+
+
+def _anchor_hash(text: str) -> int:
+    """Hash of a sentence, independent of its position and surrounding whitespace."""
+    return zlib.crc32(" ".join(text.split()).encode())
+
+
+def _sentence_units(text: str, base: int, enc, max_tokens: int):
+    """Yield `(start, end, n_tokens, hash)` for every sentence of `text`, offsets shifted by `base`.
+
+    The text is encoded exactly once; sentence token counts come from the
+    token start offsets. Sentences longer than `max_tokens` are cut at token
+    boundaries.
+    """
+    tokens = enc.encode(text)
+    _, offsets = enc.decode_with_offsets(tokens)
+    start = 0
+    for seg, sep in segment(text):
+        end = start + len(seg) + len(sep)
+        first = bisect.bisect_left(offsets, start)
+        last = bisect.bisect_left(offsets, end)
+        while last - first > max_tokens:
+            cut = offsets[first + max_tokens]
+            yield base + start, base + cut, max_tokens, _anchor_hash(text[start:cut])
+            start, first = cut, first + max_tokens
+        if end > start:
+            yield base + start, base + end, last - first, _anchor_hash(text[start:end])
+        start = end
+
+
+def _carry(chunk, overlap: int, room: int):
+    """Whole trailing units of `chunk`, up to `overlap` tokens, that fit in `room` tokens."""
+    carry = []
+    carried = 0
+    for prev in reversed(chunk):
+        if carried + prev[2] > min(overlap, room):
+            break
+        carry.insert(0, prev)
+        carried += prev[2]
+    return carry, carried
+
+
+def _pack_units(units, max_tokens: int, overlap: int = 0, content_defined: bool = False):
+    """Greedily pack consecutive units into `(start, end)` spans of <= max_tokens tokens.
+
+    With `overlap`, each span repeats whole trailing sentences of the previous
+    one, up to `overlap` tokens, so the model sees some context.
+
+    With `content_defined`, a span also ends after a sentence whose hash is
+    an anchor. A sentence of n tokens is an anchor with probability
+    n / (max_tokens / 2), so spans average about half of `max_tokens`
+    whatever the sentence lengths, and none is cut at an anchor before it
+    has a quarter of `max_tokens`.
+    """
+    target = max(max_tokens // 2, 1)
+    min_tokens = max_tokens // 4
+    chunk = []
+    tokens = 0
+    for unit in units:
+        full = tokens + unit[2] > max_tokens
+        anchored = (
+            content_defined and tokens >= min_tokens and chunk and chunk[-1][3] % target < chunk[-1][2]
+        )
+        if chunk and (full or anchored):
+            yield chunk[0][0], chunk[-1][1]
+            chunk, tokens = _carry(chunk, overlap, max_tokens - unit[2])
+        chunk.append(unit)
+        tokens += unit[2]
+    if chunk:
+        yield chunk[0][0], chunk[-1][1]
+
+
+def chunk_spans(
+    text: str, max_tokens: int = 2000, overlap: int = 0, enc=None, content_defined: bool = False
+) -> list[tuple[int, int]]:
+    """
+    Return `(start, end)` character offsets of chunks of `text` that are
+    <= max_tokens tokens long and only break between sentences (unless a
+    single sentence is longer than `max_tokens`).
+    """
+    enc = enc or get_tokenizer()
+    units = _sentence_units(text, 0, enc, max_tokens)
+    return list(_pack_units(units, max_tokens, overlap, content_defined))
+
+
+@traced
+def split_into_token_chunks(
+    text: str, max_tokens: int = 2000, overlap: int = 0, enc=None, content_defined: bool = False
+) -> list[str]:
+    """
+    Split a string into chunks that are <= max_tokens tokens long (roughly
+    the limit you can send to GPT-4o-mini in a single call), breaking
+    between sentences.
+    """
+    spans = chunk_spans(text, max_tokens, overlap, enc, content_defined)
+    return [text[start:end].strip() for start, end in spans]
+
+
+@traced
+def iter_token_chunks(
+    pages, max_tokens: int = 2000, overlap: int = 0, enc=None, content_defined: bool = False
+):
+    """Yield token-bounded chunks packed from a stream of page texts.
+
+    Pages are joined with a space and every page is tokenized once, so this
+    replaces cutting by characters first and by tokens second. Chunks are
+    yielded as soon as they are full, while later pages are still coming in.
+    """
+    enc = enc or get_tokenizer()
+    texts = []
+    starts = []
+
+    def units():
+        base = 0
+        for page in pages:
+            texts.append(page + " ")
+            starts.append(base)
+            yield from _sentence_units(page + " ", base, enc, max_tokens)
+            base += len(page) + 1
+
+    for start, end in _pack_units(units(), max_tokens, overlap, content_defined):
+        first = bisect.bisect_right(starts, start) - 1
+        last = bisect.bisect_right(starts, end - 1) - 1
+        parts = [texts[i] for i in range(first, last + 1)]
+        parts[-1] = parts[-1][: end - starts[last]]
+        parts[0] = parts[0][start - starts[first] :]
+        chunk = "".join(parts).strip()
+        if chunk:
+            yield chunk
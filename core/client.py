@@ -0,0 +1,118 @@
+"""The process-wide OpenAI client and its HTTP connection pool.
+
+Every page, session and worker thread shares one client, so connections (and
+their TLS sessions) are reused instead of being set up per rerun. The pool is
+tuned with environment variables:
+
+    OPENAI_MAX_CONNECTIONS     open connections at most (default 64)
+    OPENAI_MAX_KEEPALIVE       idle connections kept open (default 32)
+    OPENAI_KEEPALIVE_EXPIRY    seconds an idle connection is kept (default 60)
+    OPENAI_CONNECT_TIMEOUT     seconds to open a connection (default 5)
+    OPENAI_READ_TIMEOUT        seconds to wait for response data (default 120)
+    OPENAI_HTTP2               "1" to negotiate HTTP/2 (needs the `h2` package)
+"""
+
+import functools
+import os
+import threading
+
+
+def _httpx():
+    # openai 3 ships its own fork of httpx under another name
+    try:
+        import httpx2 as httpx
+    except ImportError:
+        import httpx
+    return httpx
+
+
+class ConnectionStats:
+    """Counts requests and the connections they had to open, across threads."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.connections = 0
+        self.tls_handshakes = 0
+
+    def on_request(self, request):
+        """httpx request hook: counts the request and traces its connection setup."""
+        with self._lock:
+            self.requests += 1
+        request.extensions["trace"] = self.trace
+
+    def trace(self, event: str, info: dict):
+        """httpcore `trace` extension, called for every step of a request."""
+        if event == "connection.connect_tcp.complete":
+            with self._lock:
+                self.connections += 1
+        elif event == "connection.start_tls.complete":
+            with self._lock:
+                self.tls_handshakes += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            requests, connections, tls = self.requests, self.connections, self.tls_handshakes
+        reused = max(requests - connections, 0)
+        return {
+            "requests": requests,
+            "connections": connections,
+            "tls_handshakes": tls,
+            "reused": reused,
+            "reuse_ratio": reused / requests if requests else 0.0,
+        }
+
+
+_stats = ConnectionStats()
+
+
+def connection_stats() -> dict:
+    """Requests, new connections and the share of requests on a reused connection."""
+    return _stats.snapshot()
+
+
+def build_http_client(
+    stats: ConnectionStats,
+    max_connections: int = 64,
+    max_keepalive: int = 32,
+    keepalive_expiry: float = 60,
+    connect_timeout: float = 5,
+    read_timeout: float = 120,
+    http2: bool = False,
+):
+    """An httpx client with a tuned pool that reports connection setup to `stats`."""
+    from openai import DefaultHttpxClient
+
+    httpx = _httpx()
+    return DefaultHttpxClient(
+        limits=httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive,
+            keepalive_expiry=keepalive_expiry,
+        ),
+        timeout=httpx.Timeout(read_timeout, connect=connect_timeout),
+        http2=http2,
+        event_hooks={"request": [stats.on_request]},
+    )
+
+
+@functools.lru_cache(maxsize=None)
+def get_client():
+    """Process-wide OpenAI client.
+
+    Reads `OPENAI_API_KEY` (and optionally `OPENAI_BASE_URL`) from the
+    environment; retries are handled by `ratelimit.chat_completion`. Streamlit
+    exports root-level secrets to the environment, so the pages share it too.
+    """
+    from openai import OpenAI
+
+    http_client = build_http_client(
+        _stats,
+        max_connections=int(os.environ.get("OPENAI_MAX_CONNECTIONS", 64)),
+        max_keepalive=int(os.environ.get("OPENAI_MAX_KEEPALIVE", 32)),
+        keepalive_expiry=float(os.environ.get("OPENAI_KEEPALIVE_EXPIRY", 60)),
+        connect_timeout=float(os.environ.get("OPENAI_CONNECT_TIMEOUT", 5)),
+        read_timeout=float(os.environ.get("OPENAI_READ_TIMEOUT", 120)),
+        http2=os.environ.get("OPENAI_HTTP2") == "1",
+    )
+    return OpenAI(max_retries=0, http_client=http_client)
@@ -0,0 +1,177 @@
+"""Concurrent execution engine used to fan out OpenAI calls.
+
+The API calls are network bound, so a thread pool is enough to overlap them.
+Results always come back in the order the inputs were given, no matter which
+call finishes first.
+"""
+
+import contextvars
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, Iterable, Optional, TypeVar
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+DEFAULT_MAX_IN_FLIGHT = 8
+
+
+def map_ordered(
+    fn: Callable[[T], R],
+    items: Iterable[T],
+    max_in_flight: int = DEFAULT_MAX_IN_FLIGHT,
+    on_result: Optional[Callable[[int, R], None]] = None,
+) -> list[R]:
+    """Call `fn` on every item concurrently and return the results in input order.
+
+    Args:
+        fn: Function to call for each item (e.g. `translate_subchunk`).
+        items: Inputs to process. Can be a generator, it is consumed lazily so
+            work starts before the last item is produced.
+        max_in_flight: Maximum number of calls running at the same time.
+        on_result: Optional callback `(index, result)`, called from the caller's
+            thread as soon as each call finishes (in completion order).
+    """
+    if max_in_flight < 1:
+        raise ValueError("max_in_flight must be at least 1")
+
+    results: dict[int, R] = {}
+    inputs = enumerate(items)
+    with ThreadPoolExecutor(max_workers=max_in_flight) as pool:
+        pending = {}
+
+        def top_up():
+            # never hold more than max_in_flight calls, so a generator input
+            # is only pulled as fast as the API can take it
+            while len(pending) < max_in_flight:
+                nxt = next(inputs, None)
+                if nxt is None:
+                    return
+                idx, item = nxt
+                # run in a copy of the caller's context, so tracing knows the document
+                pending[pool.submit(contextvars.copy_context().run, fn, item)] = idx
+
+        top_up()
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                idx = pending.pop(future)
+                try:
+                    results[idx] = future.result()
+                except BaseException:
+                    for other in pending:
+                        other.cancel()
+                    raise
+                if on_result is not None:
+                    on_result(idx, results[idx])
+            top_up()
+
+    return [results[i] for i in range(len(results))]
+
+
+def reduce_tree(
+    items: list[str],
+    merge: Callable[[list[str]], str],
+    count_tokens: Callable[[str], int],
+    budget: int,
+    max_in_flight: int = DEFAULT_MAX_IN_FLIGHT,
+) -> str:
+    """Merge `items` round by round until a single one is left.
+
+    Each round packs consecutive items into groups of at most `budget` tokens
+    (but always at least two items, so every round makes progress) and merges
+    the groups in parallel. The number of rounds grows with the logarithm of
+    `len(items)`.
+
+    Args:
+        items: Texts to merge, in document order.
+        merge: Merges a group of consecutive texts into one.
+        count_tokens: Token count of a text.
+        budget: Maximum tokens sent to one `merge` call.
+        max_in_flight: Maximum number of `merge` calls running at once.
+    """
+    if not items:
+        return ""
+    while len(items) > 1:
+        groups = [[]]
+        group_tokens = 0
+        for item in items:
+            tokens = count_tokens(item)
+            if len(groups[-1]) >= 2 and group_tokens + tokens > budget:
+                groups.append([])
+                group_tokens = 0
+            groups[-1].append(item)
+            group_tokens += tokens
+        # a lone trailing item is passed through instead of being merged alone
+        if len(groups) > 1 and len(groups[-1]) == 1:
+            single = groups.pop()[0]
+        else:
+            single = None
+        items = map_ordered(merge, groups, max_in_flight=max_in_flight)
+        if single is not None:
+            items.append(single)
+    return items[0]
+
+
+def pack(items: list[T], count_tokens: Callable[[T], int], budget: int, max_items: int) -> list[list[T]]:
+    """Group consecutive items into batches of at most `budget` tokens and `max_items` items.
+
+    An item that is over budget on its own gets a batch of its own.
+    """
+    batches = []
+    batch_tokens = 0
+    for item in items:
+        tokens = count_tokens(item)
+        if (
+            not batches
+            or len(batches[-1]) >= max_items
+            or (batches[-1] and batch_tokens + tokens > budget)
+        ):
+            batches.append([])
+            batch_tokens = 0
+        batches[-1].append(item)
+        batch_tokens += tokens
+    return batches
+
+
+def map_packed(
+    fn_batch: Callable[[list[T]], Optional[list[R]]],
+    items: list[T],
+    fn_one: Callable[[T], R],
+    count_tokens: Callable[[T], int],
+    budget: int,
+    max_items: int = 50,
+    max_in_flight: int = DEFAULT_MAX_IN_FLIGHT,
+) -> list[R]:
+    """Apply a batched call to many short items, with far fewer calls than items.
+
+    Items are packed with `pack` and the batches run in parallel. A batch
+    whose answer doesn't have exactly one result per item is split in half
+    and retried, down to `fn_one` for a single item, so one bad answer only
+    costs the calls needed to isolate it.
+
+    Args:
+        fn_batch: Processes a batch in one call; returns one result per item,
+            or `None` if the answer couldn't be unpacked.
+        items: Inputs, results come back in the same order.
+        fn_one: Processes a single item on its own.
+        count_tokens: Token count of an item.
+        budget: Maximum tokens packed into one `fn_batch` call.
+        max_items: Maximum items packed into one `fn_batch` call.
+        max_in_flight: Maximum number of batches running at once.
+    """
+
+    def run(batch: list[T]) -> list[R]:
+        if len(batch) == 1:
+            return [fn_one(batch[0])]
+        results = fn_batch(batch)
+        if results is not None and len(results) == len(batch):
+            return results
+        mid = len(batch) // 2
+        return run(batch[:mid]) + run(batch[mid:])
+
+    batches = pack(items, count_tokens, budget, max_items)
+    return [
+        result
+        for results in map_ordered(run, batches, max_in_flight=max_in_flight)
+        for result in results
+    ]
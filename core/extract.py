@@ -0,0 +1,278 @@
+"""Text extraction from uploaded PDF and DOCX files.
+
+PDFs go through one of the `PDF_BACKENDS`. pdfplumber, pypdfium2 and
+python-docx are only imported when a document is read.
+"""
+
+import hashlib
+import io
+import os
+import tempfile
+import threading
+from collections import deque
+from contextlib import ExitStack
+
+from core.tracing import traced
+
+
+def file_hash(file_bytes: bytes) -> str:
+    return hashlib.sha256(file_bytes).hexdigest()
+
+
+def file_digest(path) -> str:
+    """`file_hash` of a file on disk, read in blocks instead of all at once."""
+    with open(path, "rb") as f:
+        return hashlib.file_digest(f, "sha256").hexdigest()
+
+
+def _source(source):
+    """Bytes stay bytes, paths become `str` (which every reader accepts)."""
+    return source if isinstance(source, bytes) else os.fspath(source)
+
+
+@traced
+def read_docx(file) -> str:
+    """Text of a DOCX file given as bytes, a path or a binary file object."""
+    import docx
+
+    if isinstance(file, bytes):
+        file = io.BytesIO(file)
+    elif isinstance(file, os.PathLike):
+        file = os.fspath(file)
+    doc = docx.Document(file)
+    return "\n".join([para.text for para in doc.paragraphs])
+
+
+def _collapse(text: str) -> str:
+    # very long PDFs often contain a lot of whitespace. So collapse it.
+    return " ".join(text.split())
+
+
+def _pdfplumber_pages(source, start: int, stop: int) -> list[str]:
+    """Layout-aware extraction: words are regrouped into lines by position. Slow."""
+    import pdfplumber
+
+    if isinstance(source, bytes):
+        source = io.BytesIO(source)
+    with pdfplumber.open(source) as pdf:
+        return [_collapse(page.extract_text() or "") for page in pdf.pages[start:stop]]
+
+
+def _pdfplumber_pages_at(source, indexes: list[int]) -> list[str]:
+    """`_pdfplumber_pages` for scattered pages, opening the PDF only once."""
+    import pdfplumber
+
+    if isinstance(source, bytes):
+        source = io.BytesIO(source)
+    with pdfplumber.open(source) as pdf:
+        return [_collapse(pdf.pages[i].extract_text() or "") for i in indexes]
+
+
+# PDFium is not thread-safe, and jobs (or `batch.py --jobs`) extract from
+# several threads at once, so every PDFium call in a process holds this lock
+_pdfium_lock = threading.Lock()
+
+
+def _pdfium_pages(source, start: int, stop: int) -> list[str]:
+    """Text-only extraction with PDFium (pypdfium2, installed with pdfplumber). Fast."""
+    import pypdfium2 as pdfium
+
+    with _pdfium_lock:
+        pdf = pdfium.PdfDocument(source)
+        try:
+            texts = []
+            for i in range(start, min(stop, len(pdf))):
+                page = pdf[i]
+                textpage = page.get_textpage()
+                text = textpage.get_text_range()
+                # PDFium marks soft hyphens at line ends with \ufffe and \x02
+                texts.append(_collapse(text.replace("\ufffe", "").replace("\x02", "")))
+                textpage.close()
+                page.close()
+            return texts
+        finally:
+            pdf.close()
+
+
+def _looks_broken(text: str) -> bool:
+    """Text a fast extractor got wrong: unmapped glyphs or control characters."""
+    if not text:
+        return False
+    bad = sum(1 for ch in text if ch == "\ufffd" or (ord(ch) < 32 and ch not in "\t\n\r"))
+    return bad > 0.01 * len(text)
+
+
+def _broken_pages(texts: list[str]) -> list[int]:
+    return [i for i, text in enumerate(texts) if _looks_broken(text)]
+
+
+def _replace_pages(texts: list[str], broken: list[int], fixed: list[str]) -> list[str]:
+    for i, text in zip(broken, fixed):
+        texts[i] = text
+    return texts
+
+
+def _auto_pages(source, start: int, stop: int) -> list[str]:
+    """PDFium first; only pages whose text looks broken are redone with pdfplumber."""
+    texts = _pdfium_pages(source, start, stop)
+    broken = _broken_pages(texts)
+    if broken:
+        texts = _replace_pages(texts, broken, _pdfplumber_pages_at(source, [start + i for i in broken]))
+    return texts
+
+
+# name -> (extract pages `start:stop` of a path or bytes, CPU heavy enough for a process pool);
+# "auto" only sends its pdfplumber fallback pages to the pool, see `_auto_pool_pages`
+PDF_BACKENDS = {
+    "auto": (_auto_pages, False),
+    "pdfium": (_pdfium_pages, False),
+    "pdfplumber": (_pdfplumber_pages, True),
+}
+
+
+def default_pdf_backend() -> str:
+    return os.environ.get("LLMDCP_PDF_BACKEND", "auto")
+
+
+def pdf_page_count(source) -> int:
+    import pypdfium2 as pdfium
+
+    with _pdfium_lock:
+        pdf = pdfium.PdfDocument(source)
+        try:
+            return len(pdf)
+        finally:
+            pdf.close()
+
+
+def _extract_pages(backend: str, path: str, start: int, stop: int) -> list[str]:
+    """Extract pages `start:stop` of the PDF at `path` (runs in a worker process)."""
+    return PDF_BACKENDS[backend][0](path, start, stop)
+
+
+@traced
+def iter_pdf_pages(source, workers: int | None = None, batch_pages: int = 8, backend: str | None = None):
+    """Yield the text of every page, in page order, while later pages are still parsed.
+
+    Args:
+        source: The PDF, as bytes or as a path. A path is read through
+            file handles, so the whole file is never held in memory.
+        workers: Batches handed to the `core.pdf_worker` processes at a time
+            for pdfplumber (and the pages "auto" hands to it); defaults to
+            the size of the pool. 1 extracts in this process.
+        batch_pages: Pages per batch handed to a worker process.
+        backend: One of `PDF_BACKENDS`: "pdfplumber" (layout analysis, slow),
+            "pdfium" (text only, fast) or "auto" (PDFium, falling back to
+            pdfplumber page by page where its text looks broken). Defaults to
+            `LLMDCP_PDF_BACKEND`, or "auto".
+    """
+    backend = backend or default_pdf_backend()
+    if backend not in PDF_BACKENDS:
+        raise ValueError(f"unknown PDF backend {backend!r}, expected one of {', '.join(PDF_BACKENDS)}")
+    extract, cpu_heavy = PDF_BACKENDS[backend]
+    source = _source(source)
+    n_pages = pdf_page_count(source)
+
+    if backend == "auto" and n_pages > batch_pages and workers != 1:
+        yield from _auto_pool_pages(source, n_pages, batch_pages)
+        return
+    # fast backends and small PDFs are extracted in this process, a batch at a time
+    if not cpu_heavy or n_pages <= batch_pages or workers == 1:
+        for start in range(0, n_pages, batch_pages):
+            yield from extract(source, start, min(start + batch_pages, n_pages))
+        return
+
+    if isinstance(source, str):
+        yield from _pool_pages(backend, source, n_pages, workers, batch_pages)
+        return
+    # workers open the PDF from disk, so the bytes are not pickled per batch
+    with tempfile.NamedTemporaryFile(suffix=".pdf") as tmp:
+        tmp.write(source)
+        tmp.flush()
+        yield from _pool_pages(backend, tmp.name, n_pages, workers, batch_pages)
+
+
+def _pool_pages(backend: str, path: str, n_pages: int, workers: int | None, batch_pages: int):
+    from core.pdf_worker import get_pool
+
+    pool = get_pool()
+    starts = iter(range(0, n_pages, batch_pages))
+    # at most `workers` batches queued at a time, so other documents get a turn
+    batches = deque()
+    try:
+        while True:
+            while len(batches) < (workers or pool.workers):
+                start = next(starts, None)
+                if start is None:
+                    break
+                batches.append(
+                    pool.submit(
+                        "_extract_pages", backend, path, start, min(start + batch_pages, n_pages)
+                    )
+                )
+            if not batches:
+                return
+            yield from batches.popleft().result()
+    finally:
+        # stop parsing if the consumer gives up early
+        for batch in batches:
+            batch.cancel()
+
+
+def _auto_pool_pages(source, n_pages: int, batch_pages: int):
+    """`_auto_pages` over the whole PDF, with the pdfplumber fallback in worker processes.
+
+    PDFium keeps reading ahead in this process while the broken pages of
+    earlier batches are redone; pages are still yielded in order. For bytes,
+    the temporary file the workers open is only written once a broken page
+    turns up.
+    """
+    from core.pdf_worker import get_pool
+
+    with ExitStack() as stack:
+        path = source
+        # (texts, broken indexes, future of their pdfplumber texts or None), in page order
+        pending = deque()
+        try:
+            for start in range(0, n_pages, batch_pages):
+                texts = _pdfium_pages(source, start, min(start + batch_pages, n_pages))
+                broken = _broken_pages(texts)
+                future = None
+                if broken:
+                    if isinstance(path, bytes):
+                        tmp = stack.enter_context(tempfile.NamedTemporaryFile(suffix=".pdf"))
+                        tmp.write(source)
+                        tmp.flush()
+                        path = tmp.name
+                    future = get_pool().submit("_fallback_pages", path, [start + i for i in broken])
+                pending.append((texts, broken, future))
+                while pending and (pending[0][2] is None or pending[0][2].done()):
+                    yield from _finish_batch(*pending.popleft())
+            while pending:
+                yield from _finish_batch(*pending.popleft())
+        finally:
+            # stop parsing if the consumer gives up early
+            for _, _, future in pending:
+                if future is not None:
+                    future.cancel()
+
+
+def _fallback_pages(path: str, indexes: list[int]) -> list[str]:
+    """pdfplumber text of the pages at `indexes` (runs in a worker process)."""
+    return _pdfplumber_pages_at(path, indexes)
+
+
+def _finish_batch(texts: list[str], broken: list[int], future) -> list[str]:
+    return texts if future is None else _replace_pages(texts, broken, future.result())
+
+
+def docx_bytes(text: str) -> bytes:
+    """Render `text` as a .docx file, one paragraph per line."""
+    import docx
+
+    doc = docx.Document()
+    for para in text.split("\n"):
+        doc.add_paragraph(para)
+    out = io.BytesIO()
+    doc.save(out)
+    return out.getvalue()
@@ -0,0 +1,207 @@
+"""Background jobs for the document pipeline, so Streamlit reruns don't redo the work.
+
+A page submits a job under a key (the file hash plus its settings) and
+polls it on every rerun; submitting the same key again returns the job that
+is already running or finished instead of starting another one. Jobs live in
+process memory and are shared by all sessions, like the caches.
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+
+
+class Job:
+    """State of one background job, updated by the worker and read by the page."""
+
+    def __init__(self, key: str):
+        self.key = key
+        self.status = QUEUED
+        self.result = None
+        self.error: Optional[BaseException] = None
+        self.created = time.time()
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+        # progress, filled in by the job function
+        self.chunks: list[str] = []
+        self.chunk_tokens: list[int] = []
+        self.sections: dict[int, str] = {}
+        self.extracted = False
+        self._done = threading.Event()
+
+    def done(self) -> bool:
+        return self._done.is_set()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Block until the job has finished; `False` if `timeout` ran out first."""
+        return self._done.wait(timeout)
+
+    def progress(self, now: Optional[float] = None) -> dict:
+        """Chunks done/total, source tokens per second and the estimated seconds left.
+
+        `total` only counts the chunks extracted so far until `extracted` is
+        set, and `eta_s` is `None` until then (or before the first chunk is
+        done).
+        """
+        now = time.time() if now is None else now
+        done = list(self.sections)
+        tokens = self.chunk_tokens[: len(self.chunks)]
+        tokens_done = sum(tokens[idx] for idx in done if idx < len(tokens))
+        elapsed = now - self.started if self.started else 0.0
+        tokens_per_s = tokens_done / elapsed if elapsed > 0 else 0.0
+        eta = None
+        if self.extracted and tokens_per_s:
+            eta = (sum(tokens) - tokens_done) / tokens_per_s
+        return {
+            "done": len(done),
+            "total": len(self.chunks),
+            "extracted": self.extracted,
+            "tokens_done": tokens_done,
+            "tokens_per_s": tokens_per_s,
+            "eta_s": eta,
+        }
+
+    def ready_sections(self, start: int = 0) -> list[str]:
+        """Finished sections from index `start` on, up to the first one still missing."""
+        ready = []
+        while start + len(ready) in self.sections:
+            ready.append(self.sections[start + len(ready)])
+        return ready
+
+
+class JobRunner:
+    """Runs `fn(job, ...)` on a small thread pool, one job per key.
+
+    Args:
+        max_workers: Jobs running at once. Each document job already fans out
+            its own model calls, so this stays small.
+        keep: Finished jobs kept around for later reruns; the oldest are
+            dropped first.
+    """
+
+    def __init__(self, max_workers: int = 2, keep: int = 32):
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="llmdcp-job")
+        self._jobs: OrderedDict[str, Job] = OrderedDict()
+        self._lock = threading.Lock()
+        self.keep = keep
+
+    def submit(self, key: str, fn: Callable, *args, hold=None, **kwargs) -> Job:
+        """Start `fn(job, *args, **kwargs)` unless a job for `key` exists; a failed one is retried.
+
+        `hold` is an optional context manager, entered when a new job is
+        queued and exited once it has finished (e.g. `UploadStore.pinned`).
+        It is left alone if the existing job is returned.
+        """
+        with self._lock:
+            job = self._jobs.get(key)
+            if job is not None and job.status != FAILED:
+                self._jobs.move_to_end(key)
+                return job
+            job = Job(key)
+            self._jobs[key] = job
+            self._evict()
+        if hold is not None:
+            hold.__enter__()
+        self._pool.submit(self._run, job, fn, args, kwargs, hold)
+        return job
+
+    def get(self, key: str) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get(key)
+
+    def _run(self, job: Job, fn: Callable, args, kwargs, hold=None):
+        job.status, job.started = RUNNING, time.time()
+        try:
+            job.result = fn(job, *args, **kwargs)
+            job.status = DONE
+        except BaseException as e:
+            job.error, job.status = e, FAILED
+        finally:
+            if hold is not None:
+                hold.__exit__(None, None, None)
+            job.finished = time.time()
+            job._done.set()
+
+    def _evict(self):
+        finished = [key for key, job in self._jobs.items() if job.done()]
+        for key in finished[: max(len(self._jobs) - self.keep, 0)]:
+            del self._jobs[key]
+
+
+_runner = None
+_runner_lock = threading.Lock()
+
+
+def get_runner() -> JobRunner:
+    """Return the process-wide job runner."""
+    global _runner
+    with _runner_lock:
+        if _runner is None:
+            _runner = JobRunner(max_workers=int(os.environ.get("LLMDCP_JOB_WORKERS", 2)))
+        return _runner
+
+
+def document_job(
+    job: Job,
+    source,
+    suffix: str,
+    mode: str,
+    use_memory: bool,
+    max_in_flight: int,
+    pdf_backend: Optional[str] = None,
+    digest: Optional[str] = None,
+    languages=("English",),
+) -> dict:
+    """Job function running one uploaded document through the whole pipeline.
+
+    `source` is the file's bytes or path, `digest` its `extract.file_hash` if
+    already known. Returns the `pipeline.run_document` result plus the `perplexity` of the
+    output (of every language's output, under `languages`); the chunks, their
+    token counts and the processed sections show up on `job` as they come.
+    A section counts as processed once it is done in all `languages`.
+    """
+    from core.chunking import get_tokenizer
+    from core.extract import file_digest, file_hash
+    from core.pipeline import run_document
+    from core.scoring import perplexity_check
+    from core.tracing import document
+
+    enc = get_tokenizer()
+
+    def on_chunk(idx, chunk):
+        # the token count goes first, so progress() never sees a chunk without one
+        job.chunk_tokens.append(len(enc.encode(chunk)))
+        job.chunks.append(chunk)
+
+    def on_extracted():
+        job.extracted = True
+
+    def on_result(idx, text):
+        job.sections[idx] = text
+
+    if digest is None:
+        digest = file_hash(source) if isinstance(source, bytes) else file_digest(source)
+    with document(digest):
+        result = run_document(
+            source,
+            suffix,
+            mode=mode,
+            use_memory=use_memory,
+            max_in_flight=max_in_flight,
+            on_chunk=on_chunk,
+            on_extracted=on_extracted,
+            on_result=on_result,
+            pdf_backend=pdf_backend,
+            digest=digest,
+            languages=languages,
+        )
+        for translation in result["languages"].values():
+            translation["perplexity"] = perplexity_check(translation["output"])
+        # the top-level output is the first language's, so is its perplexity
+        result["perplexity"] = next(iter(result["languages"].values()))["perplexity"]
+    return result
@@ -0,0 +1,334 @@
+"""Offline language identification, to skip text that needs no translation.
+
+A small character n-gram model (1- to 3-grams of the lower-cased words,
+padded with spaces so word starts and ends count) is built per language
+from the sample texts below and scored naive Bayes style, as the average
+log-likelihood per n-gram so that long and short texts compare. No network,
+no model files: building the profiles takes a few milliseconds on first use.
+
+Character n-grams alone are fooled by loanwords ("Unser Marketing Team plant
+ein Event im Office" looks English to them), so text only counts as being in
+a language if the n-grams win by a margin and its function words (articles,
+pronouns, prepositions, which are never borrowed) agree.
+
+`needs_translation` is the one the pipeline asks: text without letters
+(page numbers), text that is mostly figures (amounts, tables), code and
+identifiers, and text that is clearly in the target language already are
+passed through. When in doubt, text is sent to the model.
+"""
+
+import functools
+import math
+import re
+from collections import Counter
+from typing import Optional
+
+# language names as used in the prompts -> ISO 639-1 codes
+LANGUAGES = {
+    "English": "en",
+    "German": "de",
+    "French": "fr",
+    "Spanish": "es",
+    "Italian": "it",
+    "Dutch": "nl",
+}
+
+_SAMPLES = {
+    "en": """
+        The tenant shall pay the rent on the first working day of each month. This agreement
+        may be terminated by either party with three months' notice in writing. The landlord
+        is not liable for damage caused by the tenant or by third parties. Please find attached
+        the annual report, which shows that revenue increased while costs were kept under
+        control. We would like to thank all of our employees for their work during the year.
+        If you have any questions about your invoice, you can reach our customer service at
+        any time. The meeting has been moved to Thursday afternoon because of the holiday.
+        According to the contract, the deposit will be returned within thirty days after the
+        keys have been handed over and the apartment has been inspected. The company has
+        its registered office in Berlin and is managed by two directors who are responsible
+        for the business. Where this would be unreasonable, the other party should be informed
+        without delay. It was the first time that they had seen the results of the study.
+        We are writing to let you know that your order has been shipped and should arrive
+        within the next few days. Could you please confirm whether the new schedule works for
+        your team? The marketing team is planning an event at the office next month, and all
+        staff are invited to join. Our sales figures for the third quarter were better than
+        expected, but we still need to reduce our spending on travel and external services.
+        Before signing, make sure that you have read and understood all of the terms and
+        conditions. If the goods are damaged on arrival, please contact us within two weeks so
+        that we can arrange a replacement. The workshop on cloud computing will take place
+        online, and the slides will be shared with everyone after the session. Thank you for
+        your feedback, which we discussed with the customer during yesterday's call. There are
+        still some open questions about the project plan that we should clarify with them.
+    """,
+    "de": """
+        Der Mieter zahlt die Miete jeweils am ersten Werktag eines jeden Monats. Dieser Vertrag
+        kann von beiden Parteien mit einer Frist von drei Monaten schriftlich gekündigt werden.
+        Der Vermieter haftet nicht für Schäden, die durch den Mieter oder durch Dritte verursacht
+        werden. Anbei erhalten Sie den Jahresbericht, aus dem hervorgeht, dass der Umsatz
+        gestiegen ist und die Kosten unter Kontrolle gehalten wurden. Wir möchten uns bei allen
+        Mitarbeiterinnen und Mitarbeitern für ihre Arbeit im vergangenen Jahr bedanken. Wenn Sie
+        Fragen zu Ihrer Rechnung haben, erreichen Sie unseren Kundenservice jederzeit. Die
+        Besprechung wurde wegen des Feiertags auf Donnerstagnachmittag verschoben. Gemäß dem
+        Vertrag wird die Kaution innerhalb von dreißig Tagen nach Übergabe der Schlüssel und
+        Besichtigung der Wohnung zurückgezahlt. Die Gesellschaft hat ihren Sitz in Berlin und
+        wird von zwei Geschäftsführern geleitet, die für das Geschäft verantwortlich sind.
+        Soweit dies unzumutbar wäre, ist die andere Partei unverzüglich zu informieren. Es war
+        das erste Mal, dass sie die Ergebnisse der Studie gesehen hatten.
+        Wir möchten Ihnen mitteilen, dass Ihre Bestellung versandt wurde und in den nächsten
+        Tagen bei Ihnen eintreffen sollte. Könnten Sie bitte bestätigen, ob der neue Zeitplan
+        für Ihr Team passt? Das Projektteam trifft sich am Dienstag zum Kick-off im neuen Büro,
+        und die Präsentation für das Management ist noch nicht fertig. Die Umsätze im dritten
+        Quartal waren besser als erwartet, trotzdem müssen wir die Kosten für Reisen und
+        externe Dienstleister senken. Schicken Sie uns die Unterlagen als PDF und geben Sie
+        uns bis Ende der Woche ein kurzes Update zum Status. Vor der Unterschrift sollten Sie
+        sicherstellen, dass Sie alle Bedingungen gelesen und verstanden haben. Wenn die Ware
+        beschädigt ankommt, melden Sie sich bitte innerhalb von zwei Wochen bei uns, damit wir
+        einen Ersatz schicken können. Es gibt noch einige offene Fragen zum Projektplan, die
+        wir mit dem Kunden klären müssen. Auch ist zu beachten, dass sich die Preise ab dem
+        kommenden Jahr ändern werden, weil unser Software Service neu aufgestellt wird.
+    """,
+    "fr": """
+        Le locataire paie le loyer le premier jour ouvrable de chaque mois. Le présent contrat
+        peut être résilié par chacune des parties avec un préavis de trois mois par écrit. Le
+        bailleur n'est pas responsable des dommages causés par le locataire ou par des tiers.
+        Vous trouverez ci-joint le rapport annuel, qui montre que le chiffre d'affaires a
+        augmenté tandis que les coûts sont restés maîtrisés. Nous tenons à remercier tous nos
+        collaborateurs pour leur travail au cours de l'année. Si vous avez des questions sur
+        votre facture, vous pouvez joindre notre service client à tout moment. La réunion a
+        été déplacée au jeudi après-midi en raison du jour férié. Selon le contrat, la caution
+        sera restituée dans les trente jours suivant la remise des clés.
+        Nous vous informons que votre commande a été expédiée et qu'elle devrait arriver dans
+        les prochains jours. Pourriez-vous confirmer si le nouveau calendrier convient à votre
+        équipe? Notre équipe marketing prépare un événement au bureau le mois prochain, et
+        tout le personnel est invité. Avant de signer, assurez-vous d'avoir lu et compris
+        toutes les conditions. Si la marchandise arrive endommagée, veuillez nous contacter
+        dans un délai de deux semaines afin que nous puissions organiser un remplacement. Il
+        reste encore quelques questions ouvertes sur le projet que nous devons clarifier avec
+        le client lors du prochain appel.
+    """,
+    "es": """
+        El inquilino pagará el alquiler el primer día hábil de cada mes. Este contrato podrá
+        ser rescindido por cualquiera de las partes con un preaviso de tres meses por escrito.
+        El arrendador no es responsable de los daños causados por el inquilino o por terceros.
+        Adjuntamos el informe anual, que muestra que los ingresos aumentaron mientras los
+        costes se mantuvieron bajo control. Queremos agradecer a todos nuestros empleados su
+        trabajo durante el año. Si tiene alguna pregunta sobre su factura, puede contactar con
+        nuestro servicio de atención al cliente en cualquier momento. La reunión se ha
+        trasladado al jueves por la tarde debido al día festivo. Según el contrato, la fianza
+        se devolverá en un plazo de treinta días tras la entrega de las llaves.
+        Le informamos de que su pedido ha sido enviado y debería llegar en los próximos días.
+        ¿Podría confirmar si el nuevo calendario le conviene a su equipo? Nuestro equipo de
+        marketing está organizando un evento en la oficina el próximo mes y todo el personal
+        está invitado. Antes de firmar, asegúrese de haber leído y entendido todas las
+        condiciones. Si la mercancía llega dañada, póngase en contacto con nosotros en un
+        plazo de dos semanas para que podamos organizar una sustitución. Todavía quedan algunas
+        preguntas abiertas sobre el proyecto que debemos aclarar con el cliente en la próxima
+        llamada.
+    """,
+    "it": """
+        L'inquilino paga l'affitto il primo giorno lavorativo di ogni mese. Il presente
+        contratto può essere disdetto da ciascuna delle parti con un preavviso scritto di tre
+        mesi. Il locatore non è responsabile dei danni causati dall'inquilino o da terzi. In
+        allegato troverà la relazione annuale, dalla quale risulta che il fatturato è aumentato
+        mentre i costi sono stati tenuti sotto controllo. Desideriamo ringraziare tutti i nostri
+        collaboratori per il lavoro svolto durante l'anno. Per qualsiasi domanda sulla fattura
+        può contattare il nostro servizio clienti in qualsiasi momento. La riunione è stata
+        spostata a giovedì pomeriggio a causa della festività. Secondo il contratto, la cauzione
+        sarà restituita entro trenta giorni dalla consegna delle chiavi.
+        La informiamo che il suo ordine è stato spedito e dovrebbe arrivare nei prossimi
+        giorni. Potrebbe confermare se il nuovo calendario va bene per il suo team? Il nostro
+        team marketing sta organizzando un evento in ufficio il mese prossimo e tutto il
+        personale è invitato. Prima di firmare, si assicuri di aver letto e compreso tutte le
+        condizioni. Se la merce arriva danneggiata, ci contatti entro due settimane affinché
+        possiamo organizzare una sostituzione. Ci sono ancora alcune domande aperte sul
+        progetto che dobbiamo chiarire con il cliente nella prossima chiamata.
+    """,
+    "nl": """
+        De huurder betaalt de huur op de eerste werkdag van elke maand. Deze overeenkomst kan
+        door elk van de partijen schriftelijk worden opgezegd met een termijn van drie maanden.
+        De verhuurder is niet aansprakelijk voor schade die door de huurder of door derden is
+        veroorzaakt. Bijgevoegd vindt u het jaarverslag, waaruit blijkt dat de omzet is gestegen
+        terwijl de kosten onder controle werden gehouden. Wij willen al onze medewerkers
+        bedanken voor hun werk in het afgelopen jaar. Als u vragen heeft over uw factuur, kunt u
+        op elk moment contact opnemen met onze klantenservice. De vergadering is vanwege de
+        feestdag verplaatst naar donderdagmiddag. Volgens het contract wordt de borg binnen
+        dertig dagen na de overdracht van de sleutels terugbetaald.
+        Wij laten u weten dat uw bestelling is verzonden en in de komende dagen bij u zou
+        moeten aankomen. Kunt u bevestigen of het nieuwe schema voor uw team past? Ons
+        marketingteam organiseert volgende maand een evenement op kantoor en alle medewerkers
+        zijn uitgenodigd. Zorg ervoor dat u voor het ondertekenen alle voorwaarden hebt gelezen
+        en begrepen. Als de goederen beschadigd aankomen, neem dan binnen twee weken contact
+        met ons op, zodat wij voor vervanging kunnen zorgen. Er zijn nog enkele open vragen
+        over het project die we bij het volgende gesprek met de klant moeten verduidelijken.
+    """,
+}
+
+# text shorter than this (in letters) is never skipped: too little to tell
+MIN_LETTERS = 20
+
+# average log-likelihood per n-gram by which the best language must beat the
+# runner-up; German full of English loanwords scores up to about 0.16 for English
+MIN_MARGIN = 0.2
+
+# text whose non-space characters are less than this share letters is figures
+# (amounts, dates, table rows) with at most a unit or currency in between
+MIN_LETTER_SHARE = 0.4
+
+# frequent words that are not also words of one of the other languages here
+_FUNCTION_WORDS = {
+    "en": """the and of to are were with that this which has by from our your you they not would
+        should can been at if please there their these those must shall its""",
+    "de": """der die das und ist nicht mit für von dem den ein eine einen einer eines im zum zur
+        auf sich wir uns unser unsere auch wird werden wurde bei nach oder aber dass wenn noch
+        bitte sind haben""",
+    "fr": """le les des une est sont et pour dans avec sur pas nous vous au aux ce cette être été
+        mais""",
+    "es": """el los las y por para está están como pero más muy este esta sus lo nuestro nuestra
+        usted""",
+    "it": """il gli della delle dei degli che è sono nel nella alla questo questa anche più molto
+        nostro nostra""",
+    "nl": """het een van niet voor op dat zijn worden wordt ook aan bij naar uw wij ons onze deze
+        dit heeft hebben kunnen moet""",
+}
+
+_WORD = re.compile(r"[^\W\d_]+")
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+|\n")
+# identifiers, URLs, e-mail addresses, paths, file names, assignments, acronyms
+_CODE_TOKEN = re.compile(
+    r"""^(
+        [a-z]+://\S+ | \S+@\S+\.\w+ | [\w.-]*[/\\][\w./\\-]* |
+        \w*(_|[a-z][A-Z]|\d)\w* | [^\w\s]+ | \w+\(.*\)[;,]? | [A-Z]{2,5} |
+        \w+(\.\w+)+ | \S+=\S*
+    )$""",
+    re.X,
+)
+
+
+def _ngrams(text: str):
+    words = _WORD.findall(text.lower())
+    for word in words:
+        padded = f" {word} "
+        for n in (1, 2, 3):
+            for i in range(len(padded) - n + 1):
+                gram = padded[i : i + n]
+                if gram != " ":
+                    yield gram
+
+
+@functools.lru_cache(maxsize=None)
+def _profiles() -> dict[str, tuple[dict[str, float], float]]:
+    """Per language: log-probability of every seen n-gram, and the one of an unseen n-gram."""
+    profiles = {}
+    for lang, sample in _SAMPLES.items():
+        counts = Counter(_ngrams(sample))
+        total = sum(counts.values())
+        vocab = len(counts) + 1
+        profiles[lang] = (
+            {gram: math.log((c + 1) / (total + vocab)) for gram, c in counts.items()},
+            math.log(1 / (total + vocab)),
+        )
+    return profiles
+
+
+def detect(text: str) -> tuple[Optional[str], float]:
+    """Most likely language code of `text` and its margin over the runner-up.
+
+    The margin is the difference of the average log-likelihood per n-gram,
+    so it doesn't grow with the length of the text. `(None, 0.0)` without
+    letters.
+    """
+    grams = Counter(_ngrams(text))
+    if not grams:
+        return None, 0.0
+    n = sum(grams.values())
+    scores = {
+        lang: sum(count * logp.get(gram, unseen) for gram, count in grams.items()) / n
+        for lang, (logp, unseen) in _profiles().items()
+    }
+    best, second = sorted(scores.values(), reverse=True)[:2]
+    return max(scores, key=scores.get), best - second
+
+
+def function_words(text: str) -> Counter:
+    """Number of function words of each language in `text`."""
+    votes = Counter()
+    for word in _WORD.findall(text.lower()):
+        for lang, words in _function_word_sets().items():
+            if word in words:
+                votes[lang] += 1
+    return votes
+
+
+@functools.lru_cache(maxsize=None)
+def _function_word_sets() -> dict[str, frozenset[str]]:
+    return {lang: frozenset(words.split()) for lang, words in _FUNCTION_WORDS.items()}
+
+
+def is_language(text: str, code: str) -> bool:
+    """Whether `text` is clearly in language `code`: the n-grams and the function words agree."""
+    lang, margin = detect(text)
+    if lang != code or margin < MIN_MARGIN:
+        return False
+    votes = function_words(text)
+    own = votes.pop(code, 0)
+    return own > max(votes.values(), default=0)
+
+
+def is_code(text: str) -> bool:
+    """Text made only of identifiers, URLs, paths, numbers and symbols."""
+    tokens = text.split()
+    return bool(tokens) and all(_CODE_TOKEN.match(token) for token in tokens)
+
+
+def needs_translation(text: str, language: str = "English") -> bool:
+    """False for text without letters, code-like text and text already in `language`.
+
+    Args:
+        text: A segment, paragraph or message.
+        language: Target language, as a name ("English") or code ("en").
+    """
+    letters = sum(len(word) for word in _WORD.findall(text))
+    if not letters or letters < MIN_LETTER_SHARE * len("".join(text.split())) or is_code(text):
+        return False
+    target = LANGUAGES.get(language, language)
+    if letters < MIN_LETTERS or target not in _SAMPLES:
+        return True
+    return not is_language(text, target)
+
+
+def passthrough_runs(text: str, language: str = "English") -> list[tuple[str, bool]]:
+    """Split `text` into runs of whole lines, each `(text, needs_translation)`.
+
+    Consecutive lines with the same verdict are merged and blank lines join
+    the run before them, so joining the runs with newlines gives back `text`.
+    """
+    runs: list[tuple[list[str], bool]] = []
+    for line in text.split("\n"):
+        translate = needs_translation(line, language) if line.strip() else None
+        if runs and (translate is None or translate == runs[-1][1]):
+            runs[-1][0].append(line)
+        else:
+            runs.append(([line], bool(translate)))
+    return [("\n".join(lines), translate) for lines, translate in runs]
+
+
+def foreign_share(text: str, language: str = "English") -> float:
+    """Share of the letters of `text` in sentences that are in another language.
+
+    A sentence counts as foreign if the n-grams pick another language by
+    `MIN_MARGIN`, or if it has more function words of another language than
+    of `language` (which catches loanword-heavy text the n-grams miss).
+    Sentences under `MIN_LETTERS` letters don't count either way.
+    """
+    target = LANGUAGES.get(language, language)
+    foreign = total = 0
+    for sentence in _SENTENCE_END.split(text):
+        letters = sum(len(word) for word in _WORD.findall(sentence))
+        if letters < MIN_LETTERS:
+            continue
+        total += letters
+        lang, margin = detect(sentence)
+        votes = function_words(sentence)
+        own = votes.pop(target, 0)
+        if (lang != target and margin >= MIN_MARGIN) or max(votes.values(), default=0) > own:
+            foreign += letters
+    return foreign / total if total else 0.0
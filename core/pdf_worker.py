@@ -0,0 +1,123 @@
+"""Worker processes for the slow PDF extraction, run as `python -m core.pdf_worker`.
+
+multiprocessing's spawn and forkserver children import the parent's
+`__main__` again before they run anything, and under Streamlit that is the
+page being rendered; fork copies a parent full of threads. These workers are
+plain subprocesses started from this module instead: each one reads pickled
+`(function name, args)` tasks of `core.extract` from stdin and writes the
+pickled result back to stdout, one task at a time. `get_pool()` keeps one
+pool per process, sized by `LLMDCP_PDF_WORKERS` (default: all cores), and a
+worker is only started once it gets its first task.
+"""
+
+import os
+import pickle
+import subprocess
+import sys
+import threading
+from concurrent.futures import Future
+from pathlib import Path
+from queue import SimpleQueue
+
+ROOT = Path(__file__).parent.parent
+
+
+class WorkerPool:
+    """Runs `core.extract` functions in `python -m core.pdf_worker` subprocesses.
+
+    A worker that dies (e.g. a crash in a PDF library) fails the task it was
+    running and is replaced on the next one.
+
+    Args:
+        workers: Worker processes; defaults to the number of cores.
+    """
+
+    def __init__(self, workers: int | None = None):
+        self.workers = workers or os.cpu_count() or 1
+        self._tasks = SimpleQueue()
+        for i in range(self.workers):
+            threading.Thread(target=self._serve, name=f"llmdcp-pdf-worker-{i}", daemon=True).start()
+
+    def submit(self, fn_name: str, *args) -> Future:
+        """Run `core.extract.<fn_name>(*args)` in a worker; returns its future."""
+        future = Future()
+        self._tasks.put((future, fn_name, args))
+        return future
+
+    @staticmethod
+    def _start() -> subprocess.Popen:
+        env = {
+            **os.environ,
+            "PYTHONPATH": os.pathsep.join(filter(None, [str(ROOT), os.environ.get("PYTHONPATH")])),
+        }
+        return subprocess.Popen(
+            [sys.executable, "-m", "core.pdf_worker"],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            env=env,
+        )
+
+    def _serve(self):
+        # one thread per worker process, feeding it tasks from the shared queue
+        proc = None
+        while True:
+            future, fn_name, args = self._tasks.get()
+            if not future.set_running_or_notify_cancel():
+                continue
+            if proc is None or proc.poll() is not None:
+                proc = self._start()
+            try:
+                pickle.dump((fn_name, args), proc.stdin)
+                proc.stdin.flush()
+                ok, value = pickle.load(proc.stdout)
+            except (OSError, EOFError, pickle.UnpicklingError) as e:
+                proc.kill()
+                proc = None
+                future.set_exception(RuntimeError(f"PDF worker process died: {e!r}"))
+                continue
+            if ok:
+                future.set_result(value)
+            else:
+                future.set_exception(value)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool() -> WorkerPool:
+    """Return the process-wide worker pool configured from the environment."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            workers = os.environ.get("LLMDCP_PDF_WORKERS")
+            _pool = WorkerPool(int(workers) if workers else None)
+        return _pool
+
+
+def main():
+    from core import extract
+
+    tasks, results = sys.stdin.buffer, sys.stdout.buffer
+    # results go over stdout, so a stray print must not end up there
+    sys.stdout = sys.stderr
+    while True:
+        try:
+            fn_name, args = pickle.load(tasks)
+        except EOFError:
+            # the parent is gone
+            return
+        try:
+            result = (True, getattr(extract, fn_name)(*args))
+        except Exception as e:
+            result = (False, e)
+        try:
+            payload = pickle.dumps(result)
+        except Exception:
+            payload = pickle.dumps((False, RuntimeError(repr(result[1]))))
+        results.write(payload)
+        results.flush()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,649 @@
+"""Translation and summarization pipeline, shared by the document page and the CLI.
+
+Nothing in here imports Streamlit. All model calls go through
+`ratelimit.chat_completion` and are cached on disk with `cache.memoize`.
+"""
+
+import functools
+import os
+
+from core.cache import memoize
+from core.checkpoint import checkpointed, get_checkpoints, prompt_version
+from core.chunking import get_tokenizer, iter_token_chunks, split_into_token_chunks, token_budget
+from core.client import get_client
+from core.engine import DEFAULT_MAX_IN_FLIGHT, map_ordered, map_packed, reduce_tree
+from core.langid import needs_translation
+from core.prompts import (
+    MERGE_SUMMARIES_PROMPT,
+    REVIEW_PROMPT,
+    SEGMENTS_PROMPT,
+    SUMMARIZE_PROMPT,
+    TEXT_PROMPT,
+    TRANSLATE_PROMPT,
+)
+from core.ratelimit import chat_completion
+from core.scoring import failed_checks, translation_scores
+from core.tm import format_numbered, get_memory, parse_numbered, segment, translate_with_memory
+
+# target length of the final document summary
+SUMMARY_WORDS = 400
+
+# characters of the neighbouring sections shown to the reviewer
+REVIEW_CONTEXT_CHARS = 500
+
+# most short texts packed into one `translate_segments` request
+PACK_MAX_SEGMENTS = 50
+
+
+def cascade_models() -> list[str]:
+    """Translation models from cheapest to strongest, from `LLMDCP_CASCADE_MODELS`."""
+    return os.environ.get("LLMDCP_CASCADE_MODELS", "gpt-4o-mini,gpt-4o").split(",")
+
+
+@functools.lru_cache(maxsize=None)
+def chunk_tokens() -> int:
+    """Input tokens per request.
+
+    The prompt and the 4000 token answer must fit in the context window, and
+    a translation is about as long as its source, so chunks are kept below
+    the answer size.
+    """
+    return token_budget(
+        "gpt-4o-mini",
+        prompt_tokens=len(get_tokenizer().encode(TRANSLATE_PROMPT)),
+        output_tokens=4000,
+        max_tokens=3000,
+    )
+
+
+@memoize(REVIEW_PROMPT, temperature=0.2)
+def review_chunk(
+    english_text: str, before: str = "", after: str = "", model="gpt-5-nano", language="English"
+) -> str:
+    """Review one translated chunk, seeing the edges of its neighbours."""
+    prompt = REVIEW_PROMPT.format(
+        text=english_text, before=before or "-", after=after or "-", language=language
+    )
+    response = chat_completion(
+        get_client(),
+        model=model,
+        messages=[{"role": "user", "content": prompt}],
+        temperature=0.2,
+        max_tokens=4000,
+    )
+    return response.choices[0].message.content.strip()
+
+
+def auto_review(
+    english_chunks: list[str],
+    model="gpt-5-nano",
+    max_in_flight=DEFAULT_MAX_IN_FLIGHT,
+    only=None,
+    language="English",
+) -> str:
+    """Review all translated chunks in parallel and merge them back in order.
+
+    Every chunk is reviewed (and cached) on its own, so nothing is cut off by
+    the answer limit and review time scales with `max_in_flight`, not
+    document length. With `only`, just the chunks at those indices are
+    reviewed and the others are kept as they are.
+    """
+    reviewed = review_translations(
+        {language: english_chunks},
+        only=None if only is None else {language: only},
+        model=model,
+        max_in_flight=max_in_flight,
+    )
+    return reviewed[language]
+
+
+def review_translations(
+    translations: dict[str, list[str]],
+    only=None,
+    model="gpt-5-nano",
+    max_in_flight=DEFAULT_MAX_IN_FLIGHT,
+) -> dict[str, str]:
+    """`auto_review` of the chunks of several languages, all through one scheduler.
+
+    Args:
+        translations: Translated chunks per target language.
+        only: Optional indices of the chunks to review per language; the
+            other chunks are kept as they are.
+        model: The reviewing model.
+        max_in_flight: Maximum number of model calls running at once, over
+            all languages.
+    """
+    items = [
+        (language, idx)
+        for language, chunks in translations.items()
+        for idx in range(len(chunks))
+        if only is None or idx in only.get(language, ())
+    ]
+
+    def review(item):
+        language, idx = item
+        chunks = translations[language]
+        before = chunks[idx - 1][-REVIEW_CONTEXT_CHARS:] if idx > 0 else ""
+        after = chunks[idx + 1][:REVIEW_CONTEXT_CHARS] if idx + 1 < len(chunks) else ""
+        return review_chunk(chunks[idx], before=before, after=after, model=model, language=language)
+
+    reviewed = dict(zip(items, map_ordered(review, items, max_in_flight=max_in_flight)))
+    return {
+        language: "\n\n".join(reviewed.get((language, idx), chunk) for idx, chunk in enumerate(chunks))
+        for language, chunks in translations.items()
+    }
+
+
+@memoize(TRANSLATE_PROMPT, temperature=0.2)
+def translate_subchunk(text: str, model="gpt-4o-mini", language="English") -> str:
+    """Request OpenAI ChatGPT to translate a document.
+
+    Sentences that are already in `language`, or only figures or code, are
+    kept as they are. If that leaves only some of the text, just those
+    sentences are sent, numbered in one request.
+
+    Args:
+        text: Message to send to ChatGPT for translation.
+        model: The model to be used..
+        language: Target language.
+    """
+    pairs = segment(text)
+    needed = [needs_translation(seg, language) for seg, _ in pairs]
+    if not any(needed):
+        return text
+    if not all(needed[i] for i, (seg, _) in enumerate(pairs) if seg.strip()):
+        translated = translate_segments(
+            [seg for (seg, _), need in zip(pairs, needed) if need], model=model, language=language
+        )
+        if translated is not None:
+            results = iter(translated)
+            return "".join(
+                (next(results) if need else seg) + sep for (seg, sep), need in zip(pairs, needed)
+            )
+
+    prompt = TRANSLATE_PROMPT.format(text=text, language=language)
+    response = chat_completion(
+        get_client(),
+        model=model,
+        messages=[{"role": "user", "content": prompt}],
+        temperature=0.2,
+        max_tokens=4000,
+    )
+    return response.choices[0].message.content.strip()
+
+
+def translate_segments(segments: list[str], model="gpt-4o-mini", language="English"):
+    """Translate a batch of segments in one request.
+
+    Returns one translation per segment, or `None` if the answer could not be
+    split back into the numbered segments.
+    """
+    prompt = SEGMENTS_PROMPT.format(segments=format_numbered(segments), language=language)
+    response = chat_completion(
+        get_client(),
+        model=model,
+        messages=[{"role": "user", "content": prompt}],
+        temperature=0.2,
+        max_tokens=4000,
+    )
+    return parse_numbered(response.choices[0].message.content, len(segments))
+
+
+def translate_text(text: str, model="gpt-4o-mini", language="English") -> str:
+    """Translate one short text on its own."""
+    response = chat_completion(
+        get_client(),
+        model=model,
+        messages=[
+            {"role": "system", "content": TEXT_PROMPT.format(language=language)},
+            {"role": "user", "content": text},
+        ],
+        temperature=0.2,
+    )
+    return response.choices[0].message.content.strip()
+
+
+def translate_texts(
+    texts: list[str], language="English", model="gpt-4o-mini", max_in_flight=DEFAULT_MAX_IN_FLIGHT
+) -> list[str]:
+    """Translate many short texts (paragraphs, table cells, chat lines) in few requests.
+
+    Texts are packed into numbered `translate_segments` batches; a batch that
+    comes back with the wrong number of segments is split until it unpacks.
+    Texts that need no translation (`langid.needs_translation`) are passed
+    through untouched.
+    """
+    needed = [needs_translation(text, language) for text in texts]
+    todo = [text for text, need in zip(texts, needed) if need]
+    enc = get_tokenizer()
+    translated = map_packed(
+        lambda batch: translate_segments(batch, model=model, language=language),
+        todo,
+        lambda text: translate_text(text, model=model, language=language),
+        count_tokens=lambda text: len(enc.encode(text)),
+        budget=chunk_tokens(),
+        max_items=PACK_MAX_SEGMENTS,
+        max_in_flight=max_in_flight,
+    )
+    results = iter(translated)
+    return [next(results) if need else text for text, need in zip(texts, needed)]
+
+
+def translate_subchunk_with_memory(
+    text: str, model="gpt-4o-mini", language="English", pending=None
+) -> str:
+    """Translate only the sentences the translation memory hasn't seen yet.
+
+    Falls back to `translate_subchunk` on the whole text if the model
+    doesn't keep the segment numbering. With `pending`, new segments are
+    collected there instead of being stored (see `tm.translate_with_memory`).
+    """
+    translated = translate_with_memory(
+        text,
+        lambda segments: translate_segments(segments, model=model, language=language),
+        get_memory(),
+        language=language,
+        pending=pending,
+    )
+    if translated is None:
+        return translate_subchunk(text, model=model, language=language)
+    return translated
+
+
+def translate_cascade(text: str, models: list[str], use_memory=True, language="English") -> str:
+    """Translate with the first (cheapest) model, escalating while the result fails the local checks.
+
+    Only the first attempt goes through the translation memory; stronger
+    models translate the whole text, so they don't get the weak model's
+    segments back. Its new segments are only stored in the memory once the
+    chunk passes, so a rejected translation isn't reused by other documents.
+    The last model's answer is kept even if it fails too.
+    """
+    for i, model in enumerate(models):
+        pending = []
+        if i == 0 and use_memory:
+            translated = translate_subchunk_with_memory(
+                text, model=model, language=language, pending=pending
+            )
+        else:
+            translated = translate_subchunk(text, model=model, language=language)
+        if not failed_checks(translation_scores(text, translated, language)):
+            if pending:
+                get_memory().store(pending, language)
+            break
+    return translated
+
+
+def flag_chunks(sources: list[str], translations: list[str], language="English") -> list[int]:
+    """Indices of the translated chunks that fail the local quality checks."""
+    return [
+        idx
+        for idx, (source, translated) in enumerate(zip(sources, translations))
+        if failed_checks(translation_scores(source, translated, language))
+    ]
+
+
+@memoize(SUMMARIZE_PROMPT, temperature=0.3)
+def summarize_subchunk(text: str, max_tokens: int = 1000, model="gpt-4o-mini") -> str:
+    """
+    Summarize the input text into a concise English paragraph.
+    """
+    prompt = SUMMARIZE_PROMPT.format(text=text)
+    response = chat_completion(
+        get_client(), model=model, messages=[{"role": "user", "content": prompt}], temperature=0.3
+    )
+    return response.choices[0].message.content.strip()
+
+
+@memoize(MERGE_SUMMARIES_PROMPT, temperature=0.3)
+def merge_summaries(text: str, words: int = SUMMARY_WORDS, model="gpt-4o-mini") -> str:
+    """Merge consecutive partial summaries (separated by blank lines) into one."""
+    prompt = MERGE_SUMMARIES_PROMPT.format(text=text, words=words)
+    response = chat_completion(
+        get_client(), model=model, messages=[{"role": "user", "content": prompt}], temperature=0.3
+    )
+    return response.choices[0].message.content.strip()
+
+
+def summarize_document(summaries: list[str], max_in_flight=DEFAULT_MAX_IN_FLIGHT) -> str:
+    """Reduce the per-chunk summaries to a single summary, a few at a time."""
+    enc = get_tokenizer()
+    return reduce_tree(
+        summaries,
+        merge=lambda group: merge_summaries("\n\n".join(group)),
+        count_tokens=lambda text: len(enc.encode(text)),
+        budget=chunk_tokens(),
+        max_in_flight=max_in_flight,
+    )
+
+
+def _chunk_runner(
+    mode="translate",
+    use_memory=True,
+    model="gpt-4o-mini",
+    doc_id=None,
+    models=None,
+    on_reuse=None,
+    language="English",
+):
+    """The function processing one `(idx, text)` chunk, checkpointed if `doc_id` is given."""
+    if mode == "summarize":
+        process, prompts = summarize_subchunk, (SUMMARIZE_PROMPT,)
+    elif models:
+        process = functools.partial(
+            translate_cascade, models=list(models), use_memory=use_memory, language=language
+        )
+        prompts = (SEGMENTS_PROMPT, TRANSLATE_PROMPT) if use_memory else (TRANSLATE_PROMPT,)
+        model = "+".join(models)
+    elif use_memory:
+        process, prompts = translate_subchunk_with_memory, (SEGMENTS_PROMPT, TRANSLATE_PROMPT)
+    else:
+        process, prompts = translate_subchunk, (TRANSLATE_PROMPT,)
+    if mode == "translate":
+        # the language is part of the prompt, and so of the checkpoint key
+        prompts = (language, *prompts)
+        if not models:
+            process = functools.partial(process, model=model, language=language)
+    else:
+        process = functools.partial(process, model=model)
+    if doc_id is None:
+        return lambda item: process(item[1])
+    return checkpointed(
+        process, get_checkpoints(), doc_id, model, prompt_version(mode, *prompts), on_reuse=on_reuse
+    )
+
+
+def process_chunks(
+    chunks,
+    mode="translate",
+    use_memory=True,
+    max_in_flight=DEFAULT_MAX_IN_FLIGHT,
+    on_result=None,
+    model="gpt-4o-mini",
+    doc_id=None,
+    models=None,
+    on_reuse=None,
+    language="English",
+) -> list[str]:
+    """Translate or summarize every chunk in parallel, keeping their order.
+
+    Args:
+        chunks: Chunk texts, can be a generator that is still extracting.
+        mode: "translate" or "summarize".
+        use_memory: Translate through the translation memory.
+        max_in_flight: Maximum number of model calls running at once.
+        on_result: Passed on to `engine.map_ordered`.
+        model: The model processing the chunks.
+        doc_id: Hash of the source document. If given, every finished chunk
+            is checkpointed and chunks finished by an earlier run are not
+            sent again.
+        models: Translate through `translate_cascade` with these models,
+            cheapest first, instead of with `model` alone.
+        on_reuse: Optional callback `(idx)` for every chunk taken from the
+            checkpoints (of this document or one sharing the chunk's text)
+            instead of being sent again. Needs `doc_id`.
+        language: Target language of the translation.
+    """
+    run = _chunk_runner(mode, use_memory, model, doc_id, models, on_reuse, language)
+    return map_ordered(run, enumerate(chunks), max_in_flight=max_in_flight, on_result=on_result)
+
+
+def translate_chunks(
+    chunks,
+    languages: list[str],
+    use_memory=True,
+    max_in_flight=DEFAULT_MAX_IN_FLIGHT,
+    on_result=None,
+    model="gpt-4o-mini",
+    doc_id=None,
+    models=None,
+    on_reuse=None,
+) -> dict[str, list[str]]:
+    """Translate every chunk into every language, through one shared scheduler.
+
+    The (chunk, language) calls are interleaved chunk by chunk, so all
+    languages start as soon as the first chunk is extracted and
+    `max_in_flight` bounds the calls of all languages together.
+
+    Args:
+        chunks: Chunk texts, can be a generator that is still extracting.
+        languages: Target languages.
+        on_result: Optional callback `(language, idx, text)`, called as each
+            translation finishes.
+        on_reuse: Optional callback `(language, idx)`, see `process_chunks`.
+        use_memory, max_in_flight, model, doc_id, models: As for `process_chunks`.
+    """
+    runs = {
+        language: _chunk_runner(
+            "translate",
+            use_memory,
+            model,
+            doc_id,
+            models,
+            None if on_reuse is None else functools.partial(on_reuse, language),
+            language,
+        )
+        for language in languages
+    }
+    items = ((language, idx, chunk) for idx, chunk in enumerate(chunks) for language in languages)
+
+    def translate(item):
+        language, idx, chunk = item
+        return runs[language]((idx, chunk))
+
+    def done(flat_idx, text):
+        if on_result is not None:
+            idx, i = divmod(flat_idx, len(languages))
+            on_result(languages[i], idx, text)
+
+    translated = map_ordered(translate, items, max_in_flight=max_in_flight, on_result=done)
+    return {language: translated[i :: len(languages)] for i, language in enumerate(languages)}
+
+
+def finish_document(
+    processed_chunks: list[str],
+    mode="translate",
+    review=True,
+    max_in_flight=DEFAULT_MAX_IN_FLIGHT,
+    review_only=None,
+    language="English",
+) -> str:
+    """Turn processed chunks into the final text: reviewed translation or merged summary.
+
+    `review_only` limits the review to the chunks at those indices.
+    """
+    if mode == "summarize":
+        return summarize_document(processed_chunks, max_in_flight=max_in_flight)
+    if review:
+        return auto_review(
+            processed_chunks, max_in_flight=max_in_flight, only=review_only, language=language
+        )
+    return "\n\n".join(processed_chunks)
+
+
+def run_document(
+    source,
+    suffix: str,
+    mode="translate",
+    use_memory=True,
+    review=True,
+    paragraphs=False,
+    max_in_flight=DEFAULT_MAX_IN_FLIGHT,
+    on_chunk=None,
+    on_extracted=None,
+    on_result=None,
+    resume=True,
+    pdf_backend=None,
+    digest=None,
+    cascade=True,
+    languages=("English",),
+) -> dict:
+    """Extract, chunk, process and finish one PDF or DOCX file.
+
+    PDF chunks go to the model as soon as their pages are parsed. With
+    `paragraphs`, a DOCX translation is done paragraph by paragraph through
+    `translate_texts` instead, which keeps the paragraph layout. The file is
+    extracted and chunked once however many `languages` it is translated
+    into, and the calls of all languages share one scheduler.
+
+    Args:
+        source: The file's bytes, or its path (read through file handles).
+        suffix: ".pdf" or ".docx".
+        mode: "translate" or "summarize".
+        use_memory: Translate through the translation memory.
+        review: Run the auto-review pass over translations.
+        paragraphs: Translate DOCX files paragraph by paragraph.
+        max_in_flight: Maximum number of model calls running at once.
+        on_chunk: Optional callback `(index, chunk)`, called as chunks are extracted.
+        on_extracted: Optional callback `()`, called once the last chunk is known.
+        on_result: Optional callback `(index, text)`, called once a chunk is
+            processed (into every language), with the first language's text.
+        resume: Checkpoint every processed chunk under the file's hash and
+            take the chunks finished by an earlier run of the same file, or
+            found with the same text in another file (an earlier revision),
+            from there, so a failed run or a revision only pays for the rest.
+        pdf_backend: One of `extract.PDF_BACKENDS`, defaults to
+            `LLMDCP_PDF_BACKEND` or "auto".
+        digest: The file's `extract.file_hash`, if already known (e.g. from
+            the upload store), so the file isn't hashed again.
+        cascade: Translate through `translate_cascade` with the
+            `cascade_models()` and only review the chunks that still fail the
+            local quality checks. Without it, every chunk is translated by
+            the cheapest model and reviewed.
+        languages: Target languages of the translation. Summaries are
+            always in English.
+
+    Returns:
+        A dict with the source `chunks` and the number of PDF `pages` read,
+        and per language under `languages`: the `processed` chunks, the
+        final `output` text, the indices of the `reviewed` chunks and of the
+        chunks `reused` from checkpoints. The first language's are also at
+        the top level.
+    """
+    from core.extract import file_digest, file_hash, iter_pdf_pages, read_docx
+
+    if resume and digest is None:
+        digest = file_hash(source) if isinstance(source, bytes) else file_digest(source)
+    doc_id = digest if resume else None
+    languages = list(languages)
+
+    pages = 0
+    chunks = []
+
+    def counted_pages():
+        nonlocal pages
+        for page in iter_pdf_pages(source, backend=pdf_backend):
+            pages += 1
+            yield page
+
+    def iter_chunks(texts):
+        for chunk in texts:
+            if on_chunk is not None:
+                on_chunk(len(chunks), chunk)
+            chunks.append(chunk)
+            yield chunk
+        if on_extracted is not None:
+            on_extracted()
+
+    def result(outputs: dict[str, dict]) -> dict:
+        # the first language's output at the top level, every language's under `languages`
+        return {"chunks": chunks, "pages": pages, **next(iter(outputs.values())), "languages": outputs}
+
+    if suffix.lower() == ".pdf":
+        # content-defined boundaries, so a revised file has the same chunks outside its edits
+        texts = iter_token_chunks(counted_pages(), max_tokens=chunk_tokens(), content_defined=True)
+    elif paragraphs and mode == "translate":
+        # paragraphs are packed into requests as they are instead of being chunked
+        chunks = read_docx(source).split("\n")
+        # the calls in flight are split between the languages
+        per_language = max(max_in_flight // len(languages), 1)
+        translated = map_ordered(
+            lambda language: translate_texts(chunks, language=language, max_in_flight=per_language),
+            languages,
+            max_in_flight=len(languages),
+        )
+        return result(
+            {
+                language: {
+                    "processed": processed,
+                    "output": "\n".join(processed),
+                    "reviewed": [],
+                    "reused": [],
+                }
+                for language, processed in zip(languages, translated)
+            }
+        )
+    else:
+        texts = split_into_token_chunks(
+            read_docx(source), max_tokens=chunk_tokens(), content_defined=True
+        )
+
+    if mode == "summarize":
+        reused = []
+        processed = process_chunks(
+            iter_chunks(texts),
+            mode=mode,
+            max_in_flight=max_in_flight,
+            on_result=on_result,
+            doc_id=doc_id,
+            on_reuse=reused.append,
+        )
+        output = finish_document(processed, mode=mode, max_in_flight=max_in_flight)
+        # summaries are always written in English
+        return result(
+            {
+                "English": {
+                    "processed": processed,
+                    "output": output,
+                    "reviewed": [],
+                    "reused": sorted(reused),
+                }
+            }
+        )
+
+    finished: dict[int, dict[str, str]] = {}
+
+    def translated(language, idx, text):
+        # a section counts as done once it is translated into every language
+        if on_result is not None:
+            finished.setdefault(idx, {})[language] = text
+            if len(finished[idx]) == len(languages):
+                on_result(idx, finished.pop(idx)[languages[0]])
+
+    models = cascade_models() if cascade else None
+    reused = {language: [] for language in languages}
+    translations = translate_chunks(
+        iter_chunks(texts),
+        languages,
+        use_memory=use_memory,
+        max_in_flight=max_in_flight,
+        on_result=translated,
+        doc_id=doc_id,
+        models=models,
+        on_reuse=lambda language, idx: reused[language].append(idx),
+    )
+    reviewed = {language: [] for language in languages}
+    if review:
+        # a targeted review of the chunks that even the strongest model didn't get right
+        for language in languages:
+            reviewed[language] = (
+                flag_chunks(chunks, translations[language], language)
+                if models
+                else list(range(len(chunks)))
+            )
+    outputs = review_translations(
+        translations,
+        only={language: set(idx) for language, idx in reviewed.items()},
+        max_in_flight=max_in_flight,
+    )
+    return result(
+        {
+            language: {
+                "processed": translations[language],
+                "output": outputs[language],
+                "reviewed": reviewed[language],
+                "reused": sorted(reused[language]),
+            }
+            for language in languages
+        }
+    )
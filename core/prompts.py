@@ -0,0 +1,84 @@
+"""Prompt templates for the document pipeline.
+
+Every template has a `{text}` (or `{segments}`) placeholder; the translation
+and review templates also take the target `{language}`. The cache hashes the
+template, so editing a prompt invalidates its cached answers.
+"""
+
+REVIEW_PROMPT = """
+        You are an expert {language} editor. The following text has already been translated.
+        Check it for mistranslations, missing context, and awkward phrasing, then correct
+        it. Return only the corrected text.
+
+        The text is one section of a longer document. The end of the previous section and
+        the start of the next one are given for context only: do NOT return or correct them.
+
+        **End of previous section:**
+
+        {before}
+
+        **Translated text:**
+
+        {text}
+
+        **Start of next section:**
+
+        {after}
+    """
+
+SUMMARIZE_PROMPT = """
+        You are an expert summarizer. Please read the following text and produce a 
+        concise and coherent summary in English. Keep the tone neutral, use complete 
+        sentences, and avoid jargon.
+
+        **Text to summarize:**
+        {text}
+
+        **Summary:**
+    """
+
+MERGE_SUMMARIES_PROMPT = """
+        You are an expert summarizer. The following are summaries of consecutive parts
+        of one document, in order. Combine them into a single concise and coherent summary
+        in English of at most {words} words. Keep the tone neutral, use complete sentences,
+        and avoid jargon. Do not mention that the input was split into parts.
+
+        **Partial summaries:**
+        {text}
+
+        **Summary:**
+    """
+
+TRANSLATE_PROMPT = """You are an expert translator and language model.  
+Your task is to translate the entire document below from its original language into clear, natural {language}.  
+The document may contain headings, bullet points, tables, and a mix of formal and informal tone.  
+Please preserve the original structure and formatting as much as possible (use Markdown if needed).  
+If you encounter ambiguous terms or cultural references, provide a brief note in brackets.
+
+**Input Document:**
+
+[START OF DOCUMENT]
+{text}
+[END OF DOCUMENT]
+
+**Output Format:**
+
+1. Translate the whole text into {language}.  
+2. Keep headings, lists, and tables exactly as in the source (convert tables to Markdown).  
+3. Do NOT add any explanatory text outside the translated content.
+4. Do NOT alter numbers or proper nouns unless they are obviously incorrect in {language}.
+
+**Now translate the document above.**
+"""
+
+SEGMENTS_PROMPT = """You are an expert translator and language model.
+Translate every numbered segment below from its original language into clear, natural {language}.
+The segments are consecutive sentences or paragraphs of one text, so use them as context for each other.
+
+Answer with exactly one `[[n]]` line per segment, in the same order and with the same numbers,
+containing only the translation of that segment. Do NOT merge, split or skip segments.
+
+{segments}
+"""
+
+TEXT_PROMPT = "Translate the received text into clear, natural {language}."
@@ -0,0 +1,249 @@
+"""Shared request layer for all OpenAI chat completion calls.
+
+Every page goes through `chat_completion` so that, across threads and
+sessions of the same Streamlit process, we:
+
+- stay under the account's requests/min and tokens/min quota (token buckets),
+- retry 429s, timeouts and 5xx errors with jittered exponential backoff,
+- shrink the number of concurrent calls when OpenAI starts throttling us and
+  grow it back slowly once the 429s stop (AIMD).
+
+Limits are read from the environment (root-level Streamlit secrets are
+exported as environment variables): `OPENAI_RPM`, `OPENAI_TPM`,
+`OPENAI_MAX_CONCURRENCY` and `OPENAI_MAX_RETRIES`.
+"""
+
+import os
+import random
+import threading
+import time
+from typing import Callable, Optional
+
+from core.tracing import span
+
+
+def retryable_errors() -> tuple:
+    """Errors worth retrying; `openai` is only imported once a call is made."""
+    import openai
+
+    return (
+        openai.RateLimitError,
+        openai.APITimeoutError,
+        openai.APIConnectionError,
+        openai.InternalServerError,
+    )
+
+
+# tokens we assume a completion will use when the caller doesn't set max_tokens
+DEFAULT_COMPLETION_TOKENS = 1000
+
+
+class TokenBucket:
+    """Thread-safe token bucket refilled continuously at `rate_per_min`."""
+
+    def __init__(self, rate_per_min: float, capacity: Optional[float] = None, clock=time.monotonic):
+        self.rate = rate_per_min / 60.0
+        self.capacity = capacity if capacity is not None else rate_per_min
+        self.available = self.capacity
+        self.clock = clock
+        self.updated = clock()
+        self.lock = threading.Lock()
+
+    def _refill(self):
+        now = self.clock()
+        self.available = min(self.capacity, self.available + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self, amount: float) -> float:
+        """Take `amount` from the bucket and return how long to wait before using it.
+
+        Requests bigger than the bucket are clamped to its capacity, otherwise
+        they could never be served.
+        """
+        amount = min(amount, self.capacity)
+        with self.lock:
+            self._refill()
+            self.available -= amount
+            if self.available >= 0:
+                return 0.0
+            return -self.available / self.rate
+
+    def acquire(self, amount: float = 1, sleep=time.sleep):
+        wait = self.reserve(amount)
+        if wait > 0:
+            sleep(wait)
+
+
+class AIMDLimiter:
+    """Concurrency limit with additive increase / multiplicative decrease.
+
+    Every `increase_after` successful calls in a row raise the limit by one,
+    every throttled call halves it (down to `minimum`).
+    """
+
+    def __init__(self, initial: int = 4, minimum: int = 1, maximum: int = 32, increase_after: int = 10):
+        self.limit = max(minimum, min(initial, maximum))
+        self.minimum = minimum
+        self.maximum = maximum
+        self.increase_after = increase_after
+        self.in_flight = 0
+        self.successes = 0
+        self.cond = threading.Condition()
+
+    def __enter__(self):
+        with self.cond:
+            while self.in_flight >= self.limit:
+                self.cond.wait()
+            self.in_flight += 1
+        return self
+
+    def __exit__(self, *exc):
+        with self.cond:
+            self.in_flight -= 1
+            self.cond.notify()
+
+    def on_success(self):
+        with self.cond:
+            self.successes += 1
+            if self.successes >= self.increase_after and self.limit < self.maximum:
+                self.limit += 1
+                self.successes = 0
+                self.cond.notify()
+
+    def on_throttle(self):
+        with self.cond:
+            self.limit = max(self.minimum, self.limit // 2)
+            self.successes = 0
+
+
+class RequestLayer:
+    """Rate limited, retrying wrapper around `client.chat.completions.create`.
+
+    Args:
+        requests_per_min: Request quota of the account.
+        tokens_per_min: Token quota of the account (prompt + max completion).
+        max_concurrency: Upper bound for the adaptive concurrency limit.
+        max_retries: How often a failed call is retried before giving up.
+        base_delay: First backoff delay in seconds, doubled on every retry.
+        max_delay: Cap for a single backoff delay in seconds.
+        count_tokens: Function returning the token count of a string. Defaults
+            to the tiktoken encoder from `core.chunking.get_tokenizer`.
+    """
+
+    def __init__(
+        self,
+        requests_per_min: float = 500,
+        tokens_per_min: float = 200_000,
+        max_concurrency: int = 16,
+        max_retries: int = 6,
+        base_delay: float = 1.0,
+        max_delay: float = 60.0,
+        count_tokens: Optional[Callable[[str], int]] = None,
+        sleep=time.sleep,
+    ):
+        self.requests = TokenBucket(requests_per_min)
+        self.tokens = TokenBucket(tokens_per_min)
+        self.concurrency = AIMDLimiter(initial=min(4, max_concurrency), maximum=max_concurrency)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._count_tokens = count_tokens
+        self.sleep = sleep
+
+    def count_tokens(self, text: str) -> int:
+        if self._count_tokens is None:
+            from core.chunking import get_tokenizer
+
+            enc = get_tokenizer()
+            self._count_tokens = lambda s: len(enc.encode(s))
+        return self._count_tokens(text)
+
+    def estimate_tokens(self, kwargs: dict) -> int:
+        """Tokens OpenAI will charge against the TPM quota for this request."""
+        prompt = sum(self.count_tokens(str(m.get("content") or "")) for m in kwargs.get("messages", []))
+        completion = kwargs.get("max_tokens") or kwargs.get("max_completion_tokens")
+        return prompt + (completion or DEFAULT_COMPLETION_TOKENS)
+
+    def backoff(self, attempt: int, error: Exception) -> float:
+        """Full-jitter exponential backoff, honouring a `retry-after` header."""
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * 2**attempt))
+        response = getattr(error, "response", None)
+        retry_after = response.headers.get("retry-after") if response is not None else None
+        try:
+            return max(delay, float(retry_after))
+        except (TypeError, ValueError):
+            return delay
+
+    def create(self, client, **kwargs):
+        """Same arguments and return value as `client.chat.completions.create`."""
+        with span("chat_completion", model=kwargs.get("model")) as attrs:
+            response = self._create(client, kwargs, attrs)
+            usage = getattr(response, "usage", None)
+            if usage is not None:
+                attrs["prompt_tokens"] = usage.prompt_tokens
+                attrs["completion_tokens"] = usage.completion_tokens
+            return response
+
+    def _create(self, client, kwargs: dict, attrs: dict):
+        import openai
+
+        tokens = self.estimate_tokens(kwargs)
+        retryable = retryable_errors()
+        for attempt in range(self.max_retries + 1):
+            attrs["retries"] = attempt
+            with self.concurrency:
+                self.requests.acquire(1, sleep=self.sleep)
+                self.tokens.acquire(tokens, sleep=self.sleep)
+                try:
+                    response = client.chat.completions.create(**kwargs)
+                except retryable as e:
+                    if isinstance(e, openai.RateLimitError):
+                        self.concurrency.on_throttle()
+                    if attempt == self.max_retries:
+                        raise
+                    error = e
+                else:
+                    self.concurrency.on_success()
+                    return response
+            # back off outside the concurrency slot, so other calls can go ahead
+            self.sleep(self.backoff(attempt, error))
+
+
+_layer = None
+_layer_lock = threading.Lock()
+
+
+def get_request_layer() -> RequestLayer:
+    """Return the process-wide request layer, shared by all pages and sessions."""
+    global _layer
+    with _layer_lock:
+        if _layer is None:
+            _layer = RequestLayer(
+                requests_per_min=float(os.environ.get("OPENAI_RPM", 500)),
+                tokens_per_min=float(os.environ.get("OPENAI_TPM", 200_000)),
+                max_concurrency=int(os.environ.get("OPENAI_MAX_CONCURRENCY", 16)),
+                max_retries=int(os.environ.get("OPENAI_MAX_RETRIES", 6)),
+            )
+        return _layer
+
+
+def chat_completion(client, **kwargs):
+    """Drop-in replacement for `client.chat.completions.create(**kwargs)`."""
+    return get_request_layer().create(client, **kwargs)
+
+
+def stream_chat_completion(client, **kwargs):
+    """Like `chat_completion` with `stream=True`, but yields only the text deltas.
+
+    Retries cover opening the stream; once text has been yielded an error is
+    raised to the caller rather than starting the answer over.
+    """
+    with span("chat_stream", model=kwargs.get("model")) as attrs:
+        stream = chat_completion(client, stream=True, stream_options={"include_usage": True}, **kwargs)
+        for chunk in stream:
+            # the last chunk carries the token usage and no choices
+            if getattr(chunk, "usage", None) is not None:
+                attrs["prompt_tokens"] = chunk.usage.prompt_tokens
+                attrs["completion_tokens"] = chunk.usage.completion_tokens
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
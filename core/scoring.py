@@ -0,0 +1,125 @@
+"""Local quality scores for model output.
+
+NumPy is only imported when a text is scored.
+"""
+
+import re
+
+from core.tracing import traced
+
+# a translated chunk failing any of these is escalated to a stronger model or reviewed
+MAX_PERPLEXITY = 1500
+# translated length / source length, in words (see `text_length`)
+MIN_LENGTH_RATIO = 0.5
+MAX_LENGTH_RATIO = 2.0
+# share of the translation still in another language than the target
+MAX_UNTRANSLATED = 0.2
+
+
+# han, kana and hangul syllables: written without spaces (or with few), so
+# they are counted per character instead of per word
+_DENSE_CHARS = re.compile(
+    "[\u1100-\u11ff\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uf900-\ufaff]"
+)
+# one such character carries about as much as 0.7 English words
+DENSE_CHAR_WEIGHT = 0.7
+_WORD_CHAR = re.compile(r"[^\W_]")
+
+
+def text_length(text: str) -> float:
+    """Length of `text` in words, comparable across scripts.
+
+    Character counts are useless between e.g. Japanese and English, where the
+    translation is three to four times as long, so spaced scripts count words
+    and CJK/hangul text counts `DENSE_CHAR_WEIGHT` per character.
+    """
+    dense = len(_DENSE_CHARS.findall(text))
+    rest = _DENSE_CHARS.sub(" ", text)
+    words = sum(1 for word in rest.split() if _WORD_CHAR.search(word))
+    return words + dense * DENSE_CHAR_WEIGHT
+
+
+class TrigramModel:
+    """Add-one smoothed word trigram model that can be fed one chunk at a time.
+
+    Words are mapped to integer ids as they arrive, n-grams are packed into
+    single int64 keys (21 bits per word id) and counted with `np.unique`, so
+    scoring is a handful of array operations instead of a loop per word.
+    """
+
+    ID_BITS = 21
+
+    def __init__(self):
+        self.vocab = {}
+        self.ids = []
+
+    def update(self, text: str) -> "TrigramModel":
+        """Add the words of `text`, continuing right after the previous update."""
+        import numpy as np
+
+        words = text.split()
+        vocab = self.vocab
+        ids = np.fromiter(
+            (vocab.setdefault(w, len(vocab)) for w in words), dtype=np.int64, count=len(words)
+        )
+        if len(vocab) >= 1 << self.ID_BITS:
+            raise ValueError(f"vocabulary larger than {1 << self.ID_BITS:,} words")
+        self.ids.append(ids)
+        return self
+
+    def perplexity(self) -> float:
+        import numpy as np
+
+        ids = np.concatenate(self.ids) if self.ids else np.empty(0, dtype=np.int64)
+        if len(ids) <= 2:
+            # no trigram to score, so nothing looks surprising
+            return 1.0
+        bigrams = (ids[:-1] << self.ID_BITS) | ids[1:]
+        trigrams = (bigrams[:-1] << self.ID_BITS) | ids[2:]
+        trigram_counts = _counts_per_position(trigrams)
+        # the context of the trigram starting at i is the bigram starting at i
+        context_counts = _counts_per_position(bigrams)[:-1]
+        log_probs = np.log(trigram_counts + 1) - np.log(context_counts + len(self.vocab))
+        return float(np.exp(-log_probs.mean()))
+
+
+def _counts_per_position(keys):
+    """How often the key at each position occurs in the whole array."""
+    import numpy as np
+
+    _, inverse, counts = np.unique(keys, return_inverse=True, return_counts=True)
+    return counts[inverse]
+
+
+@traced
+def perplexity_check(text: str) -> float:
+    """Return a crude "perplexity" estimate for the text using a trigram model.
+
+    If the perplexity is too high (e.g. >1500), you may flag the translation for user review.
+    Texts shorter than three words score 1.0.
+    """
+    return TrigramModel().update(text).perplexity()
+
+
+def translation_scores(source: str, translation: str, language: str = "English") -> dict:
+    """Local scores of one translated chunk: `perplexity`, `length_ratio` and `untranslated`."""
+    from core.langid import foreign_share
+
+    source_length = text_length(source)
+    return {
+        "perplexity": perplexity_check(translation),
+        "length_ratio": text_length(translation) / source_length if source_length else 1.0,
+        "untranslated": foreign_share(translation, language),
+    }
+
+
+def failed_checks(scores: dict) -> list[str]:
+    """Names of the scores outside their thresholds; empty if the chunk passes."""
+    failed = []
+    if scores["perplexity"] > MAX_PERPLEXITY:
+        failed.append("perplexity")
+    if not MIN_LENGTH_RATIO <= scores["length_ratio"] <= MAX_LENGTH_RATIO:
+        failed.append("length_ratio")
+    if scores["untranslated"] > MAX_UNTRANSLATED:
+        failed.append("untranslated")
+    return failed
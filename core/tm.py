@@ -0,0 +1,173 @@
+"""Segment-level translation memory.
+
+Documents are split into sentences/paragraphs ("segments"). Every segment that
+was translated before (headers, footers, disclaimers, table labels, ...) is
+taken from the memory, and only the unseen ones are sent to the model. The
+memory is a SQLite file indexed by the hash of the normalised source segment
+and the target language, configurable through `LLMDCP_TM_PATH`.
+"""
+
+import contextlib
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Callable, Optional
+
+from core.langid import needs_translation
+
+DEFAULT_PATH = Path(__file__).parent.parent / ".cache" / "translation_memory.sqlite3"
+
+# a sentence ends with . ! or ? followed by whitespace and something that
+# starts a new sentence; paragraph breaks always end a segment
+_BOUNDARY = re.compile(r"(?<=[.!?])(\s+)(?=[\"'(\[]?[A-ZÄÖÜÀ-Ý0-9])|(\n\s*)")
+_MARKER = re.compile(r"\[\[(\d+)\]\]")
+
+
+def segment(text: str) -> list[tuple[str, str]]:
+    """Split `text` into `(segment, separator)` pairs.
+
+    Joining every segment with the separator that follows it gives back the
+    original text, so translated segments can be stitched back in place.
+    """
+    pairs = []
+    start = 0
+    for match in _BOUNDARY.finditer(text):
+        pairs.append((text[start : match.start()], match.group(0)))
+        start = match.end()
+    pairs.append((text[start:], ""))
+    return [(seg, sep) for seg, sep in pairs if seg or sep]
+
+
+def normalize(seg: str) -> str:
+    return " ".join(seg.split())
+
+
+def format_numbered(segments: list[str]) -> str:
+    """Render segments as `[[1]] ...` lines for a batched prompt."""
+    return "\n".join(f"[[{i}]] {seg}" for i, seg in enumerate(segments, 1))
+
+
+def parse_numbered(text: str, expected: int) -> Optional[list[str]]:
+    """Inverse of `format_numbered`; `None` if the model broke the numbering."""
+    parts = _MARKER.split(text)
+    # parts = [preamble, "1", seg1, "2", seg2, ...]
+    numbers = [int(n) for n in parts[1::2]]
+    if numbers != list(range(1, expected + 1)):
+        return None
+    return [seg.strip() for seg in parts[2::2]]
+
+
+class TranslationMemory:
+    """Indexed store of previously translated `(source, target, language)` segments."""
+
+    def __init__(self, path=DEFAULT_PATH):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as db:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute(
+                """CREATE TABLE IF NOT EXISTS segments (
+                    source_hash TEXT NOT NULL,
+                    language TEXT NOT NULL,
+                    source TEXT NOT NULL,
+                    target TEXT NOT NULL,
+                    PRIMARY KEY (source_hash, language)
+                )"""
+            )
+
+    @contextlib.contextmanager
+    def _connect(self):
+        db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        try:
+            yield db
+        finally:
+            db.close()
+
+    @staticmethod
+    def _hash(seg: str) -> str:
+        return hashlib.sha256(normalize(seg).encode()).hexdigest()
+
+    def lookup(self, segments: list[str], language: str) -> dict[str, str]:
+        """Return the known translations of `segments`, keyed by normalised source."""
+        hashes = {self._hash(seg): normalize(seg) for seg in segments}
+        found = {}
+        with self._connect() as db:
+            keys = list(hashes)
+            # stay well below SQLite's bound-parameter limit
+            for i in range(0, len(keys), 500):
+                batch = keys[i : i + 500]
+                rows = db.execute(
+                    f"SELECT source_hash, target FROM segments WHERE language = ? "
+                    f"AND source_hash IN ({','.join('?' * len(batch))})",
+                    [language, *batch],
+                )
+                for source_hash, target in rows:
+                    found[hashes[source_hash]] = target
+        return found
+
+    def store(self, pairs: list[tuple[str, str]], language: str):
+        with self._connect() as db:
+            db.executemany(
+                "INSERT OR REPLACE INTO segments VALUES (?, ?, ?, ?)",
+                [(self._hash(src), language, normalize(src), tgt) for src, tgt in pairs],
+            )
+
+
+def translate_with_memory(
+    text: str,
+    translate_segments: Callable[[list[str]], Optional[list[str]]],
+    memory: TranslationMemory,
+    language: str,
+    pending: Optional[list[tuple[str, str]]] = None,
+) -> Optional[str]:
+    """Translate `text` segment by segment, only sending unseen segments.
+
+    Args:
+        text: Source text.
+        translate_segments: Translates a list of segments in one go and returns
+            a list of the same length, or `None` if the output could not be
+            split back into segments.
+        memory: Where known translations are looked up and new ones stored.
+        language: Target language, part of the memory key.
+        pending: If given, the new `(source, translation)` pairs are added to
+            it instead of being stored, so the caller can store them once
+            the translation has passed its checks.
+
+    Returns:
+        The stitched translation, or `None` if `translate_segments` gave up,
+        so the caller can fall back to translating the text as a whole.
+    """
+    pairs = segment(text)
+    # segments already in `language`, figures and code are kept as they are
+    sources = [normalize(seg) for seg, _ in pairs if needs_translation(seg, language)]
+    known = memory.lookup(sources, language)
+
+    # boilerplate often repeats within one document too, send it only once
+    unseen = list(dict.fromkeys(seg for seg in sources if seg not in known))
+    if unseen:
+        translated = translate_segments(unseen)
+        if translated is None or len(translated) != len(unseen):
+            return None
+        if pending is None:
+            memory.store(list(zip(unseen, translated)), language)
+        else:
+            pending.extend(zip(unseen, translated))
+        known.update(zip(unseen, translated))
+
+    return "".join(known.get(normalize(seg), seg) + sep for seg, sep in pairs)
+
+
+_memory = None
+_memory_lock = threading.Lock()
+
+
+def get_memory() -> TranslationMemory:
+    """Return the process-wide translation memory."""
+    global _memory
+    with _memory_lock:
+        if _memory is None:
+            _memory = TranslationMemory(os.environ.get("LLMDCP_TM_PATH", DEFAULT_PATH))
+        return _memory
@@ -0,0 +1,428 @@
+"""Spans for model calls and pipeline stages, kept in a local SQLite file.
+
+Every chat completion, memoized model call and extraction/chunking/scoring
+stage records one span: its name, the document it belongs to, how long it
+took and, for model calls, model, tokens, retries and cache hits. The
+metrics page and the Prometheus exporter read them back:
+
+    python -m core.tracing              # print the metrics once
+    python -m core.tracing --port 9464  # serve them on /metrics
+
+Spans older than `LLMDCP_TRACE_RETENTION` seconds (default 30 days) are
+deleted. Set `LLMDCP_TRACE=0` to turn tracing off, `LLMDCP_TRACE_PATH` to move
+the file.
+"""
+
+import argparse
+import contextlib
+import contextvars
+import functools
+import inspect
+import math
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Optional
+
+DEFAULT_PATH = Path(__file__).parent.parent / ".cache" / "traces.sqlite3"
+
+# seconds between two sweeps of the spans older than the retention
+PURGE_INTERVAL = 600
+
+# USD per million (input, output) tokens; update when the price list changes
+PRICES = {
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-4o": (2.50, 10.00),
+    "gpt-5-nano": (0.05, 0.40),
+}
+
+COLUMNS = (
+    "name",
+    "document",
+    "start",
+    "seconds",
+    "model",
+    "prompt_tokens",
+    "completion_tokens",
+    "retries",
+    "cache_hit",
+    "error",
+)
+
+_document = contextvars.ContextVar("llmdcp_document", default=None)
+
+
+@contextlib.contextmanager
+def document(doc_id: Optional[str]):
+    """Attribute every span recorded inside the block (and its worker threads) to `doc_id`."""
+    token = _document.set(doc_id)
+    try:
+        yield
+    finally:
+        _document.reset(token)
+
+
+# nearest-rank percentiles from each span's rank within its name
+_SUMMARY = """
+SELECT name, COUNT(*), SUM(COALESCE(error, '') != ''), SUM(COALESCE(cache_hit, 0) != 0),
+       MAX(CASE WHEN pos = MAX((50 * n + 99) / 100, 1) THEN seconds END),
+       MAX(CASE WHEN pos = MAX((95 * n + 99) / 100, 1) THEN seconds END),
+       SUM(seconds), SUM(COALESCE(completion_tokens, 0))
+FROM (
+    SELECT name, seconds, error, cache_hit, completion_tokens,
+           ROW_NUMBER() OVER (PARTITION BY name ORDER BY seconds) AS pos,
+           COUNT(*) OVER (PARTITION BY name) AS n
+    FROM spans WHERE start >= ?
+)
+GROUP BY name ORDER BY name
+"""
+
+# spans of a document split by model, so the cost can be added up in Python
+_DOCUMENTS = """
+SELECT document, model, SUM(prompt_tokens IS NOT NULL OR completion_tokens IS NOT NULL),
+       SUM(COALESCE(prompt_tokens, 0)), SUM(COALESCE(completion_tokens, 0)),
+       MIN(start), MAX(start + seconds)
+FROM spans WHERE start >= ? AND document IS NOT NULL
+GROUP BY document, model ORDER BY MIN(start)
+"""
+
+_USAGE = """
+SELECT model, SUM(prompt_tokens IS NOT NULL),
+       SUM(COALESCE(prompt_tokens, 0)), SUM(COALESCE(completion_tokens, 0))
+FROM spans WHERE start >= ? AND (model IS NOT NULL OR prompt_tokens IS NOT NULL)
+GROUP BY model ORDER BY model
+"""
+
+
+class SpanStore:
+    """Table of finished spans, kept for `retention` seconds.
+
+    Besides the raw spans, the store aggregates them in SQL (`summarize`,
+    `per_document`, `usage`), so the metrics page and the exporter don't
+    load every span of a long time window.
+
+    Args:
+        path: Location of the SQLite file (created if missing).
+        retention: Spans older than this many seconds are deleted when the
+            store is opened and then every `PURGE_INTERVAL` seconds of
+            writes. `None` keeps them forever.
+        clock: Returns the current time; replaceable for tests.
+    """
+
+    def __init__(self, path=DEFAULT_PATH, retention: Optional[float] = 30 * 24 * 3600, clock=time.time):
+        self.path = Path(path)
+        self.retention = retention
+        self.clock = clock
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as db:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute(
+                """CREATE TABLE IF NOT EXISTS spans (
+                    name TEXT NOT NULL,
+                    document TEXT,
+                    start REAL NOT NULL,
+                    seconds REAL NOT NULL,
+                    model TEXT,
+                    prompt_tokens INTEGER,
+                    completion_tokens INTEGER,
+                    retries INTEGER,
+                    cache_hit INTEGER,
+                    error TEXT
+                )"""
+            )
+            db.execute("CREATE INDEX IF NOT EXISTS spans_start ON spans (start)")
+        self._purged = None
+        self._purge()
+
+    @contextlib.contextmanager
+    def _connect(self):
+        db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        try:
+            # spans are telemetry, losing the last few on a power cut is fine
+            db.execute("PRAGMA synchronous=NORMAL")
+            yield db
+        finally:
+            db.close()
+
+    def write(self, span: dict):
+        with self._connect() as db:
+            db.execute(
+                f"INSERT INTO spans VALUES ({','.join('?' * len(COLUMNS))})",
+                [span.get(col) for col in COLUMNS],
+            )
+        self._purge()
+
+    def _purge(self):
+        now = self.clock()
+        if self.retention is None or (self._purged is not None and now - self._purged < PURGE_INTERVAL):
+            return
+        self._purged = now
+        with self._connect() as db:
+            db.execute("DELETE FROM spans WHERE start < ?", [now - self.retention])
+
+    def spans(self, since: float = 0) -> list[dict]:
+        """Spans that started at or after `since` (epoch seconds), oldest first."""
+        with self._connect() as db:
+            rows = db.execute(
+                f"SELECT {','.join(COLUMNS)} FROM spans WHERE start >= ? ORDER BY start", [since]
+            ).fetchall()
+        return [dict(zip(COLUMNS, row)) for row in rows]
+
+    def summarize(self, since: float = 0) -> list[dict]:
+        """One row per span name: calls, errors, cache hits, p50/p95/total seconds and tokens/s.
+
+        Only spans that started at or after `since` (epoch seconds) count,
+        here and in the other aggregates.
+        """
+        with self._connect() as db:
+            rows = db.execute(_SUMMARY, [since]).fetchall()
+        return [
+            _summary_row(name, calls, errors, cache_hits, p50, p95, total, completion)
+            for name, calls, errors, cache_hits, p50, p95, total, completion in rows
+        ]
+
+    def per_document(self, since: float = 0) -> list[dict]:
+        """One row per document: model calls, tokens, wall-clock seconds, tokens/s and cost."""
+        with self._connect() as db:
+            rows = db.execute(_DOCUMENTS, [since]).fetchall()
+        docs = {}
+        for doc_id, model, calls, prompt, completion, start, end in rows:
+            doc = docs.setdefault(doc_id, _document_row(doc_id, start))
+            doc["start"], doc["end"] = min(doc["start"], start), max(doc["end"], end)
+            doc["calls"] += calls
+            doc["prompt_tokens"] += prompt
+            doc["completion_tokens"] += completion
+            doc["cost_usd"] += cost(model, prompt, completion)
+        return [_finish_document(doc) for doc in docs.values()]
+
+    def usage(self, since: float = 0) -> list[dict]:
+        """One row per model: calls that reported tokens, prompt/completion tokens and cost."""
+        with self._connect() as db:
+            rows = db.execute(_USAGE, [since]).fetchall()
+        return [_usage_row(*row) for row in rows]
+
+    def prometheus_text(self, since: float = 0) -> str:
+        """Render the aggregates in the Prometheus text exposition format."""
+        return _render_prometheus(self.summarize(since), self.usage(since))
+
+    def clear(self):
+        with self._connect() as db:
+            db.execute("DELETE FROM spans")
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store() -> Optional[SpanStore]:
+    """Return the process-wide span store, or `None` if tracing is turned off."""
+    global _store
+    if os.environ.get("LLMDCP_TRACE") == "0":
+        return None
+    with _store_lock:
+        if _store is None:
+            retention = os.environ.get("LLMDCP_TRACE_RETENTION")
+            _store = SpanStore(
+                os.environ.get("LLMDCP_TRACE_PATH", DEFAULT_PATH),
+                retention=float(retention) if retention else 30 * 24 * 3600,
+            )
+        return _store
+
+
+def _record(name: str, doc: Optional[str], start: float, seconds: float, attrs: dict):
+    store = get_store()
+    if store is not None:
+        store.write({**attrs, "name": name, "document": doc, "start": start, "seconds": seconds})
+
+
+@contextlib.contextmanager
+def span(name: str, **attrs):
+    """Time the block and record it as a span.
+
+    The yielded dict holds the span's attributes and can be filled in from
+    inside the block, e.g. with the token counts of a response.
+    """
+    start, t0 = time.time(), time.perf_counter()
+    try:
+        yield attrs
+    except BaseException as e:
+        attrs["error"] = type(e).__name__
+        raise
+    finally:
+        _record(name, _document.get(), start, time.perf_counter() - t0, attrs)
+
+
+def _iter_span(name: str, items):
+    """Yield from `items`, timing only the work done inside the iterator itself."""
+    doc, start = _document.get(), time.time()
+    seconds = 0.0
+    attrs = {}
+    items = iter(items)
+    try:
+        while True:
+            t0 = time.perf_counter()
+            try:
+                item = next(items)
+            except StopIteration:
+                return
+            finally:
+                seconds += time.perf_counter() - t0
+            yield item
+    except GeneratorExit:
+        raise
+    except BaseException as e:
+        attrs["error"] = type(e).__name__
+        raise
+    finally:
+        _record(name, doc, start, seconds, attrs)
+
+
+def traced(fn=None, *, name: Optional[str] = None):
+    """Decorator recording a span per call, named after the function.
+
+    Generator functions are timed by the work done inside them, not by how
+    long the caller takes to consume them.
+    """
+    if fn is None:
+        return functools.partial(traced, name=name)
+    span_name = name or fn.__name__
+
+    if inspect.isgeneratorfunction(fn):
+
+        @functools.wraps(fn)
+        def wrapped_iter(*args, **kwargs):
+            return _iter_span(span_name, fn(*args, **kwargs))
+
+        return wrapped_iter
+
+    @functools.wraps(fn)
+    def wrapped(*args, **kwargs):
+        with span(span_name):
+            return fn(*args, **kwargs)
+
+    return wrapped
+
+
+def cost(model: Optional[str], prompt_tokens: Optional[int], completion_tokens: Optional[int]) -> float:
+    """Price of one call in USD; 0 for models missing from `PRICES`."""
+    price_in, price_out = PRICES.get(model or "", (0.0, 0.0))
+    return ((prompt_tokens or 0) * price_in + (completion_tokens or 0) * price_out) / 1e6
+
+
+def percentile(values: list[float], q: float) -> float:
+    """Nearest-rank percentile, `q` in [0, 100]."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[max(math.ceil(q / 100 * len(ordered)) - 1, 0)]
+
+
+def _summary_row(name, calls, errors, cache_hits, p50, p95, total, completion) -> dict:
+    return {
+        "name": name,
+        "calls": calls,
+        "errors": errors,
+        "cache_hits": cache_hits,
+        "p50_s": p50,
+        "p95_s": p95,
+        "total_s": total,
+        "tokens_per_s": completion / total if completion and total else 0.0,
+    }
+
+
+def _document_row(doc_id: str, start: float) -> dict:
+    return {
+        "document": doc_id,
+        "calls": 0,
+        "prompt_tokens": 0,
+        "completion_tokens": 0,
+        "start": start,
+        "end": start,
+        "cost_usd": 0.0,
+    }
+
+
+def _finish_document(doc: dict) -> dict:
+    seconds = doc.pop("end") - doc.pop("start")
+    doc["seconds"] = seconds
+    doc["tokens_per_s"] = doc["completion_tokens"] / seconds if seconds else 0.0
+    return doc
+
+
+def _usage_row(model, calls, prompt, completion) -> dict:
+    return {
+        "model": model,
+        "calls": calls,
+        "prompt_tokens": prompt,
+        "completion_tokens": completion,
+        "cost_usd": cost(model, prompt, completion),
+    }
+
+
+def _render_prometheus(summary: list[dict], usage_rows: list[dict]) -> str:
+    lines = [
+        "# HELP llmdcp_span_seconds Duration of traced calls and stages.",
+        "# TYPE llmdcp_span_seconds summary",
+    ]
+    for row in summary:
+        label = f'name="{row["name"]}"'
+        lines += [
+            f'llmdcp_span_seconds{{{label},quantile="0.5"}} {row["p50_s"]:.6f}',
+            f'llmdcp_span_seconds{{{label},quantile="0.95"}} {row["p95_s"]:.6f}',
+            f"llmdcp_span_seconds_sum{{{label}}} {row['total_s']:.6f}",
+            f"llmdcp_span_seconds_count{{{label}}} {row['calls']}",
+        ]
+    models = [row for row in usage_rows if row["model"] is not None]
+    lines += [
+        "# HELP llmdcp_tokens_total Tokens sent and received.",
+        "# TYPE llmdcp_tokens_total counter",
+    ]
+    lines += [
+        f'llmdcp_tokens_total{{model="{row["model"]}",kind="{kind}"}} {row[f"{kind}_tokens"]}'
+        for row in models
+        for kind in ("completion", "prompt")
+    ]
+    lines += ["# HELP llmdcp_cost_usd_total Estimated spend.", "# TYPE llmdcp_cost_usd_total counter"]
+    lines += [f'llmdcp_cost_usd_total{{model="{row["model"]}"}} {row["cost_usd"]:.6f}' for row in models]
+    lines += [
+        "# HELP llmdcp_cache_hits_total Memoized calls answered from the cache.",
+        "# TYPE llmdcp_cache_hits_total counter",
+        f"llmdcp_cache_hits_total {sum(row['cache_hits'] for row in summary)}",
+    ]
+    return "\n".join(lines) + "\n"
+
+
+def serve(port: int, store: SpanStore):
+    """Serve `prometheus_text` of all spans on http://0.0.0.0:`port`/metrics."""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Metrics(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path != "/metrics":
+                self.send_error(404)
+                return
+            body = store.prometheus_text().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    ThreadingHTTPServer(("0.0.0.0", port), Metrics).serve_forever()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export traced spans as Prometheus metrics.")
+    parser.add_argument("--port", type=int, help="serve /metrics on this port instead of printing once")
+    args = parser.parse_args(argv)
+    store = get_store() or SpanStore(os.environ.get("LLMDCP_TRACE_PATH", DEFAULT_PATH))
+    if args.port:
+        serve(args.port, store)
+    else:
+        print(store.prometheus_text(), end="")
+
+
+if __name__ == "__main__":
+    main()
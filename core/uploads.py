@@ -0,0 +1,122 @@
+"""Content-addressed store for uploaded documents.
+
+An upload is streamed to disk once, hashed on the way, and stored under its
+sha256 digest (the same digest as `extract.file_hash`). From then on the
+page, the job and the extractors pass the digest and the file's path around
+instead of the bytes: PDFium, pdfplumber and python-docx read the file
+through their own file handles, and caches and checkpoints are keyed by the
+digest without hashing the payload again. Uploading the same file twice
+stores it once.
+
+The least recently used files are deleted once the store grows past
+`max_bytes`, except the ones pinned by a queued or running job: the
+extractors reopen the path (PDFium once per batch of pages), so a file
+deleted under a job would fail it halfway. Configured through `LLMDCP_UPLOAD_PATH` and
+`LLMDCP_UPLOAD_MAX_BYTES`.
+"""
+
+import hashlib
+import os
+import tempfile
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from pathlib import Path
+from typing import BinaryIO
+
+DEFAULT_PATH = Path(__file__).parent.parent / ".cache" / "uploads"
+
+
+class UploadStore:
+    """Directory of files named by the sha256 of their content.
+
+    Args:
+        root: Directory of the store (created if missing).
+        max_bytes: Total size kept; older files are deleted first.
+    """
+
+    def __init__(self, root=DEFAULT_PATH, max_bytes: int = 2 * 1024**3):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._pins = Counter()
+
+    def path(self, digest: str) -> Path:
+        return self.root / digest[:2] / digest
+
+    def __contains__(self, digest: str) -> bool:
+        return self.path(digest).exists()
+
+    def put(self, file: BinaryIO, block_size: int = 1 << 20) -> str:
+        """Copy a binary file object into the store, block by block; returns its digest."""
+        sha = hashlib.sha256()
+        fd, tmp = tempfile.mkstemp(dir=self.root, suffix=".part")
+        try:
+            with os.fdopen(fd, "wb") as out:
+                while block := file.read(block_size):
+                    sha.update(block)
+                    out.write(block)
+            digest = sha.hexdigest()
+            path = self.path(digest)
+            path.parent.mkdir(exist_ok=True)
+            # content-addressed, so an existing file already has these bytes
+            os.replace(tmp, path)
+        except BaseException:
+            Path(tmp).unlink(missing_ok=True)
+            raise
+        self._evict(keep=digest)
+        return digest
+
+    def touch(self, digest: str):
+        """Mark a stored file as used, so it is evicted last."""
+        now = time.time()
+        os.utime(self.path(digest), (now, now))
+
+    @contextmanager
+    def pinned(self, digest: str):
+        """Keep the file of `digest` from being evicted while the block runs."""
+        with self._lock:
+            self._pins[digest] += 1
+        try:
+            yield self.path(digest)
+        finally:
+            with self._lock:
+                self._pins[digest] -= 1
+                if not self._pins[digest]:
+                    del self._pins[digest]
+
+    def _evict(self, keep: str):
+        with self._lock:
+            files = []
+            for path in self.root.glob("??/*"):
+                try:
+                    stat = path.stat()
+                except FileNotFoundError:
+                    continue
+                files.append((stat.st_mtime, stat.st_size, path))
+            total = sum(size for _, size, _ in files)
+            for _, size, path in sorted(files):
+                if total <= self.max_bytes:
+                    break
+                if path.name == keep or path.name in self._pins:
+                    continue
+                path.unlink(missing_ok=True)
+                total -= size
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_uploads() -> UploadStore:
+    """Return the process-wide upload store configured from the environment."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = UploadStore(
+                os.environ.get("LLMDCP_UPLOAD_PATH", DEFAULT_PATH),
+                max_bytes=int(os.environ.get("LLMDCP_UPLOAD_MAX_BYTES", 2 * 1024**3)),
+            )
+        return _store
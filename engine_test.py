@@ -0,0 +1,90 @@
+import threading
+import time
+
+import pytest
+
+from core.engine import map_ordered, map_packed, pack, reduce_tree
+
+
+def test_map_ordered_keeps_input_order():
+    # later items finish first
+    def slow_square(x):
+        time.sleep(0.01 * (5 - x))
+        return x * x
+
+    assert map_ordered(slow_square, range(5), max_in_flight=5) == [0, 1, 4, 9, 16]
+
+
+def test_map_ordered_respects_max_in_flight():
+    lock = threading.Lock()
+    running = 0
+    peak = 0
+
+    def work(x):
+        nonlocal running, peak
+        with lock:
+            running += 1
+            peak = max(peak, running)
+        time.sleep(0.01)
+        with lock:
+            running -= 1
+        return x
+
+    assert map_ordered(work, range(20), max_in_flight=3) == list(range(20))
+    assert peak <= 3
+
+
+def test_map_ordered_reports_results_and_raises():
+    seen = []
+    map_ordered(str, iter([1, 2, 3]), on_result=lambda i, r: seen.append((i, r)))
+    assert sorted(seen) == [(0, "1"), (1, "2"), (2, "3")]
+
+    def boom(x):
+        raise RuntimeError("API down")
+
+    with pytest.raises(RuntimeError):
+        map_ordered(boom, [1, 2])
+
+
+def test_reduce_tree_merges_in_order_within_budget():
+    calls = []
+
+    def merge(group):
+        calls.append(group)
+        return "".join(group)
+
+    # budget of 4 "tokens" (characters) fits two leaves per merge
+    assert reduce_tree(list("abcdefg"), merge, count_tokens=len, budget=4) == "abcdefg"
+    assert all(sum(map(len, group)) <= 4 or len(group) == 2 for group in calls)
+    assert len(calls) < 7
+    assert reduce_tree(["only"], merge, count_tokens=len, budget=4) == "only"
+
+
+def test_pack_respects_budget_and_item_limit():
+    assert pack(["aa", "bb", "cc", "dddddd", "e"], len, budget=4, max_items=5) == [
+        ["aa", "bb"],
+        ["cc"],
+        ["dddddd"],
+        ["e"],
+    ]
+    assert pack(list("abcde"), len, budget=100, max_items=2) == [["a", "b"], ["c", "d"], ["e"]]
+
+
+def test_map_packed_splits_batches_that_do_not_unpack():
+    batches, singles = [], []
+
+    def fn_batch(batch):
+        batches.append(batch)
+        # this "model" merges any batch containing "c" into one answer
+        return None if "c" in batch else [item.upper() for item in batch]
+
+    def fn_one(item):
+        singles.append(item)
+        return item.upper()
+
+    assert map_packed(fn_batch, list("abcdefgh"), fn_one, len, budget=100, max_items=8) == list(
+        "ABCDEFGH"
+    )
+    assert batches[0] == list("abcdefgh")
+    assert sorted(singles) == ["c", "d"]
+    assert len(batches) + len(singles) < 8
@@ -0,0 +1,112 @@
+import sys
+import threading
+import types
+
+import pytest
+
+from benchmarks.pdf_extract_bench import sample_pdf, similarity
+from core import extract
+from core.extract import PDF_BACKENDS, iter_pdf_pages
+from core.pdf_worker import get_pool
+
+PAGES = [["Der Mieter zahlt die Miete.", "Seite 1"], ["Der Vermieter haftet (nicht).", "Seite 2"]]
+
+
+@pytest.mark.parametrize("backend", list(PDF_BACKENDS))
+def test_backends_extract_the_same_text(backend):
+    pages = list(iter_pdf_pages(sample_pdf(PAGES), backend=backend))
+    assert pages == ["Der Mieter zahlt die Miete. Seite 1", "Der Vermieter haftet (nicht). Seite 2"]
+
+
+def test_worker_processes_keep_page_order(tmp_path, monkeypatch):
+    # like a Streamlit page installed as __main__, which the workers must not run
+    page = tmp_path / "page.py"
+    page.write_text("raise RuntimeError('the page ran in a worker')\n")
+    main = types.ModuleType("__main__")
+    main.__file__ = str(page)
+    monkeypatch.setitem(sys.modules, "__main__", main)
+    pages = [[f"Seite {i}"] for i in range(5)]
+    assert list(iter_pdf_pages(sample_pdf(pages), workers=2, batch_pages=2, backend="pdfplumber")) == [
+        f"Seite {i}" for i in range(5)
+    ]
+
+
+def test_worker_errors_reach_the_caller():
+    future = get_pool().submit("_extract_pages", "pdfplumber", "/no/such/file.pdf", 0, 1)
+    with pytest.raises(FileNotFoundError):
+        future.result(timeout=30)
+    # the worker is still there for the next task
+    assert get_pool().submit("_looks_broken", "\ufffd\ufffd").result(timeout=30)
+
+
+@pytest.mark.parametrize("backend", ["pdfium", "auto"])
+def test_threads_extract_at_the_same_time(tmp_path, backend):
+    pages = [[f"Seite {i} " * 40] for i in range(20)]
+    path = tmp_path / "many.pdf"
+    path.write_bytes(sample_pdf(pages))
+    expected = list(iter_pdf_pages(path, backend=backend, workers=1))
+    errors = []
+
+    def extract_repeatedly():
+        try:
+            for _ in range(10):
+                assert list(iter_pdf_pages(path, backend=backend, workers=1)) == expected
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=extract_repeatedly) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+
+
+def test_auto_falls_back_to_pdfplumber_on_broken_pages(monkeypatch):
+    monkeypatch.setattr(extract, "_pdfium_pages", lambda source, start, stop: ["ok", "�� x"][start:stop])
+    plumber = []
+
+    def pdfplumber_pages_at(source, indexes):
+        plumber.append(indexes)
+        return ["fixed"] * len(indexes)
+
+    monkeypatch.setattr(extract, "_pdfplumber_pages_at", pdfplumber_pages_at)
+    assert extract._auto_pages(b"", 0, 2) == ["ok", "fixed"]
+    assert plumber == [[1]]
+
+
+def test_auto_redoes_broken_pages_in_worker_processes(monkeypatch):
+    pages = [[f"Seite {i}"] for i in range(5)]
+    pdfium_pages = extract._pdfium_pages
+
+    def garbled_pdfium_pages(source, start, stop):
+        texts = pdfium_pages(source, start, stop)
+        return [text if start + i not in (1, 4) else "\ufffd\ufffd x" for i, text in enumerate(texts)]
+
+    def in_this_process(source, indexes):
+        raise AssertionError("pdfplumber ran in the parent process")
+
+    monkeypatch.setattr(extract, "_pdfium_pages", garbled_pdfium_pages)
+    # the workers import the module afresh, so only the parent's copy is patched
+    monkeypatch.setattr(extract, "_pdfplumber_pages_at", in_this_process)
+    texts = iter_pdf_pages(sample_pdf(pages), workers=2, batch_pages=2, backend="auto")
+    assert list(texts) == [f"Seite {i}" for i in range(5)]
+
+
+def test_backend_is_chosen_by_argument_or_environment(monkeypatch):
+    data = sample_pdf(PAGES)
+    with pytest.raises(ValueError, match="unknown PDF backend"):
+        list(iter_pdf_pages(data, backend="ocr"))
+    monkeypatch.setenv("LLMDCP_PDF_BACKEND", "ocr")
+    with pytest.raises(ValueError):
+        list(iter_pdf_pages(data))
+    assert list(iter_pdf_pages(data, backend="pdfium")) == [
+        "Der Mieter zahlt die Miete. Seite 1",
+        "Der Vermieter haftet (nicht). Seite 2",
+    ]
+
+
+def test_similarity_counts_shared_words():
+    assert similarity("a b c", "c b a") == 1.0
+    assert similarity("a b", "a c") == 0.5
+    assert similarity("", "") == 1.0
@@ -0,0 +1,64 @@
+from core import pipeline
+
+
+def test_every_language_shares_one_scheduler(monkeypatch):
+    calls = []
+
+    def translate(text, model="gpt-4o-mini", language="English"):
+        calls.append((text, language))
+        return f"{text}:{language}"
+
+    monkeypatch.setattr(pipeline, "translate_subchunk", translate)
+    done = []
+    translated = pipeline.translate_chunks(
+        iter(["eins", "zwei"]),
+        ["English", "French"],
+        use_memory=False,
+        max_in_flight=1,
+        on_result=lambda language, idx, text: done.append((language, idx, text)),
+    )
+    assert translated == {
+        "English": ["eins:English", "zwei:English"],
+        "French": ["eins:French", "zwei:French"],
+    }
+    # chunk by chunk, all languages of a chunk before the next one
+    assert calls == [("eins", "English"), ("eins", "French"), ("zwei", "English"), ("zwei", "French")]
+    assert done == [
+        ("English", 0, "eins:English"),
+        ("French", 0, "eins:French"),
+        ("English", 1, "zwei:English"),
+        ("French", 1, "zwei:French"),
+    ]
+
+
+def test_languages_are_checkpointed_apart(monkeypatch):
+    calls = []
+
+    def translate(text, model="gpt-4o-mini", language="English"):
+        calls.append(language)
+        return f"{text}:{language}"
+
+    monkeypatch.setattr(pipeline, "translate_subchunk", translate)
+    pipeline.translate_chunks(["eins"], ["English"], use_memory=False, doc_id="doc")
+    reused = []
+    translated = pipeline.translate_chunks(
+        ["eins"],
+        ["English", "German"],
+        use_memory=False,
+        doc_id="doc",
+        on_reuse=lambda language, idx: reused.append((language, idx)),
+    )
+    assert translated == {"English": ["eins:English"], "German": ["eins:German"]}
+    assert calls == ["English", "German"]
+    assert reused == [("English", 0)]
+
+
+def test_reviews_of_all_languages(monkeypatch):
+    def review_chunk(text, before="", after="", model="gpt-5-nano", language="English"):
+        return f"{text} ({language}, after {before or '-'})"
+
+    monkeypatch.setattr(pipeline, "review_chunk", review_chunk)
+    reviewed = pipeline.review_translations(
+        {"English": ["a", "b"], "German": ["c", "d"]}, only={"English": {1}}, max_in_flight=2
+    )
+    assert reviewed == {"English": "a\n\nb (English, after a)", "German": "c\n\nd"}
@@ -0,0 +1,113 @@
+import threading
+
+from chunking_test import WordEncoder
+from core import chunking, jobs, pipeline, scoring
+from core.jobs import DONE, FAILED, JobRunner, document_job
+
+
+def test_same_key_returns_the_running_job():
+    runner = JobRunner(max_workers=2)
+    release = threading.Event()
+    calls = []
+
+    def work(job, value):
+        calls.append(value)
+        release.wait(5)
+        return value * 2
+
+    first = runner.submit("a", work, 1)
+    second = runner.submit("a", work, 1)
+    assert first is second
+    release.set()
+    assert first.wait(5)
+    assert (first.status, first.result) == (DONE, 2)
+    # a finished job is reused too
+    assert runner.submit("a", work, 1) is first
+    assert calls == [1]
+
+
+def test_failed_job_is_retried():
+    runner = JobRunner(max_workers=1)
+    attempts = []
+
+    def flaky(job):
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise RuntimeError("boom")
+        return "ok"
+
+    job = runner.submit("k", flaky)
+    job.wait(5)
+    assert job.status == FAILED and str(job.error) == "boom"
+    retry = runner.submit("k", flaky)
+    assert retry is not job
+    retry.wait(5)
+    assert retry.result == "ok"
+
+
+def test_oldest_finished_jobs_are_evicted():
+    runner = JobRunner(max_workers=1, keep=2)
+    for key in "abc":
+        runner.submit(key, lambda job: None).wait(5)
+    runner.submit("d", lambda job: None).wait(5)
+    assert runner.get("a") is None and runner.get("b") is None
+    assert runner.get("c") is not None and runner.get("d") is not None
+
+
+def test_document_job_reports_progress(monkeypatch):
+    def run_document(data, suffix, on_chunk, on_extracted, on_result, **kwargs):
+        chunks = data.decode().split("|")
+        for idx, chunk in enumerate(chunks):
+            on_chunk(idx, chunk)
+        on_extracted()
+        processed = [chunk.upper() for chunk in chunks]
+        for idx, text in enumerate(processed):
+            on_result(idx, text)
+        outputs = {
+            language: {"processed": processed, "output": f"{language}: " + " ".join(processed)}
+            for language in kwargs["languages"]
+        }
+        return {"chunks": chunks, "pages": 0, **next(iter(outputs.values())), "languages": outputs}
+
+    scored = []
+
+    def perplexity_check(text):
+        scored.append(text)
+        return float(len(text))
+
+    monkeypatch.setattr(pipeline, "run_document", run_document)
+    monkeypatch.setattr(scoring, "perplexity_check", perplexity_check)
+    monkeypatch.setattr(chunking, "get_tokenizer", WordEncoder)
+
+    job = jobs.Job("doc")
+    result = document_job(
+        job, b"eins|zwei", ".docx", "translate", True, 4, languages=("English", "French")
+    )
+    assert result["output"] == "English: EINS ZWEI"
+    # once per language, and the top level reuses the first language's
+    assert scored == ["English: EINS ZWEI", "French: EINS ZWEI"]
+    assert result["perplexity"] == result["languages"]["English"]["perplexity"] == 18.0
+    assert result["languages"]["French"]["perplexity"] == 17.0
+    assert job.chunks == ["eins", "zwei"]
+    assert job.chunk_tokens == [1, 1]
+    assert job.sections == {0: "EINS", 1: "ZWEI"}
+    assert job.extracted
+
+
+def test_progress_and_sections_in_page_order():
+    job = jobs.Job("doc")
+    job.started = 100.0
+    for tokens in (10, 20, 30):
+        job.chunk_tokens.append(tokens)
+        job.chunks.append("x")
+    job.sections[1] = "B"
+    assert job.ready_sections() == []
+    p = job.progress(now=110.0)
+    assert (p["done"], p["total"], p["tokens_per_s"], p["eta_s"]) == (1, 3, 2.0, None)
+
+    job.extracted = True
+    job.sections[0] = "A"
+    assert job.ready_sections() == ["A", "B"]
+    assert job.ready_sections(2) == []
+    p = job.progress(now=110.0)
+    assert (p["tokens_done"], p["tokens_per_s"], p["eta_s"]) == (30, 3.0, 10.0)
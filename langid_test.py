@@ -0,0 +1,63 @@
+from core import cache, pipeline
+from core.langid import detect, foreign_share, is_code, needs_translation, passthrough_runs
+
+ENGLISH = "Please return the signed power of attorney by Friday."
+GERMAN = "Bitte senden Sie uns die unterschriebene Vollmacht bis Freitag zurück."
+
+
+def test_detect_tells_the_languages_apart():
+    assert detect(ENGLISH)[0] == "en"
+    assert detect(GERMAN)[0] == "de"
+    assert detect("Les résultats seront publiés la semaine prochaine.")[0] == "fr"
+    assert detect("12.03.2024") == (None, 0.0)
+
+
+def test_needs_translation():
+    assert not needs_translation(ENGLISH, "English")
+    assert needs_translation(GERMAN, "English")
+    assert not needs_translation(GERMAN, "de")
+    # figures, table rows and code need no translation
+    assert not needs_translation("3 / 10")
+    assert not needs_translation("EUR 1.234,56 | 12.03.2024 | 5 %")
+    assert is_code("https://example.com/a?b=1 foo_bar(x);")
+    assert not needs_translation("config.yaml max_tokens=4000")
+    # too short to be sure, so it is sent
+    assert needs_translation("Invoice total", "English")
+
+
+def test_german_full_of_loanwords_is_still_translated():
+    sentences = [
+        "Das neue Feature für den Checkout ist seit gestern live auf der Website.",
+        "Beim Onboarding bekommt jeder Trainee einen Laptop und ein Headset.",
+        "Für das Recruiting nutzen wir jetzt ein Tool aus dem Silicon Valley.",
+        "Der Online Shop bietet am Black Friday einen Sale mit Rabatt Codes.",
+    ]
+    for sentence in sentences:
+        assert needs_translation(sentence, "English"), sentence
+        # and the cascade's check sees it if the model leaves it as it is
+        assert foreign_share(sentence, "English") == 1.0, sentence
+    # English with the same words is still passed through
+    assert not needs_translation("The new checkout feature went live on the website yesterday.")
+    assert foreign_share("The new checkout feature went live on the website yesterday.") == 0.0
+
+
+def test_passthrough_runs_keep_the_lines():
+    text = f"{GERMAN}\n{GERMAN}\n\n{ENGLISH}\n12.03.2024\n{GERMAN}"
+    runs = passthrough_runs(text, "English")
+    assert [translate for _, translate in runs] == [True, False, True]
+    assert "\n".join(run for run, _ in runs) == text
+
+
+def test_translate_subchunk_sends_only_foreign_sentences(tmp_path, monkeypatch):
+    monkeypatch.setattr(cache, "_cache", cache.DiskCache(tmp_path / "cache.sqlite3"))
+    sent = []
+
+    def translate_segments(segments, model="gpt-4o-mini", language="English"):
+        sent.append(segments)
+        return [seg.upper() for seg in segments]
+
+    monkeypatch.setattr(pipeline, "translate_segments", translate_segments)
+    assert pipeline.translate_subchunk(f"{ENGLISH} 42.") == f"{ENGLISH} 42."
+    assert sent == []
+    assert pipeline.translate_subchunk(f"{ENGLISH} {GERMAN}") == f"{ENGLISH} {GERMAN.upper()}"
+    assert sent == [[GERMAN]]
@@ -1,33 +1,11 @@
 import streamlit as st
-from openai import OpenAI
-import os
-import hmac
 
-PROMPT = "Translate the received text into clear, natural German."
-
-def check_password():
-    """Returns `True` if the user had the correct password."""
-
-    def password_entered():
-        """Checks whether a password entered by the user is correct."""
-        if hmac.compare_digest(st.session_state["password"], st.secrets["password"]):
-            st.session_state["password_correct"] = True
-            del st.session_state["password"]  # Don't store the password.
-        else:
-            st.session_state["password_correct"] = False
-
-    # Return True if the password is validated.
-    if st.session_state.get("password_correct", False):
-        return True
-
-    # Show input for password.
-    st.text_input(
-        "Password", type="password", on_change=password_entered, key="password"
-    )
-    if "password_correct" in st.session_state:
-        st.error("😕 Password incorrect")
-    return False
+from core.langid import passthrough_runs
+from core.ratelimit import stream_chat_completion
+from helper import check_password, get_client
 
+LANGUAGE = "German"
+PROMPT = f"Translate the received text into clear, natural {LANGUAGE}."
 
 if not check_password():
     st.stop()  # Do not continue if check_password is not True.
@@ -39,29 +17,33 @@ st.title("Translate text to German")
 st.caption("NOTE: Please do NOT share any sensitive information as OpenAI servers are still stored in the US (not under GDPR)") 
 
 
-client = OpenAI(
-    # This is the default and can be omitted
-    api_key=st.secrets["OPENAI_API_KEY"],
-)
+client = get_client()
 
 def gpt_msg(message_in, prompt=PROMPT):
   #message_in = message_in or 'this is a test message'
   #propmt = propmt or 'translate this sentence into German'
   #role = role or 'user'
-  out = client.chat.completions.create(
-      messages=[
-          {
-              "role": "system",
-              "content": prompt,
-          },
-          {
-              "role": "user",
-              "content": message_in,
-          }
-      ],
-      model="gpt-4o-mini",
-  )
-  return out.choices[0].message.content
+  # lines already in German (or only figures/code) are echoed without a model call
+  for i, (text, translate) in enumerate(passthrough_runs(message_in, LANGUAGE)):
+    if i:
+      yield "\n"
+    if not translate:
+      yield text
+      continue
+    yield from stream_chat_completion(
+        client,
+        messages=[
+            {
+                "role": "system",
+                "content": prompt,
+            },
+            {
+                "role": "user",
+                "content": text,
+            }
+        ],
+        model="gpt-4o-mini",
+    )
 
 if "messages" not in st.session_state:
     st.session_state["messages"] = [
@@ -75,6 +57,6 @@ if prompt := st.chat_input(placeholder="enter your text"):
     st.session_state.messages.append({"role": "user", "content": prompt})
     st.chat_message("user").write(prompt)
 
-    response = gpt_msg(message_in=prompt)
-    st.session_state.messages.append({"role": "assistant", "content": response})
-    st.chat_message("assistant").write(response)
\ No newline at end of file
+    with st.chat_message("assistant"):
+        response = st.write_stream(gpt_msg(message_in=prompt))
+    st.session_state.messages.append({"role": "assistant", "content": response})
\ No newline at end of file
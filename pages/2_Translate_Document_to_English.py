@@ -1,123 +1,23 @@
 import streamlit as st
-from openai import OpenAI
-import os
-import hmac
-import re
 from pathlib import Path
 
-from helper import read_docx, read_pdf_chunks, download_txt, download_docx, perplexity_check, file_hash, split_into_token_chunks
-
-# --- Functions ---
-def check_password():
-    """Returns `True` if the user had the correct password."""
-
-    def password_entered():
-        """Checks whether a password entered by the user is correct."""
-        if hmac.compare_digest(st.session_state["password"], st.secrets["password"]):
-            st.session_state["password_correct"] = True
-            del st.session_state["password"]  # Don't store the password.
-        else:
-            st.session_state["password_correct"] = False
-
-    # Return True if the password is validated.
-    if st.session_state.get("password_correct", False):
-        return True
-
-    # Show input for password.
-    st.text_input(
-        "Password", type="password", on_change=password_entered, key="password"
-    )
-    if "password_correct" in st.session_state:
-        st.error("😕 Password incorrect")
-    return False
-
+from core.engine import DEFAULT_MAX_IN_FLIGHT
+from core.extract import PDF_BACKENDS, default_pdf_backend
+from core.jobs import FAILED, document_job, get_runner
+from core.langid import LANGUAGES
+from core.uploads import get_uploads
+from helper import check_password, download_docx, download_txt, store_upload
 
 if not check_password():
     st.stop()  # Do not continue if check_password is not True.
 
-client = OpenAI(api_key=st.secrets["OPENAI_API_KEY"])
-
-@st.cache_data
-def auto_review(english_text: str, model="gpt-5-nano") -> str:
-    prompt = f"""
-        You are an expert English editor. The following text has already been translated.
-        Check it for mistranslations, missing context, and awkward phrasing, then correct
-        it. Return only the corrected text.
-
-        **Translated text:**
-
-        {english_text}
-    """
-    response = client.chat.completions.create(
-        model=model,
-        messages=[{"role": "user", "content": prompt}],
-        temperature=0.2,
-        max_tokens=4000,
-    )
-    return response.choices[0].message.content.strip()
-
-@st.cache_data
-def translate_subchunk(text: str, model="gpt-4o-mini") -> str:
-    """Request OpenAI ChatGPT to translate a document.
-  
-    Args: 
-        text: Message to send to ChatGPT for translation.
-        model: The model to be used..
-    """
-    prompt = f"""You are an expert translator and language model.  
-Your task is to translate the entire document below from its original language into clear, natural English.  
-The document may contain headings, bullet points, tables, and a mix of formal and informal tone.  
-Please preserve the original structure and formatting as much as possible (use Markdown if needed).  
-If you encounter ambiguous terms or cultural references, provide a brief note in brackets.
-
-**Input Document:**
-
-[START OF DOCUMENT]
-{text}
-[END OF DOCUMENT]
-
-**Output Format:**
-
-1. Translate the whole text into English.  
-2. Keep headings, lists, and tables exactly as in the source (convert tables to Markdown).  
-3. Do NOT add any explanatory text outside the translated content.
-4. Do NOT alter numbers or proper nouns unless they are obviously incorrect in English.
-
-**Now translate the document above.**
-"""
-    response = client.chat.completions.create(
-        model=model,
-        messages=[{"role": "user", "content": prompt}],
-        temperature=0.2,
-        max_tokens=4000,
-    )
-    return response.choices[0].message.content.strip()
-
-def summarize_subchunk(text: str, max_tokens: int = 1000, model="gpt-4o-mini") -> str:
-    """
-    Summarize the input text into a concise English paragraph.
-    """
-    prompt = f"""
-        You are an expert summarizer. Please read the following text and produce a 
-        concise and coherent summary in English. Keep the tone neutral, use complete 
-        sentences, and avoid jargon.
-
-        **Text to summarize:**
-        {text}
-
-        **Summary:**
-    """
-    response = client.chat.completions.create(
-        model=model,
-        messages=[{"role": "user", "content": prompt}],
-        temperature=0.3
-    )
-    return response.choices[0].message.content.strip()
+# how many OpenAI calls a single document may have running at once
+MAX_IN_FLIGHT = int(st.secrets.get("MAX_IN_FLIGHT", DEFAULT_MAX_IN_FLIGHT))
 
 # --- UI ---
 
 st.title("Translate or Summarize documents to English")
-st.write("Upload a file and translate it into English or just summarize it!")
+st.write("Upload a file and translate it into English (or several languages at once) or just summarize it!")
 st.caption("NOTE: Please do NOT share any sensitive information as OpenAI servers are still stored in the US (not under GDPR)") 
 
 
@@ -127,90 +27,166 @@ mode = st.radio(
     options=["Translate document", "Summarize document"],
     index=0,
 )
+use_memory = mode == "Translate document" and st.checkbox(
+    "Reuse translations of repeated sentences (translation memory)",
+    value=True,
+)
+# the document is extracted once and translated into all of them side by side
+languages = ["English"]
+if mode == "Translate document":
+    languages = st.multiselect(
+        "Translate into",
+        options=list(LANGUAGES),
+        default=["English"],
+        help="Every language gets its own result and downloads. The file is only read once.",
+    )
+pdf_backend = st.selectbox(
+    "PDF text extraction",
+    options=list(PDF_BACKENDS),
+    index=list(PDF_BACKENDS).index(default_pdf_backend()),
+    help="pdfium is much faster; pdfplumber analyses the page layout and can help with "
+    "unusual layouts. auto uses pdfium and falls back to pdfplumber on pages it can't read.",
+)
 # file upload
 uploaded_file = st.file_uploader("Upload a file to translate", type=["docx", "pdf"])
 
 if uploaded_file is not None:
-    # get raw bytes once
-    file_bytes = uploaded_file.read()
-    file_md5 = file_hash(file_bytes)
-
-    # read the file
+    # spilled to disk and hashed once per upload, the job reads it from there
+    digest = store_upload(uploaded_file)
     file_type = Path(uploaded_file.name).suffix.lower()
-    if file_type == ".pdf":
-        chunks = read_pdf_chunks(file_bytes, chunk_size=10000) # returns list[str]
-        st.success(f"Extracted {len(chunks)} PDF pages / chunks.")
-    else: # .docx
-        text = read_docx(file_bytes)
-        chunks = [text]
-        st.success(f"Extracted {len(text.split()):,} words from the DOCX.")
-
-    # translate each chunk in parallel
-    st.markdown("### Working...")
-    processed_chunks = []
-
-    for idx, chunk in enumerate(chunks, 1):
-        # split the chunk into token-safe sub-chunks
-        subchunks = split_into_token_chunks(chunk, max_tokens=5000)
-
-        # translate/summarize each sub-chunk
-        if mode == "Translate document":
-            processed_subchunks = [translate_subchunk(sub) for sub in subchunks]
-        else:
-            # Summarize each sub-chunk first, then merge
-            # (Keep the original chunk order; summarizing each chunk then concatenate
-            # this usually gives a good overview of the whole doc.)
-            processed_subchunks = [summarize_subchunk(sub) for sub in subchunks]
-        
-        # write out & re-assemble the translated sub-chunks
-        st.write(processed_subchunks)
-        processed_chunks.append(" ".join(processed_subchunks))
-
-    # re-assemble the processed document
-    full_output = "\n\n".join(processed_chunks)
-
-    # auto-review
-    if mode == "Translate document":
-        with st.spinner("Auto-reviewing..."):
-            reviewed_text = auto_review(full_output)
-    else:
-        reviewed_text = full_output
-
-    st.subheader("After auto-review:")
-    st.write(reviewed_text)
-
-    # external sanity check
-    perplexity_score = perplexity_check(reviewed_text)
-    st.info(f"Perplexity estimate: {perplexity_score:.1f}")
-    if perplexity_score > 1500:
-        st.warning("Perplexity score is high. Please double-check the translation manually.")
-    else:
-        st.success("Perplexity score looks good.")
-
-    # allow users to do manual checking for translations
-    if mode == "Translate document":
-        st.subheader("Original vs. Translated")
-        col1, col2 = st.columns(2)
-        with col1:
-            st.markdown("**Original**")
-            st.write(chunks[0][:2000] + ("..." if len(chunks[0]) > 2000 else ""))
-        with col2:
-            st.markdown("**Translated**")
-            st.write(reviewed_text[:2000] + ("..." if len(reviewed_text) > 2000 else ""))
-
-    # allow manual edits
-    st.markdown("""
-        You can **edit** the translated text directly below if you spot an error.
-        Once satisfied, click one of the download buttons.
-    """)
-
-    edited_text = st.text_area(
-        "Edit translation (optional)", 
-        value=reviewed_text, 
-        height=400,
-        )
-
-    # Download buttons
-    download_txt(edited_text, filename=f"{uploaded_file.name}_translated.txt")
-    download_docx(edited_text, filename=f"{uploaded_file.name}_translated.docx")
+    task = "translate" if mode == "Translate document" else "summarize"
+    if not languages:
+        st.info("Pick at least one language to translate into.")
+        st.stop()
+
+    # the pipeline runs in a background job keyed by the file and settings, so
+    # reruns (edits, downloads) pick up the same job instead of starting over
+    if file_type != ".pdf":
+        pdf_backend = None
+    uploads = get_uploads()
+    job = get_runner().submit(
+        f"{digest}:{task}:{use_memory}:{pdf_backend}:{','.join(languages)}",
+        document_job,
+        uploads.path(digest),
+        file_type,
+        task,
+        use_memory,
+        MAX_IN_FLIGHT,
+        pdf_backend,
+        digest,
+        languages,
+        # the extractors reopen the file, so it must outlive the job
+        hold=uploads.pinned(digest),
+    )
 
+    if not job.done():
+        progress = st.progress(0.0, text="Extracting...")
+        stats = st.empty()
+        live = st.empty()
+        sections = live.container()
+        sections.subheader("Translated sections" if task == "translate" else "Section summaries")
+        if task == "translate" and len(languages) > 1:
+            sections.caption(
+                f"In {languages[0]}, shown in page order as they finish in every language, "
+                "before the auto-review."
+            )
+        else:
+            sections.caption("Shown in page order as they finish, before the auto-review.")
+        shown = 0
+        while True:
+            finished = job.wait(timeout=0.5)
+            # append the sections that are now ready in order, without redrawing earlier ones
+            for section in job.ready_sections(shown):
+                sections.markdown(section)
+                shown += 1
+            if finished:
+                break
+            p = job.progress()
+            total = f"{p['total']}" if p["extracted"] else f"{p['total']}+"
+            if p["extracted"] and p["done"] == p["total"]:
+                label = "Auto-reviewing..." if task == "translate" else "Merging summaries..."
+            else:
+                label = f"{p['done']}/{total} sections done"
+            progress.progress(p["done"] / p["total"] if p["total"] else 0.0, text=label)
+            eta = (
+                f", about {p['eta_s']:.0f}s left"
+                if p["eta_s"] is not None and p["done"] < p["total"]
+                else ""
+            )
+            stats.caption(f"{p['tokens_per_s']:,.0f} tokens/s{eta}")
+        # the finished result below replaces the live view
+        progress.empty()
+        stats.empty()
+        live.empty()
+
+    if job.status == FAILED:
+        st.error(f"Processing failed: {job.error}")
+        # finished sections are checkpointed, submitting again only sends the rest
+        st.info(f"{len(job.sections)} section(s) finished and are saved. Retrying picks up from there.")
+        st.button("Retry")
+        st.stop()
+
+    result = job.result
+    chunks = result["chunks"]
+    st.success(f"Extracted {len(chunks)} chunks from the {file_type[1:].upper()}.")
+
+    outputs = result["languages"]
+    # one tab per language, a single language is shown as before
+    tabs = st.tabs(list(outputs)) if len(outputs) > 1 else [st.container()]
+    for tab, (language, translation) in zip(tabs, outputs.items()):
+        with tab:
+            reviewed_text = translation["output"]
+            if translation["reused"]:
+                # unchanged sections of an earlier version (or run) of this file weren't sent again
+                st.caption(
+                    f"{len(translation['reused'])} of {len(chunks)} sections were reused from an earlier run."
+                )
+
+            # the processed sections as plain text, not as a (huge) list widget
+            with st.expander("Sections before the auto-review"):
+                st.text("\n\n".join(translation["processed"]))
+
+            st.subheader("After auto-review:")
+            if task == "translate":
+                # only sections failing the local quality checks are escalated and reviewed
+                st.caption(f"{len(translation['reviewed'])} of {len(chunks)} sections needed a review.")
+            st.write(reviewed_text)
+
+            # external sanity check
+            perplexity_score = translation["perplexity"]
+            st.info(f"Perplexity estimate: {perplexity_score:.1f}")
+            if perplexity_score > 1500:
+                st.warning("Perplexity score is high. Please double-check the translation manually.")
+            else:
+                st.success("Perplexity score looks good.")
+
+            # allow users to do manual checking for translations
+            if mode == "Translate document":
+                st.subheader("Original vs. Translated")
+                col1, col2 = st.columns(2)
+                with col1:
+                    st.markdown("**Original**")
+                    st.write(chunks[0][:2000] + ("..." if len(chunks[0]) > 2000 else ""))
+                with col2:
+                    st.markdown("**Translated**")
+                    st.write(reviewed_text[:2000] + ("..." if len(reviewed_text) > 2000 else ""))
+
+            # allow manual edits
+            st.markdown("""
+                You can **edit** the translated text directly below if you spot an error.
+                Once satisfied, click one of the download buttons.
+            """)
+
+            edited_text = st.text_area(
+                "Edit translation (optional)", 
+                value=reviewed_text, 
+                height=400,
+                key=f"edit_{language}",
+                )
+
+            # Download buttons
+            name = f"{uploaded_file.name}_translated"
+            if language != "English":
+                name += f"_{LANGUAGES[language]}"
+            download_txt(edited_text, filename=f"{name}.txt")
+            download_docx(edited_text, filename=f"{name}.docx")
@@ -1,9 +1,7 @@
 import streamlit as st
-from openai import OpenAI
-import hmac
-from pathlib import Path
 
-from helper import read_docx, read_pdf_chunks, download_txt, download_docx, perplexity_check, file_hash, split_into_token_chunks
+from core.ratelimit import stream_chat_completion
+from helper import check_password, get_client
 
 # --- Config ---
 ALLOWED_TONES = [
@@ -14,37 +12,15 @@ ALLOWED_TONES = [
     "festive",
 ]
 
-def check_password():
-    """Returns `True` if the user had the correct password."""
-
-    def password_entered():
-        """Checks whether a password entered by the user is correct."""
-        if hmac.compare_digest(st.session_state["password"], st.secrets["password"]):
-            st.session_state["password_correct"] = True
-            del st.session_state["password"]  # Don't store the password.
-        else:
-            st.session_state["password_correct"] = False
-
-    # Return True if the password is validated.
-    if st.session_state.get("password_correct", False):
-        return True
-
-    # Show input for password.
-    st.text_input(
-        "Password", type="password", on_change=password_entered, key="password"
-    )
-    if "password_correct" in st.session_state:
-        st.error("😕 Password incorrect")
-    return False
-
-
 if not check_password():
     st.stop()  # Do not continue if check_password is not True.
 
-client = OpenAI(api_key=st.secrets["OPENAI_API_KEY"])
+client = get_client()
 
-def write_email(input_text: str, tone: str, model="gpt-4o-mini") -> str:
+def write_email(input_text: str, tone: str, model="gpt-4o-mini"):
     """Request OpenAI ChatGPT to write an email, based on the info & tone.
+
+    Yields the email as it streams in.
   
     Args: 
         input_text: Info to include in the email.
@@ -54,13 +30,13 @@ def write_email(input_text: str, tone: str, model="gpt-4o-mini") -> str:
     prompt = f"""Write an email in German using the following information '{input_text}'. " \
     "The tone of the email should be '{tone}'."""
 
-    response = client.chat.completions.create(
+    return stream_chat_completion(
+        client,
         model=model,
         messages=[{"role": "system", "content": prompt}],
         temperature=0.2,
         max_tokens=4000,
     )
-    return str(response.choices[0].message.content).strip()
 
 # --- UI ---
 
@@ -88,12 +64,13 @@ if st.button("Generate Email"):
     else:
         
         try:
-            # send to API for response
-            email_text = write_email(input_text, tone)
-
-            # display the text
             st.subheader("Generated Email:")
-            st.text_area(
+
+            # show the email as it is written, then swap in an editable copy
+            output = st.empty()
+            with output.container():
+                email_text = st.write_stream(write_email(input_text, tone)).strip()
+            output.text_area(
                 label="You can edit the text below or copy and paste it",
                 value=email_text,
                 height=300,
@@ -0,0 +1,60 @@
+import streamlit as st
+import time
+
+from core.tracing import get_store
+from helper import check_password
+
+WINDOWS = {
+    "Last hour": 3600,
+    "Last 24 hours": 24 * 3600,
+    "Last 7 days": 7 * 24 * 3600,
+    "All time": None,
+}
+
+if not check_password():
+    st.stop()  # Do not continue if check_password is not True.
+
+# --- UI ---
+
+st.title("Metrics")
+st.write("Latency, throughput and cost of the model calls and pipeline stages.")
+
+store = get_store()
+if store is None:
+    st.info("Tracing is turned off (LLMDCP_TRACE=0).")
+    st.stop()
+
+window = st.selectbox("Time window", options=list(WINDOWS), index=1)
+seconds = WINDOWS[window]
+since = time.time() - seconds if seconds else 0
+# aggregated in SQL, the spans themselves are never loaded
+summary = store.summarize(since)
+
+if not summary:
+    st.info("No calls recorded in this window yet.")
+    st.stop()
+
+# totals over the model calls that reported their token usage
+# (a streamed reply is counted once, by its chat_stream span)
+usage = store.usage(since)
+calls = sum(row["calls"] for row in usage)
+tokens = sum(row["prompt_tokens"] + row["completion_tokens"] for row in usage)
+spend = sum(row["cost_usd"] for row in usage)
+col1, col2, col3 = st.columns(3)
+col1.metric("Model calls", f"{calls:,}")
+col2.metric("Tokens", f"{tokens:,}")
+col3.metric("Estimated cost", f"${spend:,.6f}")
+
+st.subheader("Calls and stages")
+st.caption("p50/p95 are seconds per call, total_s over all calls; tokens/s counts completion tokens.")
+st.dataframe(summary)
+
+st.subheader("Per document")
+st.dataframe(store.per_document(since))
+
+st.download_button(
+    label="Download as Prometheus text",
+    data=store.prometheus_text(since),
+    file_name="llmdcp_metrics.prom",
+    mime="text/plain",
+)
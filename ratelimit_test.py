@@ -0,0 +1,77 @@
+from types import SimpleNamespace
+
+import openai
+import pytest
+
+from core import ratelimit
+from core.ratelimit import AIMDLimiter, RequestLayer, TokenBucket, stream_chat_completion
+
+
+def rate_limit_error():
+    # skip the httpx response the real constructor wants
+    err = openai.RateLimitError.__new__(openai.RateLimitError)
+    err.response = None
+    return err
+
+
+class FakeClient:
+    def __init__(self, failures):
+        self.failures = list(failures)
+        self.calls = 0
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, **kwargs):
+        self.calls += 1
+        if self.failures:
+            raise self.failures.pop(0)
+        return "ok"
+
+
+def test_token_bucket_waits_when_empty():
+    now = [0.0]
+    bucket = TokenBucket(rate_per_min=60, clock=lambda: now[0])
+    assert bucket.reserve(60) == 0
+    assert bucket.reserve(30) == pytest.approx(30)
+    now[0] += 30
+    assert bucket.reserve(1) == pytest.approx(1)
+
+
+def test_aimd_halves_on_throttle_and_grows_back():
+    limiter = AIMDLimiter(initial=8, maximum=8, increase_after=2)
+    limiter.on_throttle()
+    limiter.on_throttle()
+    assert limiter.limit == 2
+    for _ in range(4):
+        limiter.on_success()
+    assert limiter.limit == 4
+
+
+def test_request_layer_retries_then_succeeds():
+    sleeps = []
+    layer = RequestLayer(count_tokens=len, sleep=sleeps.append, max_concurrency=4)
+    client = FakeClient([rate_limit_error(), rate_limit_error()])
+    assert layer.create(client, messages=[{"role": "user", "content": "hi"}]) == "ok"
+    assert client.calls == 3
+    assert len(sleeps) == 2
+    assert layer.concurrency.limit == 1
+
+
+def test_request_layer_gives_up_after_max_retries():
+    layer = RequestLayer(count_tokens=len, sleep=lambda s: None, max_retries=1)
+    client = FakeClient([rate_limit_error()] * 3)
+    with pytest.raises(openai.RateLimitError):
+        layer.create(client, messages=[])
+    assert client.calls == 2
+
+
+def test_stream_yields_text_deltas(monkeypatch):
+    monkeypatch.setattr(ratelimit, "_layer", RequestLayer(count_tokens=len))
+
+    def delta(content):
+        return SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=content))])
+
+    chunks = [delta("Guten "), delta(None), SimpleNamespace(choices=[]), delta("Tag")]
+    client = SimpleNamespace(
+        chat=SimpleNamespace(completions=SimpleNamespace(create=lambda **kw: iter(chunks)))
+    )
+    assert list(stream_chat_completion(client, messages=[])) == ["Guten ", "Tag"]
@@ -0,0 +1,33 @@
+from core.tm import TranslationMemory, format_numbered, parse_numbered, segment, translate_with_memory
+
+
+def test_segment_round_trips():
+    text = "Vertrag Nr. 5. Seite 1\n\nDer Mieter zahlt. Der Vermieter haftet nicht!"
+    pairs = segment(text)
+    assert "".join(seg + sep for seg, sep in pairs) == text
+    assert [seg for seg, _ in pairs][-2:] == ["Der Mieter zahlt.", "Der Vermieter haftet nicht!"]
+
+
+def test_parse_numbered_rejects_broken_numbering():
+    packed = format_numbered(["a", "b"])
+    assert parse_numbered(packed, 2) == ["a", "b"]
+    assert parse_numbered("[[1]] a b", 2) is None
+
+
+def test_only_unseen_segments_are_sent(tmp_path):
+    memory = TranslationMemory(tmp_path / "tm.sqlite3")
+    sent = []
+
+    def translate(segments):
+        sent.append(segments)
+        return [seg.upper() for seg in segments]
+
+    first = translate_with_memory("Vertraulich. Der Mieter zahlt. 12", translate, memory, "English")
+    assert first == "VERTRAULICH. DER MIETER ZAHLT. 12"
+    second = translate_with_memory("Vertraulich. Neu hier. Vertraulich.", translate, memory, "English")
+    assert second == "VERTRAULICH. NEU HIER. VERTRAULICH."
+    assert sent == [["Vertraulich.", "Der Mieter zahlt."], ["Neu hier."]]
+    # a different target language does not reuse the English entries
+    translate_with_memory("Vertraulich.", translate, memory, "German")
+    assert sent[-1] == ["Vertraulich."]
+    assert translate_with_memory("Ganz neu.", lambda segments: None, memory, "English") is None
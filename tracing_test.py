@@ -0,0 +1,178 @@
+import time
+
+import pytest
+
+from core import tracing
+from core.engine import map_ordered
+from core.tracing import SpanStore, document, percentile, span, traced
+
+
+def test_spans_are_recorded_with_their_document(trace_store):
+    @traced
+    def stage(x):
+        with span("chat_completion", model="gpt-4o-mini") as attrs:
+            attrs["prompt_tokens"], attrs["completion_tokens"] = 1000, 500
+        return x
+
+    with document("doc-1"):
+        assert map_ordered(stage, [1, 2, 3], max_in_flight=2) == [1, 2, 3]
+
+    spans = trace_store.spans()
+    assert len(spans) == 6
+    assert {s["document"] for s in spans} == {"doc-1"}
+
+    (doc,) = trace_store.per_document()
+    assert doc["calls"] == 3
+    assert doc["cost_usd"] == pytest.approx(3 * (1000 * 0.15 + 500 * 0.60) / 1e6)
+
+
+def test_errors_are_recorded_and_raised(trace_store):
+    with pytest.raises(ValueError):
+        with span("broken"):
+            raise ValueError
+    assert trace_store.spans()[0]["error"] == "ValueError"
+
+
+def test_generators_are_timed_by_their_own_work(trace_store):
+    @traced
+    def pages():
+        yield "a"
+        yield "b"
+
+    for _ in pages():
+        time.sleep(0.05)  # the consumer is slow, the generator is not
+    (s,) = trace_store.spans()
+    assert s["name"] == "pages"
+    assert s["seconds"] < 0.05
+
+
+def test_summary_and_prometheus_text(trace_store):
+    now = time.time()
+    for t in (1.0, 2.0, 3.0, 4.0):
+        trace_store.write(
+            {
+                "name": "chat_completion",
+                "start": now,
+                "seconds": t,
+                "model": "gpt-4o-mini",
+                "prompt_tokens": 10,
+                "completion_tokens": 20,
+            }
+        )
+    (row,) = trace_store.summarize()
+    assert (row["calls"], row["p50_s"], row["p95_s"], row["total_s"]) == (4, 2.0, 4.0, 10.0)
+    assert row["tokens_per_s"] == pytest.approx(80 / 10)
+    assert percentile([], 50) == 0.0
+
+    text = trace_store.prometheus_text()
+    assert 'llmdcp_span_seconds_count{name="chat_completion"} 4' in text
+    assert 'llmdcp_span_seconds_sum{name="chat_completion"} 10.000000' in text
+    assert 'llmdcp_tokens_total{model="gpt-4o-mini",kind="completion"} 80' in text
+    assert "llmdcp_cache_hits_total 0" in text
+
+
+def test_store_aggregates(trace_store):
+    for i, (name, doc, model, seconds) in enumerate(
+        [
+            ("chat_completion", "doc-1", "gpt-4o-mini", 1.0),
+            ("chat_completion", "doc-1", "gpt-4o", 3.0),
+            ("chat_completion", "doc-2", "gpt-4o-mini", 2.0),
+            ("extract", "doc-2", None, 0.5),
+            ("chat_completion", None, "gpt-4o-mini", 4.0),
+        ]
+    ):
+        tokens = {"prompt_tokens": 100 * i, "completion_tokens": 10 * i} if model else {}
+        trace_store.write(
+            {
+                "name": name,
+                "document": doc,
+                "start": 100.0 + i,
+                "seconds": seconds,
+                "model": model,
+                **tokens,
+            }
+        )
+    trace_store.write({"name": "extract", "start": 105.0, "seconds": 0.1, "cache_hit": 1, "error": "E"})
+
+    assert trace_store.summarize() == [
+        {
+            "name": "chat_completion",
+            "calls": 4,
+            "errors": 0,
+            "cache_hits": 0,
+            "p50_s": 2.0,
+            "p95_s": 4.0,
+            "total_s": 10.0,
+            "tokens_per_s": 7.0,
+        },
+        {
+            "name": "extract",
+            "calls": 2,
+            "errors": 1,
+            "cache_hits": 1,
+            "p50_s": 0.1,
+            "p95_s": 0.5,
+            "total_s": pytest.approx(0.6),
+            "tokens_per_s": 0.0,
+        },
+    ]
+    # doc-1 runs from 100 to 104 (the second call ends last), doc-2 from 102 to 104
+    assert trace_store.per_document() == [
+        {
+            "document": "doc-1",
+            "calls": 2,
+            "prompt_tokens": 100,
+            "completion_tokens": 10,
+            "cost_usd": pytest.approx((100 * 2.50 + 10 * 10.00) / 1e6),
+            "seconds": 4.0,
+            "tokens_per_s": 2.5,
+        },
+        {
+            "document": "doc-2",
+            "calls": 1,
+            "prompt_tokens": 200,
+            "completion_tokens": 20,
+            "cost_usd": pytest.approx((200 * 0.15 + 20 * 0.60) / 1e6),
+            "seconds": 2.0,
+            "tokens_per_s": 10.0,
+        },
+    ]
+    assert trace_store.usage() == [
+        {
+            "model": "gpt-4o",
+            "calls": 1,
+            "prompt_tokens": 100,
+            "completion_tokens": 10,
+            "cost_usd": pytest.approx((100 * 2.50 + 10 * 10.00) / 1e6),
+        },
+        {
+            "model": "gpt-4o-mini",
+            "calls": 3,
+            "prompt_tokens": 600,
+            "completion_tokens": 60,
+            "cost_usd": pytest.approx((600 * 0.15 + 60 * 0.60) / 1e6),
+        },
+    ]
+    assert [row["name"] for row in trace_store.summarize(since=104.0)] == ["chat_completion", "extract"]
+    assert "llmdcp_cache_hits_total 1" in trace_store.prometheus_text()
+
+
+def test_old_spans_are_pruned(tmp_path):
+    now = [10_000.0]
+    store = SpanStore(tmp_path / "traces.sqlite3", retention=1000, clock=lambda: now[0])
+    store.write({"name": "old", "start": 8_000.0, "seconds": 1.0})
+    store.write({"name": "new", "start": 9_500.0, "seconds": 1.0})
+    # within the purge interval, the old span is only removed on the next open
+    assert [s["name"] for s in store.spans()] == ["old", "new"]
+    reopened = SpanStore(tmp_path / "traces.sqlite3", retention=1000, clock=lambda: now[0])
+    assert [s["name"] for s in reopened.spans()] == ["new"]
+    now[0] += tracing.PURGE_INTERVAL + 1000
+    store.write({"name": "newer", "start": now[0], "seconds": 1.0})
+    assert [s["name"] for s in store.spans()] == ["newer"]
+
+
+def test_tracing_can_be_turned_off(monkeypatch):
+    monkeypatch.setenv("LLMDCP_TRACE", "0")
+    assert tracing.get_store() is None
+    with span("ignored"):
+        pass
@@ -0,0 +1,58 @@
+import io
+import os
+import threading
+
+from benchmarks.pdf_extract_bench import sample_pdf
+from core.extract import file_digest, file_hash, iter_pdf_pages, read_docx
+from core.jobs import JobRunner
+from core.uploads import UploadStore
+
+
+def test_put_stores_by_digest_once(tmp_path):
+    store = UploadStore(tmp_path / "uploads")
+    data = b"%PDF-1.4 fake" * 1000
+    digest = store.put(io.BytesIO(data), block_size=100)
+    assert digest == file_hash(data) == file_digest(store.path(digest))
+    assert digest in store
+    assert store.put(io.BytesIO(data)) == digest
+    assert [p.name for p in store.root.rglob("*") if p.is_file()] == [digest]
+
+
+def test_least_recently_used_files_are_evicted(tmp_path):
+    store = UploadStore(tmp_path / "uploads", max_bytes=250)
+    first = store.put(io.BytesIO(b"a" * 100))
+    second = store.put(io.BytesIO(b"b" * 100))
+    os.utime(store.path(first), (1, 1))
+    os.utime(store.path(second), (2, 2))
+    store.touch(first)
+    third = store.put(io.BytesIO(b"c" * 100))
+    assert first in store and third in store
+    assert second not in store
+
+
+def test_files_of_queued_and_running_jobs_are_not_evicted(tmp_path):
+    store = UploadStore(tmp_path / "uploads", max_bytes=250)
+    runner = JobRunner(max_workers=1)
+    release = threading.Event()
+    first = store.put(io.BytesIO(b"a" * 100))
+    second = store.put(io.BytesIO(b"b" * 100))
+    os.utime(store.path(first), (1, 1))
+    os.utime(store.path(second), (2, 2))
+    running = runner.submit("one", lambda job: release.wait(5), hold=store.pinned(first))
+    queued = runner.submit("two", lambda job: None, hold=store.pinned(second))
+    store.put(io.BytesIO(b"c" * 100))
+    assert first in store and second in store
+    release.set()
+    assert running.wait(5) and queued.wait(5)
+    store.put(io.BytesIO(b"d" * 100))
+    assert first not in store and second not in store
+
+
+def test_extractors_read_stored_files(tmp_path):
+    from core.extract import docx_bytes
+
+    store = UploadStore(tmp_path / "uploads")
+    pdf = store.put(io.BytesIO(sample_pdf([["Seite eins"], ["Seite zwei"]])))
+    assert list(iter_pdf_pages(store.path(pdf), backend="pdfium")) == ["Seite eins", "Seite zwei"]
+    docx = store.put(io.BytesIO(docx_bytes("Der Mieter zahlt.")))
+    assert read_docx(store.path(docx)) == "Der Mieter zahlt."